@@ -0,0 +1,204 @@
+import bisect
+from array import array
+from typing import Any, Dict, Iterator, List, Literal, Optional, Tuple, get_args
+
+from pydantic_core import core_schema
+
+ActionType = Literal["delegate_task", "send_message", "address_conflict", "ask_question"]
+ACTION_TYPES: Tuple[str, ...] = get_args(ActionType)
+ACTION_TYPE_CODES: Dict[str, int] = {name: code for code, name in enumerate(ACTION_TYPES)}
+NO_CODE = -1
+MAX_CODE = 2**31 - 1  # Largest interned code the "i" columns hold
+MAX_VERSION = 2**32 - 1  # Largest version the "I" column holds
+
+class ActionLog:
+    """Column-oriented session action log.
+
+    Action types are fixed small codes; target members and task ids are
+    interned per log into signed 32-bit codes (-1 for "none"); message text
+    lives in a side list referenced by index, and the rare `data` payloads in
+    a sparse dict. Each entry also records the session version it was made
+    at. Entries only become `SimulationAction` objects when read back at the
+    API boundary; scoring can walk the integer columns directly.
+    """
+
+    __slots__ = ("kinds", "members", "tasks", "message_refs", "versions",
+                 "_messages", "_data", "_member_names", "_member_codes", "_task_names", "_task_codes")
+
+    def __init__(self):
+        self.kinds = array("B")
+        self.members = array("i")
+        self.tasks = array("i")
+        self.message_refs = array("i")
+        self.versions = array("I")
+        self._messages: List[str] = []
+        self._data: Dict[int, Dict] = {}
+        self._member_names: List[str] = []
+        self._member_codes: Dict[str, int] = {}
+        self._task_names: List[str] = []
+        self._task_codes: Dict[str, int] = {}
+
+    @staticmethod
+    def _intern(value: Optional[str], names: List[str], codes: Dict[str, int]) -> int:
+        if value is None:
+            return NO_CODE
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(names)
+            names.append(value)
+        return code
+
+    def append(self, action, version: int = 0) -> None:
+        """Add one entry; on any error the log is left exactly as it was."""
+        index = len(self.kinds)
+        kind = ACTION_TYPE_CODES[action.type]
+        if not 0 <= version <= MAX_VERSION:
+            raise ValueError(f"action version {version} is out of range")
+        members, tasks = len(self._member_names), len(self._task_names)
+        member = self._intern(action.target_member, self._member_names, self._member_codes)
+        task = self._intern(action.task_id, self._task_names, self._task_codes)
+        if max(member, task) > MAX_CODE:
+            self._forget(self._member_names, self._member_codes, members)
+            self._forget(self._task_names, self._task_codes, tasks)
+            raise ValueError("too many distinct members or tasks in one action log")
+        # Nothing below can fail, so the columns always stay the same length
+        self.kinds.append(kind)
+        self.members.append(member)
+        self.tasks.append(task)
+        if action.message is None:
+            self.message_refs.append(NO_CODE)
+        else:
+            self.message_refs.append(len(self._messages))
+            self._messages.append(action.message)
+        self.versions.append(version)
+        if action.data is not None:
+            self._data[index] = action.data
+
+    def truncate(self, length: int) -> None:
+        """Drop every entry from `length` on (interned names stay; they are only looked up by code)."""
+        for ref in self.message_refs[length:]:
+            if ref != NO_CODE:
+                del self._messages[ref:]
+                break
+        for index in [index for index in self._data if index >= length]:
+            del self._data[index]
+        for column in (self.kinds, self.members, self.tasks, self.message_refs, self.versions):
+            del column[length:]
+
+    @staticmethod
+    def _forget(names: List[str], codes: Dict[str, int], keep: int) -> None:
+        """Undo the interning of every name after the first `keep`."""
+        for name in names[keep:]:
+            del codes[name]
+        del names[keep:]
+
+    def member_name(self, code: int) -> Optional[str]:
+        return None if code == NO_CODE else self._member_names[code]
+
+    def task_id(self, code: int) -> Optional[str]:
+        return None if code == NO_CODE else self._task_names[code]
+
+    def message(self, ref: int) -> Optional[str]:
+        return None if ref == NO_CODE else self._messages[ref]
+
+    def type_counts(self) -> Dict[str, int]:
+        counts = [0] * len(ACTION_TYPES)
+        for kind in self.kinds:
+            counts[kind] += 1
+        return {ACTION_TYPES[kind]: count for kind, count in enumerate(counts) if count}
+
+    def first_after(self, version: int) -> int:
+        """Index of the first entry recorded after `version`."""
+        return bisect.bisect_right(self.versions, version)
+
+    def _action(self, index: int):
+        from backend.models import SimulationAction
+        message_ref = self.message_refs[index]
+        # Validating again is cheaper than model_construct, which is pure Python (about 2.5us vs 6us)
+        return SimulationAction(
+            type=ACTION_TYPES[self.kinds[index]],
+            target_member=self.member_name(self.members[index]),
+            task_id=self.task_id(self.tasks[index]),
+            message=None if message_ref == NO_CODE else self._messages[message_ref],
+            data=self._data.get(index),
+        )
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._action(i) for i in range(*index.indices(len(self.kinds)))]
+        if index < 0:
+            index += len(self.kinds)
+        if not 0 <= index < len(self.kinds):
+            raise IndexError("action index out of range")
+        return self._action(index)
+
+    def __iter__(self) -> Iterator:
+        for index in range(len(self.kinds)):
+            yield self._action(index)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ActionLog):
+            return self.to_public() == other.to_public() and self.versions == other.versions
+        return NotImplemented
+
+    def to_public(self, start: int = 0) -> List[Dict[str, Any]]:
+        """Entries from `start` on as plain SimulationAction dicts."""
+        entries = []
+        for index in range(start, len(self.kinds)):
+            message_ref = self.message_refs[index]
+            entries.append({
+                "type": ACTION_TYPES[self.kinds[index]],
+                "target_member": self.member_name(self.members[index]),
+                "task_id": self.task_id(self.tasks[index]),
+                "message": None if message_ref == NO_CODE else self._messages[message_ref],
+                "data": self._data.get(index),
+            })
+        return entries
+
+    def to_persisted(self, start: int = 0) -> List:
+        """Entries from `start` on in their storage form, `PersistedAction`s carrying their version."""
+        from backend.models import PersistedAction
+        return [
+            PersistedAction.model_construct(**entry, version=self.versions[index])
+            for index, entry in enumerate(self.to_public(start), start)
+        ]
+
+    @classmethod
+    def from_entries(cls, entries) -> "ActionLog":
+        """Log from SimulationActions (recorded at version 0) or stored PersistedAction dicts."""
+        from backend.models import PersistedAction, SimulationAction
+        log = cls()
+        for entry in entries:
+            if not isinstance(entry, SimulationAction):
+                entry = PersistedAction.model_validate(entry)
+            log.append(entry, getattr(entry, "version", 0))
+        return log
+
+    @classmethod
+    def _validate(cls, value) -> "ActionLog":
+        if isinstance(value, ActionLog):
+            return value
+        if isinstance(value, (list, tuple)):
+            return cls.from_entries(value)
+        raise ValueError("actions must be a list of actions")
+
+    @staticmethod
+    def _serialize(log: "ActionLog") -> List:
+        # The public form; storage writes to_persisted() instead, so versions never reach the API
+        return log[:]
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source, handler):
+        # backend.models imports this module, so SimulationAction is resolved lazily
+        from backend.models import SimulationAction
+        public_schema = handler.generate_schema(List[SimulationAction])
+        return core_schema.no_info_plain_validator_function(
+            cls._validate,
+            json_schema_input_schema=public_schema,
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                cls._serialize, return_schema=public_schema,
+            ),
+        )
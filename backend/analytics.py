@@ -0,0 +1,188 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+COMPETENCIES = (
+    "critical_thinking",
+    "communication",
+    "teamwork",
+    "leadership",
+    "professionalism",
+    "equity_inclusion",
+)
+MAX_SCORE = 100
+DEFAULT_COHORT = "default"
+SUMMARY_PERCENTILES = (10, 25, 50, 75, 90)
+
+class CohortAnalytics:
+    """Append-only columnar store of competency scores for completed sessions.
+
+    Each competency is one uint8 NumPy column and cohorts are interned into an
+    int32 code column, so every query is a handful of vectorized passes over
+    contiguous memory. Columns grow by doubling; rows are never rewritten.
+    """
+
+    def __init__(self, initial_capacity: int = 1024):
+        self._size = 0
+        self._scores = np.zeros((len(COMPETENCIES), initial_capacity), dtype=np.uint8)
+        self._cohorts = np.zeros(initial_capacity, dtype=np.int32)
+        self._cohort_codes: Dict[str, int] = {}
+        self._cohort_names: List[str] = []
+        self._rows: Dict[str, int] = {}  # session_id -> row
+        self.synced_to = 0  # Largest store position folded in by sync()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._rows
+
+    def append(self, session_id: str, cohort: Optional[str], scores: Dict[str, int]) -> None:
+        if session_id in self._rows:
+            return
+        if self._size == self._cohorts.shape[0]:
+            self._grow()
+        row = self._size
+        cohort = cohort or DEFAULT_COHORT
+        code = self._cohort_codes.get(cohort)
+        if code is None:
+            code = self._cohort_codes[cohort] = len(self._cohort_names)
+            self._cohort_names.append(cohort)
+        self._scores[:, row] = [scores.get(name, 0) for name in COMPETENCIES]
+        self._cohorts[row] = code
+        self._rows[session_id] = row
+        self._size += 1
+
+    def extend(self, rows: Iterable[Tuple[str, Optional[str], Dict[str, int]]]) -> None:
+        for session_id, cohort, scores in rows:
+            self.append(session_id, cohort, scores)
+
+    def sync(self, rows: Iterable[Tuple[int, str, Optional[str], Dict[str, int]]]) -> None:
+        """Fold in positioned rows from `SessionStore.iter_record_scores`, remembering how far it got."""
+        for position, session_id, cohort, scores in rows:
+            self.append(session_id, cohort, scores)
+            self.synced_to = max(self.synced_to, position)
+
+    def _grow(self) -> None:
+        capacity = self._cohorts.shape[0] * 2
+        scores = np.zeros((len(COMPETENCIES), capacity), dtype=np.uint8)
+        scores[:, :self._size] = self._scores[:, :self._size]
+        cohorts = np.zeros(capacity, dtype=np.int32)
+        cohorts[:self._size] = self._cohorts[:self._size]
+        self._scores, self._cohorts = scores, cohorts
+
+    def cohorts(self) -> List[str]:
+        return list(self._cohort_names)
+
+    def _columns(self, cohort: Optional[str]) -> np.ndarray:
+        """Scores as a (competency, session) matrix, optionally limited to one cohort."""
+        scores = self._scores[:, :self._size]
+        if cohort is None:
+            return scores
+        code = self._cohort_codes.get(cohort)
+        if code is None:
+            return scores[:, :0]
+        return scores[:, self._cohorts[:self._size] == code]
+
+    def _distributions(self, scores: np.ndarray, names=COMPETENCIES + ("overall",)) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """(values, counts) per competency plus "overall" (the average of all six).
+
+        Scores are small integers, so a bincount replaces sorting: percentiles,
+        moments, histograms and ranks all come from the counts in O(n).
+        """
+        distributions = {}
+        values = np.arange(MAX_SCORE + 1, dtype=np.float64)
+        for name, column in zip(COMPETENCIES, scores):
+            if name in names:
+                distributions[name] = (values, np.bincount(column, minlength=MAX_SCORE + 1))
+        if "overall" in names:
+            # The per-session sum is an integer too, which keeps the overall average countable
+            totals = scores.sum(axis=0, dtype=np.uint16)
+            overall_values = np.arange(len(COMPETENCIES) * MAX_SCORE + 1, dtype=np.float64) / len(COMPETENCIES)
+            distributions["overall"] = (overall_values, np.bincount(totals, minlength=overall_values.size))
+        return distributions
+
+    def summary(self, cohort: Optional[str] = None) -> Dict:
+        """Count, mean, standard deviation and percentiles per competency and overall."""
+        scores = self._columns(cohort)
+        count = scores.shape[1]
+        result = {"cohort": cohort, "count": count, "competencies": {}}
+        if count == 0:
+            return result
+
+        for name, (values, counts) in self._distributions(scores).items():
+            mean = float(values @ counts) / count
+            variance = float((values - mean) ** 2 @ counts) / count
+            present = np.flatnonzero(counts)
+            result["competencies"][name] = {
+                "mean": round(mean, 2),
+                "std": round(variance ** 0.5, 2),
+                "min": float(values[present[0]]),
+                "max": float(values[present[-1]]),
+                "percentiles": {
+                    f"p{p}": round(value, 2)
+                    for p, value in zip(SUMMARY_PERCENTILES, _percentiles(values, counts, SUMMARY_PERCENTILES))
+                },
+            }
+        return result
+
+    def histogram(self, competency: str, bins: int = 10, cohort: Optional[str] = None) -> Dict:
+        values, counts = self._distributions(self._columns(cohort), (competency,))[competency]
+        # Same binning rule as np.histogram over [0, 100]: the top edge belongs to the last bin
+        bin_index = np.minimum((values * bins / MAX_SCORE).astype(np.int64), bins - 1)
+        binned = np.bincount(bin_index, weights=counts, minlength=bins).astype(np.int64)
+        edges = np.linspace(0, MAX_SCORE, bins + 1)
+        return {
+            "cohort": cohort,
+            "competency": competency,
+            "edges": [round(float(edge), 2) for edge in edges],
+            "counts": binned.tolist(),
+        }
+
+    def rank(self, session_id: str) -> Optional[Dict]:
+        """Percentile rank of a session within its own cohort, per competency and overall.
+
+        Uses the mid-rank convention: sessions scoring lower count fully,
+        ties count half.
+        """
+        row = self._rows.get(session_id)
+        if row is None:
+            return None
+        code = self._cohorts[row]
+        scores = self._scores[:, :self._size][:, self._cohorts[:self._size] == code]
+        size = scores.shape[1]
+
+        own = self._scores[:, row]
+        own_index = dict(zip(COMPETENCIES, own.tolist()))
+        own_index["overall"] = int(own.sum(dtype=np.uint16))  # index into the overall (sum) distribution
+
+        percentile_ranks = {}
+        position = 1
+        for name, (_, counts) in self._distributions(scores).items():
+            index = own_index[name]
+            below = int(counts[:index].sum())
+            percentile_ranks[name] = round((below + 0.5 * int(counts[index])) / size * 100, 1)
+            if name == "overall":
+                position = int(counts[index + 1:].sum()) + 1
+
+        return {
+            "session_id": session_id,
+            "cohort": self._cohort_names[code],
+            "cohort_size": size,
+            "position": position,
+            "percentile_ranks": percentile_ranks,
+        }
+
+def _percentiles(values: np.ndarray, counts: np.ndarray, percentiles) -> List[float]:
+    """np.percentile's default (linear) method, evaluated on a value distribution."""
+    cumulative = np.cumsum(counts)
+    total = int(cumulative[-1])
+    result = []
+    for p in percentiles:
+        position = p / 100 * (total - 1)
+        lower = int(np.floor(position))
+        fraction = position - lower
+        low_value = values[np.searchsorted(cumulative, lower, side="right")]
+        high_value = values[np.searchsorted(cumulative, min(lower + 1, total - 1), side="right")]
+        result.append(float(low_value + (high_value - low_value) * fraction))
+    return result
@@ -0,0 +1,227 @@
+"""
+Microbenchmarks for the per-request hot paths, with a regression gate.
+
+Covers process_action for each action type, replay of a 10-action log
+through the engine, scoring (cold, i.e. replaying the log into a fresh tally
+as after a restart, and warm, from the running tally) and serialization of
+SessionState (API and storage forms) and ActionResponse, and the store's cost of saving one more action (`persist.save`
+on the event loop, `persist.write` on the writer thread). Sessions are built by
+applying 10, 1k and 100k random actions through the engine, so their team
+history is realistic, against teams of 3, 50 and 500 members (larger teams
+keep alex, jordan and sam, whom the scenarios refer to by name).
+
+    python -m backend.benchmarks --save benchmarks.json        # record a baseline
+    python -m backend.benchmarks --compare benchmarks.json     # exit 1 on regressions
+    python -m backend.benchmarks --filter score --compare benchmarks.json --threshold 0.5
+
+Timings are per call, the median of --repeat batches, so compare baselines
+recorded on the same machine.
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import random
+import re
+import statistics
+import sys
+import timeit
+from typing import Callable, Dict, List, Optional, Tuple
+
+from backend.engine import SimulationEngine, replay
+from backend.models import MoodState, SessionState, SimulationAction, STATE_EXCLUDE, TeamMember
+from backend.scenarios import TASK_CATALOG, get_initial_team_state, process_action
+from backend.scoring import calculate_final_scores
+from backend.session_store import SessionWrite
+
+ACTION_COUNTS = (10, 1_000, 100_000)
+TEAM_SIZES = (3, 50, 500)
+
+# Fractional slowdown tolerated before --compare fails (0.5 = 50% slower). Medians of identical code still
+# move by 20-30% between runs on a busy machine, so a tighter gate mostly reports noise
+DEFAULT_THRESHOLD = 0.5
+
+MESSAGES = ("Thanks, great work!", "I need this ASAP.", "How is your workload?", "Let me know if you need help.")
+
+def make_team(size: int, rng: random.Random) -> Dict[str, TeamMember]:
+    """The scenario team, padded with variations of its members up to `size`."""
+    team = get_initial_team_state()
+    templates = list(team.values())
+    for index in range(len(team), size):
+        template = templates[index % len(templates)]
+        team[f"member_{index}"] = template.model_copy(update={
+            "name": f"Member {index}",
+            "workload": rng.randint(0, 100),
+            "mood": rng.choice(list(MoodState)),
+        })
+    return team
+
+def make_action(rng: random.Random, members: List[str], kind: Optional[str] = None) -> SimulationAction:
+    kind = kind or rng.choice(("delegate_task", "send_message", "ask_question", "address_conflict"))
+    if kind == "delegate_task":
+        return SimulationAction(type=kind, target_member=rng.choice(members), task_id=rng.choice(TASK_CATALOG.tasks).id)
+    if kind == "address_conflict":
+        return SimulationAction(type=kind, data={"approach": rng.choice(("address_both", "private_meetings"))})
+    return SimulationAction(type=kind, target_member=rng.choice(members), message=rng.choice(MESSAGES))
+
+def make_session(actions: int, team_size: int, seed: int = 0) -> SessionState:
+    """A session with `actions` random actions applied through the engine, as a client would."""
+    rng = random.Random(seed)
+    engine = SimulationEngine()
+    session = engine.new_session(f"bench-{actions}-{team_size}", seed=seed, team_members=make_team(team_size, rng))
+    members = list(session.team_members)
+    for _ in range(actions):
+        engine.apply(session, make_action(rng, members))
+    return session
+
+def measure(fn: Callable[[], object], repeat: int = 7) -> float:
+    """Seconds per call: calls are batched to at least 0.2s, median batch of `repeat`."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return statistics.median(timer.repeat(repeat, number)) / number
+
+def cold_scores(session: SessionState) -> None:
+    session._tally = None  # As after a restart: replay the whole log into a new tally
+    calculate_final_scores(session)
+
+def last_save(session: SessionState) -> Tuple[int, int, int]:
+    """Store watermark of the session as saved just before its last action."""
+    history = session.team_history[:-1] if session.team_history[-1].version == session.version else session.team_history
+    return len(session.actions) - 1, len(history), sum(len(snapshot.members) for snapshot in history)
+
+# Benchmarks over a whole session, run for every (actions, team size) combination
+SESSION_BENCHMARKS: Dict[str, Callable[[SessionState], object]] = {
+    "score.cold": cold_scores,
+    "score.warm": calculate_final_scores,
+    "serialize.state": lambda session: session.model_dump(mode="json", exclude=STATE_EXCLUDE),
+    # Saving one more action: what save() does on the loop, then what the writer thread serializes
+    "persist.save": lambda session, persisted: SessionWrite.since(session, persisted),
+    "persist.write": lambda session, persisted: SessionWrite.since(session, persisted)[0].rows(),
+}
+
+def build_benchmarks(pattern: Optional[str] = None) -> List[Tuple[str, Callable[[], object]]]:
+    selected = re.compile(pattern) if pattern else None
+    benchmarks = []
+    sessions: Dict[Tuple[int, int], SessionState] = {}
+    
+    def session_for(actions: int, team_size: int) -> SessionState:
+        # Built on first use and shared: 100k applied actions take seconds to build
+        if (actions, team_size) not in sessions:
+            sessions[actions, team_size] = make_session(actions, team_size)
+        return sessions[actions, team_size]
+    
+    def add(name: str, make: Callable[[], Callable[[], object]]) -> None:
+        # Sessions are only built for the benchmarks that were asked for
+        if selected is None or selected.search(name):
+            benchmarks.append((name, make))
+    
+    for team_size in TEAM_SIZES:
+        for kind in ("delegate_task", "send_message", "ask_question", "address_conflict"):
+            def make(team_size=team_size, kind=kind):
+                session = session_for(10, team_size)
+                rng = random.Random(1)
+                actions = [make_action(rng, list(session.team_members), kind) for _ in range(32)]
+                cycle = itertools.cycle(actions)
+                return lambda: process_action(session, next(cycle))
+            add(f"process_action.{kind}[team={team_size}]", make)
+        
+        def make_response(team_size=team_size):
+            session = session_for(10, team_size)
+            response = process_action(session, make_action(random.Random(2), list(session.team_members), "delegate_task"))
+            return lambda: response.model_dump_json()
+        add(f"serialize.action_response[team={team_size}]", make_response)
+        
+        def make_replay(team_size=team_size):
+            session = session_for(10, team_size)
+            initial = session.team_history[0].members
+            return lambda: replay(session.seed, session.actions, team_members=initial)
+        add(f"engine.replay[actions=10,team={team_size}]", make_replay)
+    
+    for actions in ACTION_COUNTS:
+        for team_size in TEAM_SIZES:
+            size = f"[actions={actions},team={team_size}]"
+            for name, call in SESSION_BENCHMARKS.items():
+                def make(name=name, actions=actions, team_size=team_size, call=call):
+                    session = session_for(actions, team_size)
+                    if name.startswith("persist."):
+                        persisted = last_save(session)
+                        return lambda: call(session, persisted)
+                    return lambda: call(session)
+                add(f"{name}{size}", make)
+    return benchmarks
+
+def run(pattern: Optional[str] = None, repeat: int = 7, progress=None,
+        timers: Optional[Dict[str, Callable[[], object]]] = None) -> Dict[str, float]:
+    """Seconds per call of every selected benchmark; the timed callables are kept in `timers` if given."""
+    results = {}
+    for name, make in build_benchmarks(pattern):
+        fn = make()
+        if timers is not None:
+            timers[name] = fn
+        results[name] = measure(fn, repeat)
+        if progress:
+            progress(name, results[name])
+    return results
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    """Names of the benchmarks more than `threshold` slower than the baseline."""
+    return [name for name, seconds in results.items()
+            if name in baseline and seconds > baseline[name] * (1 + threshold)]
+
+def format_seconds(seconds: float) -> str:
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} us"
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the engine, scoring and serialization hot paths.")
+    parser.add_argument("--filter", help="Only run benchmarks whose name matches this regex")
+    parser.add_argument("--repeat", type=int, default=7, help="Timed batches per benchmark (the median counts)")
+    parser.add_argument("--save", help="Write the results to this JSON file as the new baseline")
+    parser.add_argument("--compare", help="Baseline JSON file to check the results against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Tolerated slowdown before a benchmark counts as regressed (0.5 = 50%%)")
+    parser.add_argument("--confirm", type=int, default=2,
+                        help="Times a regression is re-measured before it counts (the fastest run is kept)")
+    args = parser.parse_args(argv)
+    
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            baseline = json.load(handle)["results"]
+    
+    def progress(name: str, seconds: float) -> None:
+        line = f"{name:<58}{format_seconds(seconds):>12}"
+        if name in baseline:
+            line += f"{format_seconds(baseline[name]):>12}{(seconds / baseline[name] - 1) * 100:+8.1f}%"
+        print(line, flush=True)
+    
+    timers: Dict[str, Callable[[], object]] = {}
+    results = run(args.filter, args.repeat, progress, timers)
+    
+    # A slowdown has to reproduce: a noisy neighbour rarely slows the same benchmark down every time
+    for _ in range(args.confirm):
+        suspects = compare(results, baseline, args.threshold)
+        if not suspects:
+            break
+        print(f"Re-measuring {len(suspects)} possible regressions", flush=True)
+        for name in suspects:
+            results[name] = min(results[name], measure(timers[name], args.repeat))
+            progress(name, results[name])
+    
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as handle:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results},
+                      handle, indent=2, sort_keys=True)
+    
+    regressed = compare(results, baseline, args.threshold)
+    if regressed:
+        print(f"{len(regressed)} benchmarks regressed by more than {args.threshold:.0%}:", file=sys.stderr)
+        for name in regressed:
+            print(f"  {name}: {format_seconds(baseline[name])} -> {format_seconds(results[name])}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
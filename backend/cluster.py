@@ -0,0 +1,354 @@
+"""
+Running the app as several worker processes on one host.
+
+Each live session is owned by exactly one node, chosen by consistent hashing
+of its session_id over the configured node URLs (CLUSTER_NODES, this node
+being CLUSTER_SELF). A request for a session that lands on another node is
+forwarded to the owner over HTTP, response streamed back, so load balancers
+and clients can send anything anywhere. All nodes share one SQLite session
+store; a node only keeps the sessions it owns in memory. When the node list
+changes, only the sessions whose owner changed move, in two steps: every node
+first switches to the new ring and writes out the sessions it gave up, while
+holding back requests for the sessions it gained; once all nodes have done
+so, the new owners go ahead and load those sessions from the store.
+
+Single host only: the store is one SQLite file in WAL mode, which does not
+work over a network filesystem, and every node writes its hot sessions
+behind into it.
+
+Forwarded requests carry an HMAC of their method and path, keyed by
+CLUSTER_HOP_KEY (made up per run by the launcher) or else CLUSTER_SECRET, so
+only peers can make a node serve a session it does not own.
+
+    python -m backend.cluster --workers 4 --port 5001
+
+starts four local workers sharing port 5001 (SO_REUSEPORT, Linux), each also
+listening on its own private port for forwarded requests.
+"""
+
+import argparse
+import asyncio
+import bisect
+import hashlib
+import hmac
+import logging
+import multiprocessing
+import os
+import re
+import secrets
+import socket
+import uuid
+from typing import Iterable, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+FORWARDED_HEADER = b"x-cluster-forwarded"
+SECRET_HEADER = "x-cluster-secret"
+SESSION_PATH = re.compile(r"^/api/session/([^/]+)/")
+
+# Longest a new owner holds requests for a session it gained, if the commit of a handoff never arrives
+HANDOFF_TIMEOUT = 10.0  # seconds
+
+# Not passed through when forwarding; the server on each hop sets its own
+HOP_BY_HOP_HEADERS = {
+    b"connection", b"keep-alive", b"proxy-authenticate", b"proxy-authorization", b"te", b"trailer",
+    b"transfer-encoding", b"upgrade", b"host", b"content-length",
+}
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+class HashRing:
+    """Consistent hashing with virtual nodes: adding or removing a node moves about 1/n of the keys."""
+
+    def __init__(self, nodes: Iterable[str], vnodes: int = 64):
+        self.nodes = tuple(dict.fromkeys(nodes))
+        self.vnodes = vnodes
+        points = sorted((_hash(f"{node}#{index}"), node) for node in self.nodes for index in range(vnodes))
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+class Cluster:
+    """This node's view of the ring, plus the HTTP client used to forward to the other nodes."""
+
+    def __init__(self, nodes: Iterable[str], self_url: Optional[str], vnodes: int = 64,
+                 secret: Optional[str] = None, hop_key: Optional[str] = None):
+        self.self_url = self_url.rstrip("/") if self_url else None
+        self.vnodes = vnodes
+        self.secret = secret
+        # Signs forwarded hops; without one, no request is taken as forwarded
+        key = hop_key or secret
+        self._hop_key = key.encode() if key else None
+        self.ring = HashRing([node.rstrip("/") for node in nodes], vnodes)
+        # While a membership change is under way: the ring before it, and what requests for gained sessions await
+        self._previous_ring: Optional[HashRing] = None
+        self._handoff: Optional[asyncio.Event] = None
+        self._handoff_timer: Optional[asyncio.TimerHandle] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self.forwarded = 0
+        self.forward_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.self_url is not None and len(self.ring) > 0
+
+    def owner(self, session_id: str) -> Optional[str]:
+        return self.ring.owner(session_id) if self.enabled else None
+
+    def owns(self, session_id: str) -> bool:
+        return not self.enabled or self.ring.owner(session_id) == self.self_url
+
+    def new_session_id(self) -> str:
+        """A fresh session id that hashes to this node, so the session starts where it was created."""
+        while True:
+            session_id = str(uuid.uuid4())
+            if self.owns(session_id):
+                return session_id
+
+    def set_nodes(self, nodes: Iterable[str]) -> None:
+        self.ring = HashRing([node.rstrip("/") for node in nodes], self.vnodes)
+
+    def hop_signature(self, method: str, path: str) -> bytes:
+        """Value of FORWARDED_HEADER on a hop from this cluster."""
+        return hmac.new(self._hop_key, f"{method} {path}".encode(), hashlib.sha256).hexdigest().encode()
+
+    def from_peer(self, scope) -> bool:
+        """Whether the request was forwarded by another node, going by a valid FORWARDED_HEADER signature."""
+        values = [value for key, value in scope["headers"] if key == FORWARDED_HEADER]
+        if not values or self._hop_key is None:
+            return False
+        return hmac.compare_digest(values[0], self.hop_signature(scope.get("method", "GET"), scope["path"]))
+
+    def begin_handoff(self, nodes: Iterable[str]) -> None:
+        """Switch to the new ring, holding requests for sessions gained until `end_handoff`."""
+        if self._previous_ring is None:
+            self._previous_ring = self.ring
+            self._handoff = asyncio.Event()
+        self.set_nodes(nodes)
+        if self._handoff_timer is not None:
+            self._handoff_timer.cancel()
+        # Don't hold sessions forever if whoever started the change never commits it
+        self._handoff_timer = asyncio.get_running_loop().call_later(HANDOFF_TIMEOUT, self.end_handoff)
+
+    def end_handoff(self) -> None:
+        """Every old owner has written its sessions out: let the held requests through."""
+        if self._handoff_timer is not None:
+            self._handoff_timer.cancel()
+            self._handoff_timer = None
+        if self._handoff is not None:
+            self._handoff.set()
+        self._previous_ring, self._handoff = None, None
+
+    def gaining(self, session_id: str) -> bool:
+        """Whether the session is moving to this node in the membership change under way."""
+        return (self._previous_ring is not None and self.owns(session_id)
+                and self._previous_ring.owner(session_id) != self.self_url)
+
+    async def wait_for_handoff(self) -> None:
+        if self._handoff is not None:
+            await self._handoff.wait()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            # No read timeout: forwarded event streams stay open for the whole meeting
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(None, connect=2.0),
+                                             limits=httpx.Limits(max_keepalive_connections=64))
+        return self._client
+
+    async def broadcast(self, method: str, path: str, json: dict, nodes: Iterable[str]) -> List[str]:
+        """Send one request to each of `nodes` (except this one); returns the nodes that failed."""
+        headers = {SECRET_HEADER: self.secret or ""}
+        if self._hop_key is not None:
+            headers[FORWARDED_HEADER.decode()] = self.hop_signature(method, path).decode()
+        targets = [node for node in dict.fromkeys(nodes) if node != self.self_url]
+
+        async def send(node: str) -> Optional[str]:
+            try:
+                response = await self._get_client().request(method, node + path, json=json, headers=headers)
+                response.raise_for_status()
+            except httpx.HTTPError:
+                logger.warning("Cluster node %s did not take %s %s", node, method, path, exc_info=True)
+                return node
+            return None
+
+        return [node for node in await asyncio.gather(*(send(node) for node in targets)) if node]
+
+    async def forward(self, owner: str, scope, receive, send) -> None:
+        """Proxy one HTTP request to `owner` and stream its response back."""
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        headers = [(key, value) for key, value in scope["headers"]
+                   if key.lower() not in HOP_BY_HOP_HEADERS and key != FORWARDED_HEADER]
+        if self._hop_key is not None:
+            headers.append((FORWARDED_HEADER, self.hop_signature(scope["method"], scope["path"])))
+        url = owner + scope.get("raw_path", scope["path"].encode()).decode()
+        if scope.get("query_string"):
+            url += "?" + scope["query_string"].decode()
+
+        client = self._get_client()
+        try:
+            response = await client.send(client.build_request(scope["method"], url, headers=headers, content=body),
+                                         stream=True)
+        except httpx.HTTPError:
+            self.forward_errors += 1
+            logger.warning("Session owner %s unreachable", owner, exc_info=True)
+            await send({"type": "http.response.start", "status": 503,
+                        "headers": [(b"content-type", b"application/json")]})
+            await send({"type": "http.response.body", "body": b'{"detail":"Session owner unavailable"}'})
+            return
+
+        self.forwarded += 1
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": [(key, value) for key, value in response.headers.raw
+                            if key.lower() not in HOP_BY_HOP_HEADERS],
+            })
+
+            async def relay():
+                async for chunk in response.aiter_raw():
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+            async def client_gone():
+                while (await receive())["type"] != "http.disconnect":
+                    pass
+
+            # Stop pulling from the owner as soon as the client hangs up (matters for event streams)
+            relaying, watching = asyncio.create_task(relay()), asyncio.create_task(client_gone())
+            try:
+                done, _ = await asyncio.wait({relaying, watching}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                relaying.cancel()
+                watching.cancel()
+            if relaying in done:
+                relaying.result()
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            await response.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "self": self.self_url,
+            "nodes": list(self.ring.nodes),
+            "vnodes": self.vnodes,
+            "forwarded": self.forwarded,
+            "forward_errors": self.forward_errors,
+        }
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+class ClusterMiddleware:
+    """ASGI middleware that sends per-session requests to the node owning the session."""
+
+    def __init__(self, app, cluster: Cluster):
+        self.app = app
+        self.cluster = cluster
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket") or not self.cluster.enabled:
+            return await self.app(scope, receive, send)
+        forwarded = self.cluster.from_peer(scope)
+        if not forwarded and any(key == FORWARDED_HEADER for key, _ in scope["headers"]):
+            # Claimed by a client, not signed by a peer: drop it so it is routed (and handled) as any other
+            scope = {**scope, "headers": [(key, value) for key, value in scope["headers"] if key != FORWARDED_HEADER]}
+        match = SESSION_PATH.match(scope["path"])
+        if match is not None and self.cluster.gaining(match.group(1)):
+            # The old owner may still be writing this session out
+            await self.cluster.wait_for_handoff()
+        # Forwarded requests are always served here, so nodes that briefly disagree about the ring can't loop
+        if match is None or forwarded or self.cluster.owns(match.group(1)):
+            return await self.app(scope, receive, send)
+
+        if scope["type"] == "websocket":
+            # Not proxied; clients can follow the owner or fall back to the (forwarded) SSE stream
+            await receive()  # websocket.connect
+            await send({"type": "websocket.close", "code": 4409})
+            return
+        await self.cluster.forward(self.cluster.owner(match.group(1)), scope, receive, send)
+
+def cluster_from_env() -> Cluster:
+    return Cluster(
+        [node for node in os.environ.get("CLUSTER_NODES", "").split(",") if node.strip()],
+        os.environ.get("CLUSTER_SELF") or None,
+        vnodes=int(os.environ.get("CLUSTER_VNODES", "64")),
+        secret=os.environ.get("CLUSTER_SECRET") or None,
+        hop_key=os.environ.get("CLUSTER_HOP_KEY") or None,
+    )
+
+def serve_worker(host: str, port: int, private_port: int, nodes: List[str], log_level: str, hop_key: str) -> None:
+    import uvicorn
+
+    os.environ["CLUSTER_NODES"] = ",".join(nodes)
+    os.environ["CLUSTER_HOP_KEY"] = hop_key
+    os.environ["CLUSTER_SELF"] = f"http://127.0.0.1:{private_port}"
+    private = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    private.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    private.bind(("127.0.0.1", private_port))
+    sockets = [private] if not port else [public_socket(host, port), private]
+    server = uvicorn.Server(uvicorn.Config("backend.main:app", log_level=log_level))
+    server.run(sockets=sockets)
+
+def public_socket(host: str, port: int) -> socket.socket:
+    """One listening socket per worker on the shared port; the kernel spreads connections over them."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    return sock
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run several app workers with consistent-hash session routing.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001, help="shared public port (0 for private ports only)")
+    parser.add_argument("--base-port", type=int, default=5101, help="first private per-worker port")
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args(argv)
+
+    if os.environ.get("SESSION_STORE", "sqlite") == "memory":
+        parser.error("workers need the shared SQLite session store; unset SESSION_STORE=memory")
+    nodes = [f"http://127.0.0.1:{args.base_port + index}" for index in range(args.workers)]
+    hop_key = os.environ.get("CLUSTER_HOP_KEY") or secrets.token_hex(32)
+
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for index in range(args.workers):
+        process = context.Process(target=serve_worker, name=f"worker-{index}",
+                                  args=(args.host, args.port, args.base_port + index, nodes, args.log_level, hop_key))
+        process.start()
+        processes.append(process)
+    print(f"{args.workers} workers on {args.host}:{args.port}, private ports {args.base_port}-"
+          f"{args.base_port + args.workers - 1}")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+if __name__ == "__main__":
+    main()
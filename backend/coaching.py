@@ -0,0 +1,96 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+from backend.models import SessionState
+
+logger = logging.getLogger(__name__)
+
+# Actions fed to the coach as "recent"
+COACHING_RECENT_ACTIONS = 3
+
+class CoachingQueue:
+    """Runs coaching advice off the request path, one debounced job per session.
+
+    Every submit cancels the session's previous job, whether it is still
+    waiting out the debounce or already talking to the model, so a burst of
+    actions produces one request about the latest state. `advise(request)`
+    returns the hint (or None to skip) and `deliver(session_id, version, hint)`
+    attaches it to the session, returning False when the session has moved
+    past `version` in the meantime and the hint was dropped as stale.
+    """
+
+    def __init__(self, advise: Callable[[Dict], Awaitable[Optional[str]]],
+                 deliver: Callable[[str, int, str], Awaitable[bool]], debounce: float = 2.0):
+        self.advise = advise
+        self.deliver = deliver
+        self.debounce = debounce
+        self._jobs: Dict[str, asyncio.Task] = {}
+        self.submitted = 0
+        self.superseded = 0
+        self.delivered = 0
+        self.stale = 0
+        self.failed = 0
+
+    def submit(self, session_id: str, version: int, request: Dict) -> None:
+        self.cancel(session_id)
+        self.submitted += 1
+        self._jobs[session_id] = asyncio.create_task(self._run(session_id, version, request))
+
+    def cancel(self, session_id: str) -> None:
+        job = self._jobs.pop(session_id, None)
+        if job is not None and not job.done():
+            job.cancel()
+            self.superseded += 1
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    async def _run(self, session_id: str, version: int, request: Dict) -> None:
+        try:
+            await asyncio.sleep(self.debounce)
+            hint = await self.advise(request)
+            if hint:
+                if await self.deliver(session_id, version, hint):
+                    self.delivered += 1
+                else:
+                    self.stale += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.failed += 1
+            logger.exception("Coaching failed for session %s", session_id)
+        finally:
+            if self._jobs.get(session_id) is asyncio.current_task():
+                del self._jobs[session_id]
+
+    async def close(self) -> None:
+        jobs = list(self._jobs.values())
+        self._jobs.clear()
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._jobs),
+            "submitted": self.submitted,
+            "superseded": self.superseded,
+            "delivered": self.delivered,
+            "stale": self.stale,
+            "failed": self.failed,
+        }
+
+def coaching_request(session: SessionState) -> Dict[str, str]:
+    """Fields for LEADERSHIP_COACHING_PROMPT, taken from the session as it is right now."""
+    team_summary = "\n".join(
+        f"- {member.name} ({member.role}): {member.mood.value}, workload {member.workload}%"
+        for member in session.team_members.values()
+    )
+    recent = session.actions[-COACHING_RECENT_ACTIONS:]
+    recent_actions = "\n".join(
+        f"- {action.type}" + (f" -> {action.target_member}" if action.target_member else "")
+        + (f": {action.message}" if action.message else "")
+        for action in recent
+    ) or "- none yet"
+    return {"team_summary": team_summary, "recent_actions": recent_actions, "phase": session.phase}
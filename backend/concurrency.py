@@ -0,0 +1,32 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List
+
+class SessionLocks:
+    """One asyncio.Lock per session, created on demand and dropped once nobody holds or awaits it."""
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, session_id: str) -> AsyncIterator[None]:
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = self._locks[session_id] = asyncio.Lock()
+        self._users[session_id] = self._users.get(session_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._users[session_id] -= 1
+            if not self._users[session_id]:
+                del self._users[session_id]
+                del self._locks[session_id]
+
+    def held(self) -> List[str]:
+        """Ids of the sessions someone holds or awaits the lock of right now."""
+        return list(self._locks)
+
+    def __len__(self) -> int:
+        return len(self._locks)
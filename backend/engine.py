@@ -0,0 +1,110 @@
+"""
+Headless, deterministic simulation engine.
+
+Everything that changes a session goes through here: the FastAPI layer only
+adds locking, persistence and event fan-out. Randomness comes from the
+session's seed (see `scenarios.action_rng`) and time from an injectable
+clock, so a session is fully determined by its seed, initial team and action
+log - `replay` rebuilds it to any point without a server.
+"""
+
+import random
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from backend.metrics import ACTION_SECONDS
+from backend.models import ActionResponse, SessionState, SimulationAction, TeamMember, TeamSnapshot
+from backend.scenarios import get_initial_team_state, process_action
+from backend.scoring import get_tally
+
+class SimulationEngine:
+    """Applies actions and phase changes to sessions, reading time only from `clock`."""
+
+    def __init__(self, clock: Callable[[], datetime] = datetime.now):
+        self.clock = clock
+
+    def new_session(self, session_id: str, cohort: Optional[str] = None, seed: Optional[int] = None,
+                    team_members: Optional[Dict[str, TeamMember]] = None) -> SessionState:
+        if seed is None:
+            seed = random.getrandbits(32)
+        if team_members is None:
+            team_members = get_initial_team_state()
+        now = self.clock()
+        return SessionState(
+            session_id=session_id,
+            phase="meet_team",
+            cohort=cohort,
+            seed=seed,
+            team_members=team_members,
+            team_history=[TeamSnapshot(version=0, members=team_members)],
+            actions=[],
+            start_time=now,
+            phase_start_time=now,
+        )
+
+    def record(self, session: SessionState, action: SimulationAction, changed_members=(), tally=None) -> None:
+        """Append an action to the session log, bumping the version and the score tally."""
+        if tally is None:
+            tally = get_tally(session)  # Before appending, or a fresh replay would count the action twice
+        version = session.bump_version(changed_members)
+        session.actions.append(action, version)
+        tally.record(action)
+
+    def apply(self, session: SessionState, action: SimulationAction) -> ActionResponse:
+        """Run an action through the scenarios and fold it into the session and its score tally."""
+        tally = get_tally(session)
+        target = session.team_members.get(action.target_member) if action.target_member else None
+        old_workload = target.workload if target else 0
+        before = session.team_members
+
+        started = time.perf_counter()
+        response = process_action(session, action)
+        processed = time.perf_counter()
+
+        # Members are immutable, so any change is a new object
+        session.team_members = response.updated_team_state
+        changed = [key for key, member in session.team_members.items() if before.get(key) is not member]
+        self.record(session, action, changed, tally)
+
+        if target is not None:
+            tally.workload_changed(old_workload, session.team_members[action.target_member].workload)
+        ACTION_SECONDS.observe(processed - started, action.type, "process")
+        ACTION_SECONDS.observe(time.perf_counter() - processed, action.type, "score")
+        return response
+
+    def checkpoint(self, session: SessionState) -> Tuple:
+        """What `rollback` needs to undo the actions applied after this point, without copying the session."""
+        return (len(session.actions), len(session.team_history), session.version,
+                session.team_members, dict(session.member_versions))
+
+    def rollback(self, session: SessionState, checkpoint: Tuple) -> None:
+        """Put the session back as it was at `checkpoint`, dropping every action applied since."""
+        actions, history, version, team_members, member_versions = checkpoint
+        session.actions.truncate(actions)
+        del session.team_history[history:]
+        session.version = version
+        session.team_members = team_members  # apply() replaces the dict rather than changing it
+        session.member_versions = member_versions
+        session._tally = None  # Replayed from the truncated log when next needed
+
+    def advance(self, session: SessionState, phase: str) -> None:
+        session.phase = phase
+        session.phase_start_time = self.clock()
+        session.bump_version()
+
+def replay(seed: int, actions: Iterable[SimulationAction], upto: Optional[int] = None,
+           session_id: str = "replay", team_members: Optional[Dict[str, TeamMember]] = None,
+           clock: Callable[[], datetime] = lambda: datetime.min) -> SessionState:
+    """Rebuild a session from its seed and action log, stopping after `upto` actions.
+
+    Only actions are replayed: phases are wall-clock driven and the debug
+    skip-to-phase workload presets are not part of the log.
+    """
+    engine = SimulationEngine(clock)
+    session = engine.new_session(session_id, seed=seed, team_members=team_members)
+    for index, action in enumerate(actions):
+        if upto is not None and index >= upto:
+            break
+        engine.apply(session, action)
+    return session
@@ -0,0 +1,55 @@
+import asyncio
+import json
+from typing import Dict, Optional, Set
+
+class SessionEventBus:
+    """Fans session events out to every SSE/WebSocket client subscribed to that session.
+
+    Each subscriber gets a bounded queue. A client too slow to keep up has its
+    backlog dropped and receives a single `resync` event instead, telling it to
+    fetch the full state again. A None in the queue means the stream is over.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def subscribe(self, session_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(session_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, session_id: str, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(session_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[session_id]
+
+    def has_subscribers(self, session_id: str) -> bool:
+        return session_id in self._subscribers
+
+    def publish(self, session_id: str, event: str, data: dict, event_id: Optional[int] = None) -> None:
+        for queue in self._subscribers.get(session_id, ()):
+            try:
+                queue.put_nowait((event, data, event_id))
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(("resync", {}, event_id))
+
+    def disconnect(self, session_id: str) -> None:
+        """End every stream subscribed to the session; clients reconnect and land wherever it lives now."""
+        for queue in self._subscribers.pop(session_id, ()):
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+def format_sse(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    """Encode one Server-Sent Events message."""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,236 @@
+"""
+Response cache for the LLM calls in llm_tasks.
+
+Two tiers: an in-process LRU with a TTL, backed by an optional SQLite file
+that survives restarts. Identical prompts that arrive while the first one is
+still waiting on the model share that one upstream call (single flight).
+The wrappers at the bottom keep llm_tasks' signatures, so callers just import
+them from here instead.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+import llm_tasks
+
+WORKLOAD_BUCKET = 10  # Workloads within the same 10% band share responses
+
+class LLMCache:
+    """LRU + TTL memory tier over an optional SQLite tier, with request coalescing."""
+
+    def __init__(self, max_entries: int = 2048, ttl: float = 3600, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()  # key -> (expires, monotonic clock)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_lock = threading.Lock()
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL)"  # wall clock, so entries age across restarts
+            )
+            self._conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+
+    async def get_or_call(self, key: str, call: Callable[[], Awaitable[str]]) -> str:
+        value = self._memory_get(key)
+        if value is not None:
+            self.hits["memory"] += 1
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            try:
+                value = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise  # This caller was cancelled, not the shared call
+                # The caller that owned the upstream call went away; take over from it
+                return await self.get_or_call(key, call)
+            self.coalesced += 1
+            return value
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._disk_get(key)
+            if value is not None:
+                self.hits["disk"] += 1
+            else:
+                self.misses += 1
+                value = await call()
+                await self._disk_put(key, value)
+            self._memory_put(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            # Failures are shared with the waiters but never cached
+            self.errors += 1
+            future.set_exception(exc)
+            future.exception()  # Mark retrieved so an unawaited future doesn't log a warning
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def lookup(self, key: str) -> Optional[str]:
+        """Cached value from either tier, for callers that stream and so cannot share a call."""
+        value = self._memory_get(key)
+        if value is not None:
+            self.hits["memory"] += 1
+            return value
+        value = await self._disk_get(key)
+        if value is not None:
+            self.hits["disk"] += 1
+            self._memory_put(key, value)
+            return value
+        self.misses += 1
+        return None
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+    async def store(self, key: str, value: str) -> None:
+        await self._disk_put(key, value)
+        self._memory_put(key, value)
+
+    def _memory_get(self, key: str) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return entry[1]
+
+    def _memory_put(self, key: str, value: str) -> None:
+        self._memory[key] = (time.monotonic() + self.ttl, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def _disk_get(self, key: str) -> Optional[str]:
+        if self._conn is None:
+            return None
+        return await asyncio.to_thread(self._select, key)
+
+    async def _disk_put(self, key: str, value: str) -> None:
+        if self._conn is not None:
+            await asyncio.to_thread(self._upsert, key, value)
+
+    def _select(self, key: str) -> Optional[str]:
+        with self._conn_lock:
+            row = self._conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND expires_at >= ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def _upsert(self, key: str, value: str) -> None:
+        with self._conn_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + self.ttl),
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.hits["memory"] + self.hits["disk"]
+        lookups = hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._memory),
+            "memory_hits": self.hits["memory"],
+            "disk_hits": self.hits["disk"],
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "errors": self.errors,
+            # Coalesced requests were served without their own upstream call, so they count as hits
+            "hit_rate": round((hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+    def clear(self) -> None:
+        self._memory.clear()
+        if self._conn is not None:
+            with self._conn_lock:
+                self._conn.execute("DELETE FROM llm_cache")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+def normalize_message(message: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation, so trivially different texts match."""
+    return re.sub(r"\s+", " ", message.lower()).strip().rstrip(".!?")
+
+def cache_key(kind: str, **fields) -> str:
+    """Stable key over the prompt inputs that actually change the model's answer."""
+    for name, value in fields.items():
+        if name == "workload" and isinstance(value, (int, float)):
+            fields[name] = int(value) // WORKLOAD_BUCKET * WORKLOAD_BUCKET
+        elif name in ("message", "user_message") and isinstance(value, str):
+            fields[name] = normalize_message(value)
+    payload = json.dumps([kind, fields], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+llm_cache = LLMCache(
+    max_entries=int(os.environ.get("LLM_CACHE_SIZE", "2048")),
+    ttl=float(os.environ.get("LLM_CACHE_TTL", "3600")),  # seconds
+    path=os.environ.get("LLM_CACHE_PATH") or None,
+)
+
+async def get_character_response(character_name: str, prompt_type: str, **kwargs) -> str:
+    key = cache_key("character", character_name=character_name, prompt_type=prompt_type, **kwargs)
+    return await llm_cache.get_or_call(
+        key, lambda: llm_tasks.get_character_response(character_name, prompt_type, **kwargs)
+    )
+
+async def stream_character_response(character_name: str, prompt_type: str, **kwargs) -> AsyncIterator[str]:
+    """Cached text in one chunk, or the model's chunks, cached once the stream has run to the end."""
+    key = cache_key("character", character_name=character_name, prompt_type=prompt_type, **kwargs)
+    cached = await llm_cache.lookup(key)
+    if cached is not None:
+        yield cached
+        return
+    if llm_cache.in_flight(key):
+        # Someone (usually a prefetch) is already generating exactly this; share it rather than ask twice
+        yield await llm_cache.get_or_call(
+            key, lambda: llm_tasks.get_character_response(character_name, prompt_type, **kwargs)
+        )
+        return
+    chunks = []
+    async for chunk in llm_tasks.stream_character_response(character_name, prompt_type, **kwargs):
+        chunks.append(chunk)
+        yield chunk
+    # Not reached when the consumer gives up early, so cut-off replies are never cached
+    await llm_cache.store(key, "".join(chunks))
+
+async def get_coaching_advice(session_data: dict) -> str:
+    return await llm_cache.get_or_call(
+        cache_key("coaching", **session_data), lambda: llm_tasks.get_coaching_advice(session_data)
+    )
+
+async def generate_dynamic_scenario(team_state: dict) -> str:
+    return await llm_cache.get_or_call(
+        cache_key("scenario", **team_state), lambda: llm_tasks.generate_dynamic_scenario(team_state)
+    )
@@ -0,0 +1,231 @@
+"""
+Gateway between the app and LLM providers.
+
+One pooled httpx client is shared by every provider; each provider has its
+own concurrency semaphore, and every call runs against a latency budget that
+covers both the wait for a slot and the request itself. Callers pass the
+scripted text they already have as the fallback, so a slow or failing model
+degrades to the placeholder reactions instead of slowing the meeting down.
+
+Providers speak the OpenAI-style chat completions protocol. Nothing is
+enabled unless LLM_API_URL is set.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from backend.models import SimulationAction, TeamMember
+
+logger = logging.getLogger(__name__)
+
+class LLMUnavailable(Exception):
+    """No provider is configured, or the provider returned nothing usable."""
+
+class LLMProvider:
+    def __init__(self, name: str, url: str, api_key: Optional[str] = None, model: Optional[str] = None,
+                 max_concurrency: int = 8):
+        self.name = name
+        self.url = url
+        self.api_key = api_key
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+
+class LLMGateway:
+    """Concurrency-limited, deadline-bounded access to the configured providers."""
+
+    def __init__(self, providers: Dict[str, LLMProvider], default: Optional[str] = None,
+                 max_connections: int = 32, deadline: float = 1.5, max_tokens: int = 120):
+        self.providers = providers
+        self.default = default or next(iter(providers), None)
+        self.max_connections = max_connections
+        self.deadline = deadline
+        self.max_tokens = max_tokens
+        self._client: Optional[httpx.AsyncClient] = None
+        self.calls = 0
+        self.fallbacks = {"timeout": 0, "error": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.default is not None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                timeout=httpx.Timeout(30.0, connect=5.0),  # Outer bound only; the deadline is enforced per call
+            )
+        return self._client
+
+    def _request(self, system: str, prompt: str, provider: Optional[str], stream: bool = False):
+        """(provider, body, headers) for one chat completion request."""
+        name = provider or self.default
+        if name is None:
+            raise LLMUnavailable("No LLM provider configured")
+        target = self.providers[name]
+
+        headers = {"Authorization": f"Bearer {target.api_key}"} if target.api_key else {}
+        body = {
+            "messages": [{"role": "system", "content": system}, {"role": "user", "content": prompt}],
+            "max_tokens": self.max_tokens,
+        }
+        if target.model:
+            body["model"] = target.model
+        if stream:
+            body["stream"] = True
+        return target, body, headers
+
+    async def complete(self, system: str, prompt: str, provider: Optional[str] = None) -> str:
+        """One chat completion; waits for a free slot on the provider first."""
+        target, body, headers = self._request(system, prompt, provider)
+
+        async with target.semaphore:
+            self.calls += 1
+            target.in_flight += 1
+            try:
+                response = await self._get_client().post(target.url, json=body, headers=headers)
+            finally:
+                target.in_flight -= 1
+        response.raise_for_status()
+        try:
+            text = response.json()["choices"][0]["message"]["content"].strip()
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError) as exc:
+            raise LLMUnavailable(f"Unexpected response from {target.name}") from exc
+        if not text:
+            raise LLMUnavailable(f"Empty response from {target.name}")
+        return text
+
+    async def stream(self, system: str, prompt: str, provider: Optional[str] = None) -> AsyncIterator[str]:
+        """Text chunks of one streamed chat completion, holding a provider slot until it ends."""
+        target, body, headers = self._request(system, prompt, provider, stream=True)
+
+        async with target.semaphore:
+            self.calls += 1
+            target.in_flight += 1
+            try:
+                async with self._get_client().stream("POST", target.url, json=body, headers=headers) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        try:
+                            text = json.loads(data)["choices"][0]["delta"].get("content")
+                        except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+                            continue  # Role-only or keep-alive frames
+                        if text:
+                            yield text
+            finally:
+                target.in_flight -= 1
+
+    async def stream_with_fallback(self, chunks: AsyncIterator[str], fallback: Optional[str],
+                                   deadline: Optional[float] = None, budget: float = 20.0) -> AsyncIterator[str]:
+        """Chunks of `chunks`, or `fallback` in one piece when no text arrives within the deadline.
+
+        Only the first chunk is held to the (short) deadline; once text is
+        flowing, a stall or failure just ends the stream early, and the whole
+        stream is cut off after `budget` seconds. Never raises.
+        """
+        if not self.enabled:
+            if fallback:
+                yield fallback
+            return
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        first_deadline = deadline if deadline is not None else self.deadline
+        iterator = chunks.__aiter__()
+        streamed = False
+        try:
+            while True:
+                timeout = first_deadline if not streamed else budget - (loop.time() - started)
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), max(0.0, timeout))
+                except StopAsyncIteration:
+                    break
+                streamed = True
+                yield chunk
+        except asyncio.TimeoutError:
+            self.fallbacks["timeout"] += 1
+        except Exception:
+            self.fallbacks["error"] += 1
+            logger.warning("LLM stream failed, using the scripted text", exc_info=True)
+        finally:
+            await iterator.aclose()
+        if not streamed and fallback:
+            yield fallback
+
+    async def with_fallback(self, call: Callable[[], Awaitable[str]], fallback: Optional[str],
+                            deadline: Optional[float] = None) -> Optional[str]:
+        """Result of `call()` if it finishes within the deadline, else `fallback`. Never raises."""
+        if not self.enabled:
+            return fallback
+        try:
+            return await asyncio.wait_for(call(), deadline if deadline is not None else self.deadline)
+        except asyncio.TimeoutError:
+            self.fallbacks["timeout"] += 1
+        except Exception:
+            self.fallbacks["error"] += 1
+            logger.warning("LLM call failed, using the scripted text", exc_info=True)
+        return fallback
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "calls": self.calls,
+            "fallbacks": dict(self.fallbacks),
+            "deadline": self.deadline,
+            "providers": {
+                name: {"max_concurrency": provider.max_concurrency, "in_flight": provider.in_flight}
+                for name, provider in self.providers.items()
+            },
+        }
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+def reaction_prompt(action: SimulationAction, member: Optional[TeamMember],
+                    task_name: Optional[str] = None) -> Optional[Tuple[str, Dict]]:
+    """(prompt_type, prompt fields) for a one-character reaction, or None when there is none to ask for."""
+    if member is None:
+        return None
+    if action.type == "delegate_task":
+        return "delegation", {
+            "task_name": task_name or action.task_id,
+            "workload": member.workload,
+            "mood": member.mood.value,
+            "message": action.message or "",
+        }
+    if action.type in ("send_message", "ask_question"):
+        return "conversation", {"user_message": action.message or "", "mood": member.mood.value}
+    return None
+
+def gateway_from_env() -> LLMGateway:
+    providers = {}
+    url = os.environ.get("LLM_API_URL")
+    if url:
+        name = os.environ.get("LLM_PROVIDER", "default")
+        providers[name] = LLMProvider(
+            name,
+            url,
+            api_key=os.environ.get("LLM_API_KEY"),
+            model=os.environ.get("LLM_MODEL"),
+            max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", "8")),
+        )
+    return LLMGateway(
+        providers,
+        max_connections=int(os.environ.get("LLM_MAX_CONNECTIONS", "32")),
+        deadline=float(os.environ.get("LLM_DEADLINE", "1.5")),  # seconds
+    )
+
+llm_gateway = gateway_from_env()
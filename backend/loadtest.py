@@ -0,0 +1,266 @@
+"""
+Virtual-user load generator for the whole session lifecycle.
+
+Every virtual user starts a session, then alternates think time, a state poll
+(?since + If-None-Match, like the frontend) and an action drawn from a
+realistic mix, and finally skips to the end and fetches its results. Users
+are started evenly over the ramp-up, so the progress lines on stderr show
+where throughput stops growing and latency takes off.
+
+Runs in-process over an ASGI transport (the app's lifespan included) or
+against a running server:
+
+    python -m backend.loadtest --users 500 --ramp 30
+    python -m backend.loadtest --url http://127.0.0.1:5001 --users 2000 --ramp 120 --pid 12345
+
+Reports throughput, p50/p95/p99 latency and error rate per endpoint and the
+server's resident memory (read from /proc, so Linux only; pass --pid when
+the server is another process).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from array import array
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+
+import httpx
+
+from backend.scenarios import TASK_CATALOG, get_initial_team_state
+
+# (action type, share of actions); roughly what students do in the meeting
+ACTION_MIX = (("delegate_task", 0.45), ("send_message", 0.30), ("ask_question", 0.15), ("address_conflict", 0.10))
+
+MESSAGES = (
+    "Thanks for jumping on this, great work so far!",
+    "I need this ASAP, please check in with me every hour.",
+    "How is your workload looking this week?",
+    "Let me know if you need any help.",
+    "Can you walk me through your plan?",
+    "I believe you are the right person for this.",
+)
+
+CONFLICT_APPROACHES = ("address_both", "private_meetings", "neutral")
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(q / 100 * len(values))) - 1))]
+
+def read_rss(pid: int) -> Optional[int]:
+    """Resident set size of `pid` in bytes, or None where /proc isn't available."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+class LoadStats:
+    """Latencies and failures per endpoint, plus a window for the periodic progress line."""
+
+    def __init__(self):
+        self.latencies: Dict[str, array] = {}
+        self.errors: Dict[str, int] = {}
+        self.statuses: Dict[int, int] = {}
+        self.window = array("d")
+        self.completed_users = 0
+        self.failed_users = 0
+
+    def record(self, endpoint: str, seconds: float, status: Optional[int]) -> None:
+        self.latencies.setdefault(endpoint, array("d")).append(seconds)
+        self.window.append(seconds)
+        if status is None or status >= 400:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+        if status is not None:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    @property
+    def requests(self) -> int:
+        return sum(len(values) for values in self.latencies.values())
+
+    def take_window(self) -> List[float]:
+        window, self.window = sorted(self.window), array("d")
+        return window
+
+    def summary(self, elapsed: float) -> Dict:
+        endpoints = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            ordered = sorted(values)
+            endpoints[endpoint] = {
+                "requests": len(ordered),
+                "errors": self.errors.get(endpoint, 0),
+                "error_rate": round(self.errors.get(endpoint, 0) / len(ordered), 4),
+                "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+                "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+                "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+                "max_ms": round(ordered[-1] * 1000, 2),
+            }
+        requests = self.requests
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "requests": requests,
+            "throughput_rps": round(requests / elapsed, 1) if elapsed else 0.0,
+            "error_rate": round(sum(self.errors.values()) / requests, 4) if requests else 0.0,
+            "users_completed": self.completed_users,
+            "users_failed": self.failed_users,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+            "endpoints": endpoints,
+        }
+
+async def timed(client: httpx.AsyncClient, stats: LoadStats, endpoint: str, method: str, url: str,
+                **kwargs) -> Optional[httpx.Response]:
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError:
+        stats.record(endpoint, time.perf_counter() - started, None)
+        return None
+    stats.record(endpoint, time.perf_counter() - started, response.status_code)
+    return response
+
+def random_action(rng: random.Random) -> Dict:
+    kinds, weights = zip(*ACTION_MIX)
+    kind = rng.choices(kinds, weights)[0]
+    members = list(get_initial_team_state())
+    if kind == "delegate_task":
+        return {"type": kind, "target_member": rng.choice(members), "task_id": rng.choice(TASK_CATALOG.tasks).id}
+    if kind == "address_conflict":
+        return {"type": kind, "data": {"approach": rng.choice(CONFLICT_APPROACHES)}}
+    return {"type": kind, "target_member": rng.choice(members), "message": rng.choice(MESSAGES)}
+
+async def virtual_user(client: httpx.AsyncClient, stats: LoadStats, rng: random.Random,
+                       actions: int, think: float) -> None:
+    """One student's meeting: start, then poll/act with think times in between, then finish and score."""
+    response = await timed(client, stats, "POST /session/start", "POST", "/api/session/start",
+                           params={"cohort": "loadtest"})
+    if response is None or response.status_code != 200:
+        stats.failed_users += 1
+        return
+    base = f"/api/session/{response.json()['session_id']}"
+    version, etag = -1, None
+
+    for _ in range(actions):
+        if think > 0:
+            await asyncio.sleep(rng.expovariate(1 / think))
+        headers = {"If-None-Match": etag} if etag else {}
+        response = await timed(client, stats, "GET /state", "GET", f"{base}/state",
+                               params={"since": version}, headers=headers)
+        if response is not None and response.status_code == 200:
+            version, etag = response.json()["version"], response.headers.get("etag")
+        await timed(client, stats, "POST /action", "POST", f"{base}/action", json=random_action(rng),
+                    headers={"Idempotency-Key": str(uuid.UUID(int=rng.getrandbits(128)))})
+
+    await timed(client, stats, "POST /skip-to-phase", "POST", f"{base}/skip-to-phase", json={"phase": "completed"})
+    response = await timed(client, stats, "GET /results", "GET", f"{base}/results")
+    if response is not None and response.status_code == 200:
+        stats.completed_users += 1
+    else:
+        stats.failed_users += 1
+
+async def report_progress(stats: LoadStats, started: float, active: List[int], rss_pid: Optional[int],
+                          every: float, memory: Dict[str, int]) -> None:
+    last_requests, last_time = 0, started
+    while True:
+        await asyncio.sleep(every)
+        now = time.perf_counter()
+        window = stats.take_window()
+        rss = read_rss(rss_pid) if rss_pid else None
+        if rss:
+            memory["peak"] = max(memory.get("peak", 0), rss)
+        requests = stats.requests
+        print(f"[{now - started:6.1f}s] users {active[0]:5d}  {(requests - last_requests) / (now - last_time):7.1f} req/s"
+              f"  p95 {percentile(window, 95) * 1000:7.1f} ms  errors {sum(stats.errors.values())}"
+              + (f"  rss {rss / 2 ** 20:.0f} MB" if rss else ""), file=sys.stderr)
+        last_requests, last_time = requests, now
+
+async def run(users: int, ramp: float = 10.0, actions: int = 10, think: float = 2.0, url: Optional[str] = None,
+              connections: int = 200, pid: Optional[int] = None, seed: int = 0, progress_every: float = 5.0) -> Dict:
+    """Drive `users` virtual users and return the summary report."""
+    if url:
+        client = httpx.AsyncClient(base_url=url, timeout=60,
+                                   limits=httpx.Limits(max_connections=connections,
+                                                       max_keepalive_connections=connections))
+        lifespan = nullcontext()
+        rss_pid = pid
+    else:
+        from backend.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=60)
+        lifespan = app.router.lifespan_context(app)
+        rss_pid = os.getpid()  # Includes the load generator itself
+
+    stats = LoadStats()
+    memory: Dict[str, int] = {}
+    active = [0]
+    rng = random.Random(seed)
+
+    async def user(delay: float, user_rng: random.Random) -> None:
+        await asyncio.sleep(delay)
+        active[0] += 1
+        try:
+            await virtual_user(client, stats, user_rng, actions, think)
+        finally:
+            active[0] -= 1
+
+    async with lifespan, client:
+        memory["start"] = read_rss(rss_pid) if rss_pid else None
+        started = time.perf_counter()
+        reporter = asyncio.create_task(report_progress(stats, started, active, rss_pid, progress_every, memory))
+        try:
+            await asyncio.gather(*(
+                user(ramp * index / users, random.Random(rng.getrandbits(64))) for index in range(users)
+            ))
+        finally:
+            reporter.cancel()
+        elapsed = time.perf_counter() - started
+        memory["end"] = read_rss(rss_pid) if rss_pid else None
+
+    report = stats.summary(elapsed)
+    report["users"] = users
+    report["rss_mb"] = {key: round(value / 2 ** 20, 1) for key, value in memory.items() if value}
+    return report
+
+def print_report(report: Dict) -> None:
+    print(f"{report['users']} users, {report['requests']} requests in {report['elapsed_s']}s: "
+          f"{report['throughput_rps']} req/s, error rate {report['error_rate']:.2%}, "
+          f"{report['users_completed']} meetings completed, {report['users_failed']} failed")
+    print(f"{'endpoint':<22}{'requests':>10}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for endpoint, row in report["endpoints"].items():
+        print(f"{endpoint:<22}{row['requests']:>10}{row['errors']:>8}{row['p50_ms']:>10}"
+              f"{row['p95_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}")
+    if report["rss_mb"]:
+        print("server RSS (MB): " + ", ".join(f"{key} {value}" for key, value in report["rss_mb"].items()))
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Drive virtual users through start, polling, actions and results.")
+    parser.add_argument("--users", type=int, default=100, help="Virtual users (one meeting each)")
+    parser.add_argument("--ramp", type=float, default=10.0, help="Seconds over which users are started")
+    parser.add_argument("--actions", type=int, default=10, help="Actions per user")
+    parser.add_argument("--think", type=float, default=2.0, help="Mean think time between actions, in seconds")
+    parser.add_argument("--url", help="Base URL of a running server (default: in-process over ASGI)")
+    parser.add_argument("--connections", type=int, default=200, help="HTTP connection pool size (--url only)")
+    parser.add_argument("--pid", type=int, help="Server process to sample RSS from (--url only)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--progress-every", type=float, default=5.0, help="Seconds between progress lines")
+    parser.add_argument("--json", help="Also write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args.users, args.ramp, args.actions, args.think, args.url, args.connections,
+                             args.pid, args.seed, args.progress_every))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    return 1 if report["error_rate"] > 0.01 else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,148 +1,788 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request, Response, WebSocket
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
 from typing import Dict, List, Optional
-import uuid
+import asyncio
+import hashlib
+import os
 import json
+import time
 from datetime import datetime
 
-from backend.models import SessionState, SimulationAction, ActionResponse, SessionResults
-from backend.scenarios import get_initial_team_state, process_action, get_available_tasks
-from backend.scoring import calculate_final_scores
+from backend.models import (
+    SessionState, SessionDelta, SimulationAction, ActionResponse, ActionResult,
+    BatchActionRequest, BatchActionResponse, SessionResults, CompetencyScore,
+    StoredResponse, TimelinePoint, STATE_EXCLUDE
+)
+from backend.analytics import CohortAnalytics, COMPETENCIES
+from backend.concurrency import SessionLocks
+from backend.engine import SimulationEngine
+from backend.scoring import build_session_results, calculate_final_scores, get_tally
+from backend.events import SessionEventBus, format_sse
+from backend.scheduler import PhaseScheduler, PHASE_SCHEDULE
+from backend.coaching import CoachingQueue, coaching_request
+from backend.llm_cache import get_character_response, get_coaching_advice, llm_cache, stream_character_response
+from backend.llm_gateway import llm_gateway, reaction_prompt
+from backend.prefetch import ReactionPrefetcher
+from backend.scenarios import TASK_CATALOG
+from backend.session_store import SessionStore, MemorySessionStore, SQLiteSessionStore, compact_session, restore_session
+from backend.cluster import FORWARDED_HEADER, SECRET_HEADER, ClusterMiddleware, cluster_from_env
+from backend.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE, LOOP_LAG_SECONDS, REQUEST_SECONDS, SERIALIZATION_SECONDS,
+    LoopLagMonitor, MetricsMiddleware, registry as metrics_registry,
+)
+from backend.profiling import ProfilingMiddleware
 
-# TODO: Import LLM integration when ready
-# from llm_tasks import get_coaching_advice, generate_dynamic_scenario
+# TODO: Generate conflicts with generate_dynamic_scenario (backend.llm_cache) when ready
 
-app = FastAPI(title="Executive Function POC", version="1.0.0")
+# Session storage: hot sessions stay in memory, everything is persisted to SQLite
+SESSION_DB_PATH = os.environ.get("SESSION_DB_PATH", "sessions.db")
+SESSION_HOT_CAPACITY = int(os.environ.get("SESSION_HOT_CAPACITY", "1000"))
+SESSION_IDLE_TTL = float(os.environ.get("SESSION_IDLE_TTL", "900"))  # seconds
+SESSION_MEMORY_BUDGET_MB = float(os.environ.get("SESSION_MEMORY_BUDGET_MB", "256"))
+SESSION_SWEEP_INTERVAL = float(os.environ.get("SESSION_SWEEP_INTERVAL", "30"))  # seconds
+
+if os.environ.get("SESSION_STORE", "sqlite") == "memory":
+    session_store: SessionStore = MemorySessionStore()
+else:
+    session_store = SQLiteSessionStore(
+        SESSION_DB_PATH,
+        hot_capacity=SESSION_HOT_CAPACITY,
+        idle_ttl=SESSION_IDLE_TTL,
+        memory_budget=int(SESSION_MEMORY_BUDGET_MB * 1024 * 1024),
+    )
+
+# Sessions are sharded over CLUSTER_NODES by consistent hashing; a no-op for a single process
+cluster = cluster_from_env()
+if cluster.enabled and isinstance(session_store, MemorySessionStore):
+    raise RuntimeError("CLUSTER_NODES needs the shared SQLite session store, not SESSION_STORE=memory")
+
+# All session changes go through the engine; it reads time only from its clock
+engine = SimulationEngine()
+
+# Score columns of every compacted session, for cohort-level statistics
+cohort_analytics = CohortAnalytics()
+
+# Serializes writers per session without a global lock
+session_locks = SessionLocks()
+
+# Upper bound on actions accepted by one batch request
+MAX_BATCH_ACTIONS = 100
+
+# Push channel for SSE/WebSocket subscribers
+event_bus = SessionEventBus()
+EVENT_KEEPALIVE_SECONDS = 15
+
+# Event-loop lag is sampled in the background; everything else is recorded where it happens
+METRICS_LOOP_INTERVAL = float(os.environ.get("METRICS_LOOP_INTERVAL", "0.5"))  # seconds
+loop_lag_monitor = LoopLagMonitor(LOOP_LAG_SECONDS, METRICS_LOOP_INTERVAL)
+metrics_registry.gauge("event_loop_lag_current_seconds",
+                       "Lag of the latest event-loop sample, and the worst one since the previous scrape.",
+                       loop_lag_monitor.collect, ("sample",))
+metrics_registry.gauge("simulation_sessions", "Live (not yet compacted) sessions by phase.",
+                       lambda: [((phase,), count) for phase, count in sorted(session_store.phase_counts().items())],
+                       ("phase",))
+metrics_registry.gauge("session_store_sessions", "Live sessions in the store, and those held in memory.",
+                       lambda: [(("stored",), len(session_store)), (("hot",), session_store.hot_count)], ("tier",))
+if isinstance(session_store, SQLiteSessionStore):
+    metrics_registry.gauge("session_store_hot_bytes", "Serialized size of the sessions held in memory.",
+                           lambda: [((), session_store.hot_bytes)])
+
+# Per-request CPU profiles for callers presenting PROFILE_SECRET; off (and not installed) when unset
+PROFILE_SECRET = os.environ.get("PROFILE_SECRET") or None
+PROFILE_DIR = os.environ.get("PROFILE_DIR") or None  # profiles are returned inline when unset
+
+async def sweep_sessions():
+    """Periodically push idle sessions out of memory."""
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+        session_store.sweep()
+
+def advance_phase(session_id: str, phase: str) -> None:
+    """Scheduler callback: `phase` ran out of time, move the session on."""
+    session = session_store.get(session_id)
+    if session is None or session.phase != phase:
+        return  # Compacted, or moved on by other means since the deadline was set
+    
+    version_before = session.version
+    engine.advance(session, PHASE_SCHEDULE[phase][0])
+    session_store.save(session)
+    phase_scheduler.schedule(session_id, session.phase)
+    refresh_prefetch(session)
+    publish_changes(session, version_before, phase)
+
+phase_scheduler = PhaseScheduler(advance_phase)
+
+def schedule_phase_deadline(session_id: str, phase: str, phase_start_time: datetime) -> None:
+    """Arm the scheduler for a session whose phase started at `phase_start_time` (wall clock)."""
+    if phase in PHASE_SCHEDULE:
+        elapsed = (engine.clock() - phase_start_time).total_seconds()
+        phase_scheduler.schedule(session_id, phase, PHASE_SCHEDULE[phase][1] - elapsed)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    cohort_analytics.sync(session_store.iter_record_scores())
+    if cluster.enabled:
+        session_store.recount(cluster.owns)  # Each node counts the sessions it owns
+    
+    # Re-arm deadlines for meetings that were running when the process last stopped
+    for session_id, phase, phase_start_time in session_store.iter_live_phases():
+        if cluster.owns(session_id):
+            schedule_phase_deadline(session_id, phase, phase_start_time)
+    
+    sweeper = asyncio.create_task(sweep_sessions())
+    scheduler = asyncio.create_task(phase_scheduler.run())
+    loop_lag = asyncio.create_task(loop_lag_monitor.run())
+    yield
+    loop_lag.cancel()
+    scheduler.cancel()
+    sweeper.cancel()
+    await coaching_queue.close()
+    await reaction_prefetcher.close()
+    session_store.close()
+    llm_cache.close()
+    await llm_gateway.aclose()
+    await cluster.aclose()
+
+app = FastAPI(title="Executive Function POC", version="1.0.0", lifespan=lifespan)
+if PROFILE_SECRET:
+    app.add_middleware(ProfilingMiddleware, secret=PROFILE_SECRET, directory=PROFILE_DIR)
+# Inside the cluster routing, so each request is recorded on the node that served it
+app.add_middleware(MetricsMiddleware, histogram=REQUEST_SECONDS)
+app.add_middleware(ClusterMiddleware, cluster=cluster)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="frontend"), name="static")
 
-# In-memory session storage (use Redis/DB in production)
-sessions: Dict[str, SessionState] = {}
+async def advise(request: Dict) -> Optional[str]:
+    return await llm_gateway.with_fallback(lambda: get_coaching_advice(request), None, COACHING_DEADLINE)
+
+async def deliver_coaching(session_id: str, version: int, hint: str) -> bool:
+    """Attach a finished hint to the session; clients pick it up from the next delta or push.
+
+    The hint is about the session at `version`; if anything changed since, it
+    is dropped (a newer request is already on its way if an action did it),
+    as is a hint for a session this node has since handed to another.
+    """
+    async with session_locks.hold(session_id):
+        if not cluster.owns(session_id):
+            return False
+        session = session_store.get(session_id)
+        if session is None or session.phase == "completed" or session.version != version:
+            return False
+        version_before = session.version
+        session.coaching_hint = hint
+        session.bump_version()
+        session_store.save(session)
+    publish_changes(session, version_before, session.phase)
+    return True
+
+# Coaching runs in the background, debounced per session, so it never adds to action latency
+COACHING_DEBOUNCE = float(os.environ.get("COACHING_DEBOUNCE", "2"))  # seconds
+COACHING_DEADLINE = float(os.environ.get("COACHING_DEADLINE", "10"))  # seconds
+coaching_queue = CoachingQueue(advise, deliver_coaching, debounce=COACHING_DEBOUNCE)
+
+def request_coaching(session: SessionState) -> None:
+    if llm_gateway.enabled and session.phase != "completed":
+        coaching_queue.submit(session.session_id, session.version, coaching_request(session))
+
+async def warm_reaction(member_id: str, prompt_type: str, fields: Dict) -> None:
+    await llm_gateway.with_fallback(
+        lambda: get_character_response(member_id, prompt_type, **fields), None, PREFETCH_DEADLINE
+    )
+
+# Delegation reactions are generated ahead of time while the user is still meeting the team
+PREFETCH_BUDGET = int(os.environ.get("PREFETCH_BUDGET", "6"))  # upstream calls per session
+PREFETCH_CONCURRENCY = int(os.environ.get("PREFETCH_CONCURRENCY", "2"))
+PREFETCH_DEADLINE = float(os.environ.get("PREFETCH_DEADLINE", "20"))  # seconds
+reaction_prefetcher = ReactionPrefetcher(warm_reaction, budget=PREFETCH_BUDGET, concurrency=PREFETCH_CONCURRENCY)
+
+def refresh_prefetch(session: SessionState) -> None:
+    if llm_gateway.enabled and PREFETCH_BUDGET > 0:
+        reaction_prefetcher.refresh(session)
+
+def load_session(session_id: str) -> SessionState:
+    """Fetch a session from the store or fail with 404."""
+    session = session_store.get(session_id)
+    if session is None:
+        if session_store.get_record(session_id) is not None:
+            raise HTTPException(status_code=409, detail="Session already completed")
+        raise HTTPException(status_code=404, detail="Session not found")
+    if session.phase != "completed" and not phase_scheduler.is_scheduled(session_id):
+        schedule_phase_deadline(session_id, session.phase, session.phase_start_time)
+    return session
+
+# Responses kept per session for Idempotency-Key retries
+IDEMPOTENCY_WINDOW = 32
+
+def request_fingerprint(endpoint: str, payload: BaseModel) -> str:
+    return hashlib.sha256(f"{endpoint}:{payload.model_dump_json()}".encode()).hexdigest()
+
+def stored_response(session: SessionState, key: Optional[str], fingerprint: Optional[str]):
+    """The response already given for this Idempotency-Key, or None to go ahead. Call under the session lock."""
+    stored = session.idempotent_responses.get(key) if key else None
+    if stored is None:
+        return None
+    if stored.request_hash != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    team = session.team_at(stored.version)
+    if stored.batch:
+        return BatchActionResponse(results=stored.results, updated_team_state=team, phase=stored.phase,
+                                   version=stored.version)
+    result = stored.results[0]
+    return ActionResponse(
+        success=result.success,
+        message=result.message,
+        team_member_reaction=result.team_member_reaction,
+        mood_change=result.mood_change,
+        updated_team_state=team,
+        consequences=result.consequences,
+    )
+
+def remember_response(session: SessionState, key: Optional[str], fingerprint: Optional[str],
+                      results: List[ActionResult], batch: bool = False) -> None:
+    """Keep what a retry needs; saved together with the state change it describes."""
+    if not key:
+        return
+    responses = session.idempotent_responses
+    responses[key] = StoredResponse(request_hash=fingerprint, version=session.version, phase=session.phase,
+                                    results=results, batch=batch)
+    while len(responses) > IDEMPOTENCY_WINDOW:
+        del responses[next(iter(responses))]
+
+async def remember_reaction(session_id: str, key: Optional[str], reaction: Optional[str]) -> None:
+    """Bring a stored response up to date with the reaction the model wrote after it was saved."""
+    if not key:
+        return
+    async with session_locks.hold(session_id):
+        if not cluster.owns(session_id):
+            return  # Handed off meanwhile; the stored response keeps its scripted reaction
+        session = session_store.get(session_id)
+        stored = session.idempotent_responses.get(key) if session is not None else None
+        if stored is None or stored.results[0].team_member_reaction == reaction:
+            return
+        # Replaced, not changed in place: a queued write may still be holding the old one
+        result = stored.results[0].model_copy(update={"team_member_reaction": reaction})
+        session.idempotent_responses[key] = stored.model_copy(update={"results": [result, *stored.results[1:]]})
+        session_store.save(session)
+
+def dump_json(model: BaseModel, form: str, **kwargs) -> Dict:
+    """`model.model_dump(mode="json")`, timed into the serialization histogram as `form`."""
+    started = time.perf_counter()
+    data = model.model_dump(mode="json", **kwargs)
+    SERIALIZATION_SECONDS.observe(time.perf_counter() - started, form)
+    return data
+
+def build_state_delta(session: SessionState, since: int) -> SessionDelta:
+    """Collect the team members and actions that changed after version `since`."""
+    if since > session.version:
+        since = -1  # Client is ahead of us (e.g. stale cache) - resend everything
+    first_new_action = session.actions.first_after(since)
+    return SessionDelta(
+        session_id=session.session_id,
+        version=session.version,
+        since=since,
+        phase=session.phase,
+        phase_start_time=session.phase_start_time,
+        team_members={key: member for key, member in session.team_members.items()
+                      if session.member_versions.get(key, 0) > since},
+        actions=session.actions[first_new_action:],
+        coaching_hint=session.coaching_hint,
+    )
+
+def _llm_prompt(session: SessionState, action: SimulationAction, response: ActionResponse):
+    """(prompt_type, fields) to ask the model for this action's reaction, or None to keep the scripted one."""
+    if not llm_gateway.enabled or not response.success:
+        return None
+    member = session.team_members.get(action.target_member) if action.target_member else None
+    task = TASK_CATALOG.get(action.task_id) if action.task_id else None
+    return reaction_prompt(action, member, task.name if task else None)
+
+async def llm_reaction(session: SessionState, action: SimulationAction, response: ActionResponse) -> None:
+    """Swap the scripted reaction for the model's if it answers within the gateway deadline."""
+    prompt = _llm_prompt(session, action, response)
+    if prompt is None:
+        return
+    prompt_type, fields = prompt
+    response.team_member_reaction = await llm_gateway.with_fallback(
+        lambda: get_character_response(action.target_member, prompt_type, **fields),
+        response.team_member_reaction,
+    )
+
+async def stream_llm_reaction(session: SessionState, action: SimulationAction, response: ActionResponse):
+    """Chunks of the model's reaction as it is written; the scripted reaction if the model is off or slow."""
+    prompt = _llm_prompt(session, action, response)
+    if prompt is None:
+        if response.team_member_reaction:
+            yield response.team_member_reaction
+        return
+    prompt_type, fields = prompt
+    chunks = stream_character_response(action.target_member, prompt_type, **fields)
+    async for chunk in llm_gateway.stream_with_fallback(chunks, response.team_member_reaction):
+        yield chunk
+
+def summarize_action(action: SimulationAction, response: ActionResponse) -> ActionResult:
+    return ActionResult(
+        type=action.type,
+        target_member=action.target_member,
+        success=response.success,
+        message=response.message,
+        team_member_reaction=response.team_member_reaction,
+        mood_change=response.mood_change,
+        consequences=response.consequences,
+    )
+
+def publish_changes(session: SessionState, since: int, phase_before: str, results: List[ActionResult] = ()) -> None:
+    """Push what changed after version `since` to anyone subscribed to the session."""
+    if not event_bus.has_subscribers(session.session_id):
+        return
+    
+    for result in results:
+        event_bus.publish(session.session_id, "reaction", result.model_dump(mode="json"), session.version)
+    if session.phase != phase_before:
+        event_bus.publish(session.session_id, "phase", {
+            "phase": session.phase,
+            "phase_start_time": session.phase_start_time.isoformat(),
+            "version": session.version,
+        }, session.version)
+    delta = build_state_delta(session, since)
+    event_bus.publish(session.session_id, "state", dump_json(delta, "event"), session.version)
 
 @app.get("/")
 async def read_root():
     return FileResponse("frontend/index.html")
 
 @app.post("/api/session/start")
-async def start_session() -> Dict[str, str]:
-    session_id = str(uuid.uuid4())
-    sessions[session_id] = SessionState(
-        session_id=session_id,
-        phase="meet_team",
-        team_members=get_initial_team_state(),
-        actions=[],
-        start_time=datetime.now(),
-        phase_start_time=datetime.now(),
-        available_tasks=get_available_tasks()
-    )
+async def start_session(cohort: Optional[str] = None) -> Dict[str, str]:
+    session_id = cluster.new_session_id()
+    session = engine.new_session(session_id, cohort)
+    session_store.save(session)
+    phase_scheduler.schedule(session_id, session.phase)
+    refresh_prefetch(session)
     return {"session_id": session_id}
 
-@app.get("/api/session/{session_id}/state")
-async def get_session_state(session_id: str) -> SessionState:
-    if session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    return sessions[session_id]
+@app.get("/api/session/{session_id}/state", response_model=SessionState)
+async def get_session_state(session_id: str, request: Request, since: Optional[int] = None) -> Response:
+    """Full session state, or only what changed after version `since`; honours If-None-Match."""
+    session = session_store.get(session_id)
+    if session is None:
+        record = session_store.get_record(session_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        session = restore_session(record)
+    
+    etag = f'"{session.version}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    if since is not None:
+        body = dump_json(build_state_delta(session, since), "delta")
+    else:
+        body = dump_json(session, "state", exclude=STATE_EXCLUDE)
+    return JSONResponse(body, headers={"ETag": etag})
 
 @app.post("/api/session/{session_id}/action")
-async def submit_action(session_id: str, action: SimulationAction) -> ActionResponse:
-    if session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
+async def submit_action(session_id: str, action: SimulationAction, http_response: Response,
+                        idempotency_key: Optional[str] = Header(None)) -> ActionResponse:
+    """Apply one action. A retry carrying the same Idempotency-Key gets the first response back."""
+    fingerprint = request_fingerprint("action", action) if idempotency_key else None
+    async with session_locks.hold(session_id):
+        session = load_session(session_id)
+        replayed = stored_response(session, idempotency_key, fingerprint)
+        if replayed is not None:
+            http_response.headers["Idempotent-Replayed"] = "true"
+            return replayed
+        version_before, phase_before = session.version, session.phase
+        response = engine.apply(session, action)
+        remember_response(session, idempotency_key, fingerprint, [summarize_action(action, response)])
+        
+        # Phase transitions are driven by phase_scheduler, not by user activity
+        session_store.save(session)
+    
+    request_coaching(session)
+    # Outside the lock: the state is committed, only the wording of the reaction is still open
+    await llm_reaction(session, action, response)
+    await remember_reaction(session_id, idempotency_key, response.team_member_reaction)
+    # Re-plan only now, so a prefetch this reaction joined is not cancelled under it
+    refresh_prefetch(session)
+    publish_changes(session, version_before, phase_before, [summarize_action(action, response)])
+    return response
+
+@app.post("/api/session/{session_id}/action/stream")
+async def submit_action_streaming(session_id: str, action: SimulationAction,
+                                  idempotency_key: Optional[str] = Header(None)) -> StreamingResponse:
+    """Like /action, but streams the character's reaction as Server-Sent Events while it is written.
+
+    Events: `result` (the committed ActionResponse, with the scripted reaction),
+    `token` chunks of the reaction, then `done` with the full reaction text.
+    Shares Idempotency-Keys with /action; a replay sends `result` and `done` only.
+    """
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    fingerprint = request_fingerprint("action", action) if idempotency_key else None
+    async with session_locks.hold(session_id):
+        session = load_session(session_id)
+        replayed = stored_response(session, idempotency_key, fingerprint)
+        if replayed is None:
+            version_before, phase_before = session.version, session.phase
+            response = engine.apply(session, action)
+            remember_response(session, idempotency_key, fingerprint, [summarize_action(action, response)])
+            session_store.save(session)
     
-    session = sessions[session_id]
-    response = process_action(session, action)
-    
-    # Update session with action and response
-    session.actions.append(action)
-    session.team_members = response.updated_team_state
-    
-    # TODO: Add real-time coaching
-    # coaching_advice = await get_coaching_advice({
-    #     "team_summary": session.team_members,
-    #     "recent_actions": session.actions[-3:],
-    #     "phase": session.phase
-    # })
-    # response.coaching_hint = coaching_advice
-    
-    # Check for phase transitions
-    elapsed_minutes = (datetime.now() - session.phase_start_time).seconds / 60
-    
-    if session.phase == "meet_team" and elapsed_minutes >= 2:
-        session.phase = "delegate_tasks"
-        session.phase_start_time = datetime.now()
-    elif session.phase == "delegate_tasks" and elapsed_minutes >= 5:
-        session.phase = "navigate_conflicts"
-        session.phase_start_time = datetime.now()
-    elif session.phase == "navigate_conflicts" and elapsed_minutes >= 3:
-        session.phase = "completed"
-    
-    sessions[session_id] = session
+    if replayed is not None:
+        async def replay_stream():
+            yield format_sse("result", replayed.model_dump(mode="json"))
+            yield format_sse("done", {"team_member_reaction": replayed.team_member_reaction})
+        
+        return StreamingResponse(replay_stream(), media_type="text/event-stream",
+                                 headers={**headers, "Idempotent-Replayed": "true"})
+    
+    # The state is final now; only the reaction is still being written
+    publish_changes(session, version_before, phase_before)
+    request_coaching(session)
+    
+    async def reaction_stream():
+        yield format_sse("result", response.model_dump(mode="json"))
+        chunks = []
+        try:
+            async for chunk in stream_llm_reaction(session, action, response):
+                chunks.append(chunk)
+                yield format_sse("token", {"text": chunk})
+        finally:
+            refresh_prefetch(session)
+        if chunks:
+            response.team_member_reaction = "".join(chunks)
+            await remember_reaction(session_id, idempotency_key, response.team_member_reaction)
+        yield format_sse("done", {"team_member_reaction": response.team_member_reaction})
+        if event_bus.has_subscribers(session_id):
+            event_bus.publish(session_id, "reaction", summarize_action(action, response).model_dump(mode="json"),
+                              session.version)
+    
+    return StreamingResponse(reaction_stream(), media_type="text/event-stream", headers=headers)
+
+@app.post("/api/session/{session_id}/actions")
+async def submit_actions(session_id: str, batch: BatchActionRequest, http_response: Response,
+                         idempotency_key: Optional[str] = Header(None)) -> BatchActionResponse:
+    """Apply an ordered list of actions atomically and return one final team snapshot."""
+    if len(batch.actions) > MAX_BATCH_ACTIONS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_ACTIONS} actions per batch")
+    
+    fingerprint = request_fingerprint("actions", batch) if idempotency_key else None
+    async with session_locks.hold(session_id):
+        session = load_session(session_id)
+        replayed = stored_response(session, idempotency_key, fingerprint)
+        if replayed is not None:
+            http_response.headers["Idempotent-Replayed"] = "true"
+            return replayed
+        version_before, phase_before = session.version, session.phase
+        checkpoint = engine.checkpoint(session)
+        
+        results = []
+        for index, action in enumerate(batch.actions):
+            try:
+                results.append(summarize_action(action, engine.apply(session, action)))
+            except Exception:
+                # All or nothing: put back the state from before the batch
+                engine.rollback(session, checkpoint)
+                session_store.save(session)
+                raise HTTPException(status_code=422, detail=f"Action {index} could not be applied; batch rolled back")
+        
+        response = BatchActionResponse(
+            results=results,
+            updated_team_state=session.team_members,
+            phase=session.phase,
+            version=session.version,
+        )
+        remember_response(session, idempotency_key, fingerprint, results, batch=True)
+        session_store.save(session)
+    
+    publish_changes(session, version_before, phase_before, results)
+    request_coaching(session)
+    refresh_prefetch(session)
     return response
 
+@app.get("/api/session/{session_id}/events")
+async def stream_session_events(session_id: str, request: Request, since: Optional[int] = None) -> StreamingResponse:
+    """Server-Sent Events stream of state deltas, phase changes and character reactions."""
+    session = load_session(session_id)
+    # A reconnecting EventSource sends the last version it saw, which beats the original ?since
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        since = int(last_event_id)
+    initial = build_state_delta(session, since if since is not None else -1)
+    queue = event_bus.subscribe(session_id)
+    
+    async def event_stream():
+        try:
+            yield format_sse("state", initial.model_dump(mode="json"), initial.version)
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), EVENT_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if item is None:
+                    break  # The session moved to another node; EventSource reconnects there
+                yield format_sse(*item)
+        finally:
+            event_bus.unsubscribe(session_id, queue)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/api/session/{session_id}/ws")
+async def session_websocket(websocket: WebSocket, session_id: str, since: Optional[int] = None):
+    """WebSocket variant of the event stream; each message is {"event", "id", "data"}."""
+    session = session_store.get(session_id)
+    if session is None:
+        await websocket.close(code=4404)
+        return
+    
+    await websocket.accept()
+    initial = build_state_delta(session, since if since is not None else -1)
+    queue = event_bus.subscribe(session_id)
+    receiver = asyncio.create_task(websocket.receive())
+    try:
+        await websocket.send_json({"event": "state", "id": initial.version, "data": initial.model_dump(mode="json")})
+        while True:
+            getter = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                getter.cancel()
+                if receiver.result()["type"] == "websocket.disconnect":
+                    break
+                # Clients have nothing to tell us; ignore anything they send
+                receiver = asyncio.create_task(websocket.receive())
+                continue
+            if getter.result() is None:
+                await websocket.close(code=4409)
+                break
+            event, data, event_id = getter.result()
+            await websocket.send_json({"event": event, "id": event_id, "data": data})
+    finally:
+        receiver.cancel()
+        event_bus.unsubscribe(session_id, queue)
+
 @app.get("/api/session/{session_id}/results")
 async def get_session_results(session_id: str) -> SessionResults:
-    if session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    session = sessions[session_id]
-    if session.phase != "completed":
-        raise HTTPException(status_code=400, detail="Session not completed yet")
+    # Locked so that simultaneous requests compact and count the session only once
+    async with session_locks.hold(session_id):
+        record = session_store.get_record(session_id)
+        if record is not None:
+            return record.results
+        
+        session = load_session(session_id)
+        if session.phase != "completed":
+            raise HTTPException(status_code=400, detail="Session not completed yet")
+        
+        results = build_session_results(session, (engine.clock() - session.start_time).seconds / 60)
+        
+        # The session is finished for good, so keep only the compact record around
+        phase_scheduler.cancel(session_id)
+        coaching_queue.cancel(session_id)
+        reaction_prefetcher.forget(session_id)
+        session_store.compact(compact_session(session, results))
+        cohort_analytics.append(session_id, session.cohort,
+                                {name: score.score for name, score in results.competency_scores.items()})
+        if cluster.enabled:
+            # Other workers build their analytics from the store, so the record has to be there before anyone asks
+            await asyncio.to_thread(session_store.flush)
+    return results
+
+@app.get("/api/session/{session_id}/timeline")
+async def get_team_timeline(session_id: str) -> List[TimelinePoint]:
+    """Mood and workload of every team member after each change, for live and completed sessions."""
+    session = session_store.get(session_id)
+    if session is None:
+        record = session_store.get_record(session_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        session = restore_session(record)
+    return [
+        TimelinePoint(
+            version=version,
+            moods={key: member.mood for key, member in team.items()},
+            workloads={key: member.workload for key, member in team.items()},
+        )
+        for version, team in session.iter_team_snapshots()
+    ]
+
+@app.get("/api/session/{session_id}/score")
+async def get_live_score(session_id: str) -> Dict[str, CompetencyScore]:
+    """Current competency scores, available while the meeting is still running."""
+    record = session_store.get_record(session_id)
+    if record is not None:
+        return record.results.competency_scores
+    return calculate_final_scores(load_session(session_id))
+
+@app.get("/api/session/{session_id}/rank")
+async def get_session_rank(session_id: str) -> Dict:
+    """Percentile rank of a completed session within its cohort."""
+    sync_analytics()
+    rank = cohort_analytics.rank(session_id)
+    if rank is None:
+        raise HTTPException(status_code=404, detail="No results recorded for this session yet")
+    return rank
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    """Latency histograms and gauges in the Prometheus text format."""
+    return PlainTextResponse(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/api/llm/cache")
+async def get_llm_cache_stats() -> Dict:
+    """Hit/miss/coalescing counters of the LLM response cache."""
+    return llm_cache.stats()
+
+@app.get("/api/llm/gateway")
+async def get_llm_gateway_stats() -> Dict:
+    """Provider concurrency, call counts and deadline fallbacks of the LLM gateway."""
+    return llm_gateway.stats()
+
+@app.get("/api/llm/coaching")
+async def get_coaching_stats() -> Dict:
+    """Background coaching jobs: pending, superseded by newer actions, delivered, dropped as stale, failed."""
+    return coaching_queue.stats()
+
+@app.get("/api/llm/prefetch")
+async def get_prefetch_stats() -> Dict:
+    """Speculative delegation reactions: started, completed, dropped after the state moved on."""
+    return reaction_prefetcher.stats()
+
+@app.get("/api/cluster")
+async def get_cluster() -> Dict:
+    """This node's view of the session ring and how many requests it forwarded."""
+    return {**cluster.stats(), "hot_sessions": len(session_store.hot_ids())}
+
+@app.put("/api/cluster/nodes")
+async def set_cluster_nodes(request: Request, body: Dict) -> Dict:
+    """Change the node list (requires CLUSTER_SECRET); applied here and pushed to every old and new node.
+
+    Done in two steps so no node loads a session before its old owner has
+    written it out. `prepare`: every node switches to the new ring, holds
+    requests for the sessions it gains, and writes out and drops the sessions
+    it gives up (letting go of their deadlines and event streams). `commit`,
+    once every node has prepared: the held requests go ahead and the new
+    owners load those sessions from the shared store.
+    """
+    if not cluster.enabled or not cluster.secret or request.headers.get(SECRET_HEADER) != cluster.secret:
+        raise HTTPException(status_code=403, detail="Cluster membership changes are not allowed")
+    nodes = body.get("nodes") or []
+    if not nodes:
+        raise HTTPException(status_code=400, detail="At least one node is required")
     
-    scores = calculate_final_scores(session)
+    if FORWARDED_HEADER.decode() in request.headers:
+        # One step of a change another node is coordinating
+        if body.get("stage") == "commit":
+            commit_cluster_nodes()
+            return {"nodes": list(cluster.ring.nodes)}
+        released = await prepare_cluster_nodes(nodes)
+        return {"nodes": list(cluster.ring.nodes), "released": released}
     
-    # Calculate overall rating
-    average_score = sum(comp.score for comp in scores.values()) / len(scores) if scores else 0
-    if average_score >= 80:
-        overall_rating = "Excellent"
-    elif average_score >= 60:
-        overall_rating = "Good"
-    else:
-        overall_rating = "Needs Improvement"
-    
-    return SessionResults(
-        session_id=session_id,
-        competency_scores=scores,
-        total_duration=(datetime.now() - session.start_time).seconds / 60,
-        actions_taken=len(session.actions),
-        overall_rating=overall_rating
-    )
+    previous = list(cluster.ring.nodes)
+    released = await prepare_cluster_nodes(nodes)
+    failed = await cluster.broadcast("PUT", "/api/cluster/nodes", {"nodes": nodes, "stage": "prepare"}, previous + nodes)
+    await cluster.broadcast("PUT", "/api/cluster/nodes", {"nodes": nodes, "stage": "commit"}, previous + nodes)
+    commit_cluster_nodes()
+    return {"nodes": list(cluster.ring.nodes), "released": released, "unreachable": failed}
+
+async def prepare_cluster_nodes(nodes: List[str]) -> int:
+    """Switch to the new ring and write out every session this node gives up; returns how many it held."""
+    cluster.begin_handoff(nodes)
+    # Requests already inside a session we give up finish first, so their saves are part of the write-out
+    for session_id in session_locks.held():
+        if not cluster.owns(session_id):
+            async with session_locks.hold(session_id):
+                pass
+    released = [session_id for session_id in session_store.hot_ids() if not cluster.owns(session_id)]
+    session_store.release(released)
+    for session_id in released:
+        coaching_queue.cancel(session_id)
+        reaction_prefetcher.forget(session_id)
+        event_bus.disconnect(session_id)
+    for session_id in phase_scheduler.session_ids():
+        if not cluster.owns(session_id):
+            phase_scheduler.cancel(session_id)
+    return len(released)
+
+def commit_cluster_nodes() -> None:
+    cluster.end_handoff()
+    session_store.recount(cluster.owns)  # Every old owner has written out, so the store is current
+
+def sync_analytics() -> None:
+    """In a cluster, fold in the sessions other nodes compacted since the last look; they share the store."""
+    if cluster.enabled:
+        cohort_analytics.sync(session_store.iter_record_scores(since=cohort_analytics.synced_to))
+
+@app.get("/api/analytics/cohorts")
+async def list_cohorts() -> List[str]:
+    sync_analytics()
+    return cohort_analytics.cohorts()
+
+@app.get("/api/analytics/summary")
+async def get_cohort_summary(cohort: Optional[str] = None) -> Dict:
+    """Means, spread and percentiles per competency, for one cohort or everyone."""
+    sync_analytics()
+    return cohort_analytics.summary(cohort)
+
+@app.get("/api/analytics/histogram")
+async def get_cohort_histogram(competency: str = "overall", bins: int = 10, cohort: Optional[str] = None) -> Dict:
+    if competency != "overall" and competency not in COMPETENCIES:
+        raise HTTPException(status_code=400, detail="Unknown competency")
+    if not 1 <= bins <= 100:
+        raise HTTPException(status_code=400, detail="bins must be between 1 and 100")
+    sync_analytics()
+    return cohort_analytics.histogram(competency, bins, cohort)
 
 @app.post("/api/session/{session_id}/skip-to-phase")
 async def skip_to_phase(session_id: str, phase_data: Dict[str, str]) -> Dict[str, str]:
-    if session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
+    async with session_locks.hold(session_id):
+        session = load_session(session_id)
+        version_before, phase_before = session.version, session.phase
+        target_phase = phase_data.get("phase")
+        valid_phases = ["meet_team", "delegate_tasks", "navigate_conflicts", "completed"]
+        
+        if target_phase not in valid_phases:
+            raise HTTPException(status_code=400, detail="Invalid phase")
+        
+        engine.advance(session, target_phase)
+        phase_scheduler.schedule(session_id, target_phase)
+        
+        # Add some sample actions and team state changes for testing different phases
+        sample_actions = []
+        changed_members = []
+        if target_phase == "delegate_tasks" and len(session.actions) == 0:
+            # Add some sample introductory actions
+            sample_actions = [
+                SimulationAction(type="ask_question", target_member="alex", message="What's your current workload?"),
+                SimulationAction(type="send_message", target_member="jordan", message="Great work on the last project!")
+            ]
+        
+        elif target_phase == "navigate_conflicts" and len(session.actions) < 3:
+            # Add some task delegation actions
+            sample_actions = [
+                SimulationAction(type="delegate_task", target_member="alex", task_id="backend_api"),
+                SimulationAction(type="delegate_task", target_member="jordan", task_id="create_mockups"),
+                SimulationAction(type="send_message", target_member="sam", message="Can you help coordinate the timeline?")
+            ]
+            # Update team member workloads
+            workloads = {"alex": 45, "jordan": 35, "sam": 50}
+            session.team_members = {
+                **session.team_members,
+                **{key: session.team_members[key].model_copy(update={"workload": workload})
+                   for key, workload in workloads.items()},
+            }
+            changed_members = list(workloads)
+        
+        for sample_action in sample_actions:
+            engine.record(session, sample_action)
+        if changed_members:
+            session.bump_version(changed_members)
+        get_tally(session).observe_team(session.team_members)
+        
+        session_store.save(session)
     
-    target_phase = phase_data.get("phase")
-    valid_phases = ["meet_team", "delegate_tasks", "navigate_conflicts", "completed"]
-    
-    if target_phase not in valid_phases:
-        raise HTTPException(status_code=400, detail="Invalid phase")
-    
-    session = sessions[session_id]
-    session.phase = target_phase
-    session.phase_start_time = datetime.now()
-    
-    # Add some sample actions and team state changes for testing different phases
-    if target_phase == "delegate_tasks" and len(session.actions) == 0:
-        # Add some sample introductory actions
-        from backend.models import SimulationAction
-        session.actions.append(SimulationAction(type="ask_question", target_member="alex", message="What's your current workload?"))
-        session.actions.append(SimulationAction(type="send_message", target_member="jordan", message="Great work on the last project!"))
-    
-    elif target_phase == "navigate_conflicts" and len(session.actions) < 3:
-        # Add some task delegation actions
-        from backend.models import SimulationAction
-        session.actions.extend([
-            SimulationAction(type="delegate_task", target_member="alex", task_id="backend_api"),
-            SimulationAction(type="delegate_task", target_member="jordan", task_id="create_mockups"),
-            SimulationAction(type="send_message", target_member="sam", message="Can you help coordinate the timeline?")
-        ])
-        # Update team member workloads
-        session.team_members["alex"].workload = 45
-        session.team_members["jordan"].workload = 35
-        session.team_members["sam"].workload = 50
-    
-    sessions[session_id] = session
+    refresh_prefetch(session)
+    publish_changes(session, version_before, phase_before)
     return {"message": f"Skipped to phase: {target_phase}"}
\ No newline at end of file
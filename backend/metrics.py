@@ -0,0 +1,187 @@
+"""
+In-process metrics, exposed at /metrics in the Prometheus text format.
+
+Histograms are recorded on the request path, so observing one is a bisect
+and two additions on plain lists, with no locks (everything that records
+runs on the event loop thread). Gauges are read from callbacks when the
+endpoint is scraped, so they cost nothing between scrapes.
+"""
+
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds in seconds: request latency, and the much shorter in-process steps
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STEP_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Histogram:
+    """Cumulative histogram of observed values, one series per combination of label values."""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = REQUEST_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        bounds = [_number(bound) for bound in self.buckets] + ["+Inf"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+class Gauge:
+    """A value read at scrape time: `collect` returns (label values, value) pairs."""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str],
+                 collect: Callable[[], Iterable[Tuple[Tuple[str, ...], float]]]):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for labels, value in self.collect():
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = REQUEST_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, collect: Callable[[], Iterable[Tuple[Tuple[str, ...], float]]],
+              labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames, collect))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up a task that asked to sleep for `interval`."""
+
+    def __init__(self, histogram: Histogram, interval: float = 0.5):
+        self.histogram = histogram
+        self.interval = interval
+        self.last = 0.0
+        self.worst = 0.0  # Since the last scrape
+
+    async def run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.last = lag
+            self.worst = max(self.worst, lag)
+            self.histogram.observe(lag)
+
+    def collect(self) -> List[Tuple[Tuple[str, ...], float]]:
+        worst, self.worst = self.worst, 0.0
+        return [(("last",), self.last), (("max",), worst)]
+
+class MetricsMiddleware:
+    """ASGI middleware recording the latency of every HTTP request by method, route and status.
+
+    Routes are labelled by their path template, so session ids don't each get
+    their own series. Latency runs to the end of the response body, except for
+    event streams: those stay open for the whole meeting, so they are timed to
+    their headers.
+    """
+
+    def __init__(self, app, histogram: Histogram):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = None
+        recorded = False
+
+        async def send_timed(message):
+            nonlocal status, recorded
+            await send(message)
+            if recorded:
+                return
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                for key, value in message.get("headers", ()):
+                    if key == b"content-type":
+                        if value.startswith(b"text/event-stream"):
+                            recorded = True
+                            self.record(scope, started, status)
+                        break
+            elif not message.get("more_body"):
+                recorded = True
+                self.record(scope, started, status)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            if not recorded:
+                # Failed or the client went away before the response was complete
+                self.record(scope, started, status or 500)
+
+    def record(self, scope, started: float, status: int) -> None:
+        route = scope.get("route")
+        self.histogram.observe(time.perf_counter() - started, scope["method"],
+                               getattr(route, "path", None) or "<unmatched>", str(status))
+
+registry = MetricsRegistry()
+
+REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status"))
+ACTION_SECONDS = registry.histogram(
+    "simulation_action_seconds", "Time to apply one action: scenario handler (process) and score tally (score).",
+    ("action_type", "stage"), STEP_BUCKETS)
+SCORING_SECONDS = registry.histogram(
+    "simulation_scoring_seconds", "Time to compute the competency scores of a session.", (), STEP_BUCKETS)
+SERIALIZATION_SECONDS = registry.histogram(
+    "simulation_serialization_seconds", "Time to serialize session data, by form.", ("form",), STEP_BUCKETS)
+LOOP_LAG_SECONDS = registry.histogram(
+    "event_loop_lag_seconds", "How late the event loop ran a timer that was due.", (), REQUEST_BUCKETS)
@@ -1,47 +1,185 @@
-from pydantic import BaseModel
-from typing import Dict, List, Optional, Literal
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, computed_field, field_validator
+from typing import Any, Dict, List, Optional, Literal, Tuple
 from datetime import datetime
 from enum import Enum
 
+from backend.action_log import ActionLog, ActionType
+
 class MoodState(str, Enum):
     HAPPY = "happy"
     NEUTRAL = "neutral"
     FRUSTRATED = "frustrated"
 
 class TeamMember(BaseModel):
+    # Immutable: changes go through model_copy(update=...), so team snapshots can share members
+    model_config = ConfigDict(frozen=True)
+
     name: str
     role: str
     description: str
     mood: MoodState = MoodState.NEUTRAL
     workload: int = 0  # 0-100 scale
-    skills: List[str]
+    skills: Tuple[str, ...]
     personality_traits: Dict[str, int]  # trait_name: strength (1-10)
-    trigger_points: List[str]
-    current_tasks: List[str] = []
+    trigger_points: Tuple[str, ...]
+    current_tasks: Tuple[str, ...] = ()
+
+class TeamSnapshot(BaseModel):
+    """Members that changed at `version`; every other member is shared with the previous snapshot."""
+    model_config = ConfigDict(frozen=True)
+
+    version: int
+    members: Dict[str, TeamMember]
+
+class Task(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    id: str
+    name: str
+    description: str
+    estimated_hours: int
+    skills_required: Tuple[str, ...]
+    urgency: Literal["high", "medium", "low"]
+    best_fit: str
 
 class SimulationAction(BaseModel):
-    type: Literal["delegate_task", "send_message", "address_conflict", "ask_question"]
-    target_member: Optional[str] = None
-    task_id: Optional[str] = None
+    type: ActionType
+    # Bounded because the action log interns every distinct value, valid or not
+    target_member: Optional[str] = Field(None, max_length=64)
+    task_id: Optional[str] = Field(None, max_length=64)
     message: Optional[str] = None
     data: Optional[Dict] = None
 
+class PersistedAction(SimulationAction):
+    """A logged action as stored, with the session version it was recorded at."""
+    version: int = 0
+
 class ActionResponse(BaseModel):
     success: bool
     message: str
     team_member_reaction: Optional[str] = None
     mood_change: Optional[MoodState] = None
     updated_team_state: Dict[str, TeamMember]
+    # Factories rather than literal []/{} defaults, which pydantic deep-copies on every construction
+    consequences: List[str] = Field(default_factory=list)
+
+class ActionResult(BaseModel):
+    """Outcome of one action without the team snapshot (used by batches and event streams)."""
+    type: str
+    target_member: Optional[str] = None
+    success: bool
+    message: str
+    team_member_reaction: Optional[str] = None
+    mood_change: Optional[MoodState] = None
     consequences: List[str] = []
 
+class BatchActionRequest(BaseModel):
+    actions: List[SimulationAction]
+
+class BatchActionResponse(BaseModel):
+    results: List[ActionResult]
+    updated_team_state: Dict[str, TeamMember]
+    phase: str
+    version: int
+
+class StoredResponse(BaseModel):
+    """What a retry with the same Idempotency-Key needs to get its response back instead of re-running.
+
+    The team snapshot is not kept: it is rebuilt from the session's team
+    history at `version`.
+    """
+    request_hash: str  # The same key on a different request is refused
+    version: int  # Session version right after the request was applied
+    phase: str
+    results: List[ActionResult]  # One for /action, one per action for /actions
+    batch: bool = False
+
 class SessionState(BaseModel):
     session_id: str
     phase: Literal["meet_team", "delegate_tasks", "navigate_conflicts", "completed"]
     team_members: Dict[str, TeamMember]
-    actions: List[SimulationAction] = []
+    team_history: List[TeamSnapshot] = Field(default_factory=list)  # Starts with the full initial team at version 0
+    actions: ActionLog = Field(default_factory=ActionLog)
+    cohort: Optional[str] = None  # Class/group the session is compared against in analytics
+    coaching_hint: Optional[str] = None  # Latest advice from the background coach (backend.coaching)
+    seed: int = 0  # Drives every random choice, so the action log replays exactly (backend.engine)
     start_time: datetime
     phase_start_time: datetime
-    available_tasks: List[Dict] = []
+    idempotent_responses: Dict[str, StoredResponse] = Field(default_factory=dict)  # Idempotency-Key -> response, oldest first
+
+    # Bumped on every change; member_versions (and the action log) record when each piece last changed
+    version: int = 0
+    member_versions: Dict[str, int] = Field(default_factory=dict)
+
+    @computed_field
+    @property
+    def available_tasks(self) -> Tuple[Task, ...]:
+        # Every session shares the one task catalog instead of holding a copy
+        from backend.scenarios import TASK_CATALOG
+        return TASK_CATALOG.tasks
+
+    # Running scoring totals (backend.scoring.ScoreTally), rebuilt from actions on load
+    _tally: Any = PrivateAttr(default=None)
+    # (actions, team snapshots, members in those snapshots) the SQLite store has queued (backend.session_store)
+    _persisted: Any = PrivateAttr(default=None)
+
+    def bump_version(self, changed_members=()) -> int:
+        """Mark the session (and the given members) as changed, snapshotting those members."""
+        self.version += 1
+        for member_id in changed_members:
+            self.member_versions[member_id] = self.version
+        if changed_members:
+            self.team_history.append(TeamSnapshot(
+                version=self.version,
+                members={member_id: self.team_members[member_id] for member_id in changed_members},
+            ))
+        return self.version
+
+    @field_validator("idempotent_responses", mode="before")
+    @classmethod
+    def _drop_legacy_responses(cls, value):
+        # Entries saved with a full response (before StoredResponse was slimmed down) can't be replayed
+        if isinstance(value, dict):
+            return {key: entry for key, entry in value.items() if not isinstance(entry, dict) or "response" not in entry}
+        return value
+
+    def team_at(self, version: int) -> Dict[str, TeamMember]:
+        """The full team as it was right after `version`."""
+        team: Dict[str, TeamMember] = {}
+        for snapshot_version, snapshot in self.iter_team_snapshots():
+            if snapshot_version > version:
+                break
+            team = snapshot
+        return team
+
+    def iter_team_snapshots(self):
+        """Yield (version, full team) after each recorded change, oldest first.
+
+        Each yielded dict is a fresh mapping over shared, immutable members.
+        """
+        team: Dict[str, TeamMember] = {}
+        for snapshot in self.team_history:
+            team = {**team, **snapshot.members}
+            yield snapshot.version, team
+
+# Internal bookkeeping that never goes over the wire
+STATE_EXCLUDE = {"member_versions", "team_history", "idempotent_responses"}
+
+class TimelinePoint(BaseModel):
+    version: int
+    moods: Dict[str, MoodState]
+    workloads: Dict[str, int]
+
+class SessionDelta(BaseModel):
+    """Everything that changed in a session after version `since`."""
+    session_id: str
+    version: int
+    since: int
+    phase: Literal["meet_team", "delegate_tasks", "navigate_conflicts", "completed"]
+    phase_start_time: datetime
+    team_members: Dict[str, TeamMember]
+    actions: List[SimulationAction]
+    coaching_hint: Optional[str] = None
 
 class CompetencyScore(BaseModel):
     name: str
@@ -54,4 +192,14 @@ class SessionResults(BaseModel):
     competency_scores: Dict[str, CompetencyScore]
     total_duration: float  # minutes
     actions_taken: int
-    overall_rating: str  # "Excellent", "Good", "Needs Improvement"
\ No newline at end of file
+    overall_rating: str  # "Excellent", "Good", "Needs Improvement"
+
+class SessionRecord(BaseModel):
+    """Compact, read-only summary a completed session is reduced to once scored."""
+    model_config = ConfigDict(frozen=True, ser_json_bytes="base64", val_json_bytes="base64")
+
+    session_id: str
+    cohort: Optional[str] = None
+    results: SessionResults
+    action_counts: Dict[str, int]
+    archive: bytes  # zlib-compressed JSON of the final team state and action log
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from backend.llm_cache import cache_key
+from backend.llm_gateway import reaction_prompt
+from backend.models import SessionState, SimulationAction
+from backend.scenarios import TASK_CATALOG, process_action
+from backend.scoring import get_tally
+
+logger = logging.getLogger(__name__)
+
+# Phases in which the user is still likely to delegate
+PREFETCH_PHASES = ("meet_team", "delegate_tasks")
+
+# (member id, prompt type, prompt fields, cache key)
+Prediction = Tuple[str, str, Dict, str]
+
+class ReactionPrefetcher:
+    """Warms the LLM cache with the delegation reactions a session is most likely to ask for next.
+
+    Delegation is pure over immutable members, so each candidate (member,
+    task) is simulated to get the exact post-delegation prompt the real
+    request will send. `warm(member_id, prompt_type, fields)` fetches that
+    prompt through the response cache; when the user does delegate, the
+    reaction is a cache hit (or joins the in-flight prefetch). After every
+    change the predictions are recomputed: jobs for predictions that no
+    longer apply are cancelled, and each session may start at most `budget`
+    upstream prefetches in total.
+    """
+
+    def __init__(self, warm: Callable[[str, str, Dict], Awaitable[None]], budget: int = 6, concurrency: int = 2):
+        self.warm = warm
+        self.budget = budget
+        self._slots = asyncio.Semaphore(concurrency)  # Keeps prefetching from crowding out live calls
+        self._jobs: Dict[str, Dict[str, asyncio.Task]] = {}  # session_id -> cache key -> job
+        self._spent: Dict[str, int] = {}
+        self.started = 0
+        self.dropped = 0
+        self.completed = 0
+
+    def predictions(self, session: SessionState) -> List[Prediction]:
+        """Delegations ranked by likelihood: good fits first, then skill matches, then lighter workloads."""
+        assigned = {task_name for task_name, _, _ in get_tally(session).assignments}
+        ranked = []
+        for member_id, member in session.team_members.items():
+            for task in TASK_CATALOG:
+                if task.name in assigned:
+                    continue  # Rarely delegated twice
+                skill_match = any(skill in member.skills for skill in task.skills_required)
+                likelihood = 2 * (task.best_fit == member_id) + skill_match - member.workload / 100
+                ranked.append((likelihood, member_id, task))
+        ranked.sort(key=lambda item: item[0], reverse=True)
+
+        predictions = []
+        for _, member_id, task in ranked[:self.budget]:
+            action = SimulationAction(type="delegate_task", target_member=member_id, task_id=task.id)
+            response = process_action(session, action)
+            prompt = reaction_prompt(action, response.updated_team_state[member_id], task.name)
+            if prompt is None:
+                continue
+            prompt_type, fields = prompt
+            key = cache_key("character", character_name=member_id, prompt_type=prompt_type, **fields)
+            predictions.append((member_id, prompt_type, fields, key))
+        return predictions
+
+    def refresh(self, session: SessionState) -> None:
+        """Re-plan prefetching for the session's current state."""
+        if session.phase not in PREFETCH_PHASES:
+            self.forget(session.session_id)
+            return
+        predictions = self.predictions(session)
+        wanted = {key for _, _, _, key in predictions}
+        jobs = self._jobs.setdefault(session.session_id, {})
+        for key in [key for key in jobs if key not in wanted]:
+            job = jobs.pop(key)
+            if not job.done():
+                job.cancel()
+                self.dropped += 1
+
+        for member_id, prompt_type, fields, key in predictions:
+            if key in jobs:
+                continue
+            if self._spent.get(session.session_id, 0) >= self.budget:
+                break
+            self._spent[session.session_id] = self._spent.get(session.session_id, 0) + 1
+            self.started += 1
+            jobs[key] = asyncio.create_task(self._run(member_id, prompt_type, fields))
+
+    def forget(self, session_id: str) -> None:
+        for job in self._jobs.pop(session_id, {}).values():
+            if not job.done():
+                job.cancel()
+                self.dropped += 1
+        self._spent.pop(session_id, None)
+
+    async def _run(self, member_id: str, prompt_type: str, fields: Dict) -> None:
+        try:
+            async with self._slots:
+                await self.warm(member_id, prompt_type, fields)
+            self.completed += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.debug("Prefetch failed for %s", member_id, exc_info=True)
+
+    async def close(self) -> None:
+        jobs = [job for session_jobs in self._jobs.values() for job in session_jobs.values()]
+        self._jobs.clear()
+        self._spent.clear()
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._jobs),
+            "in_flight": sum(not job.done() for jobs in self._jobs.values() for job in jobs.values()),
+            "started": self.started,
+            "completed": self.completed,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,175 @@
+"""
+On-demand CPU profiles of single requests.
+
+A request carrying `X-Profile: <secret>` (or `?profile=<secret>`) is run
+under a profiler, in one of two formats (`X-Profile-Format` or
+`?profile_format=`):
+
+- `pstats` (default): deterministic cProfile call graph, for `python -m pstats`
+  or snakeviz.
+- `collapsed`: time per full call stack, one `frame;frame;frame microseconds`
+  line each, for flamegraph.pl or speedscope.
+
+The profile is written to the configured directory (its path comes back in
+`X-Profile-Path`) or, without one, returned instead of the response body
+(the original status in `X-Profile-Status`). Both profilers see everything
+the event loop runs while the request is in flight, so profile on a quiet
+node; one request is profiled at a time and others asking meanwhile get
+`X-Profile: busy`. The middleware is only installed when a secret is set,
+and requests that don't ask for a profile skip straight through it.
+"""
+
+import cProfile
+import hmac
+import marshal
+import os
+import re
+import sys
+import time
+import uuid
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+PROFILE_HEADER = b"x-profile"
+FORMAT_HEADER = b"x-profile-format"
+FORMATS = {
+    "pstats": (".prof", b"application/octet-stream"),
+    "collapsed": (".collapsed", b"text/plain; charset=utf-8"),
+}
+
+class StackProfiler:
+    """Deterministic profiler timing every full call stack, for the collapsed (flame graph) format.
+
+    A Python-level profile hook, so it slows the profiled request down far more
+    than cProfile; stacks start at whatever was running when it was enabled.
+    """
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self._stack: List[str] = []
+        self._last = 0.0
+
+    def enable(self) -> None:
+        self._last = time.perf_counter()
+        sys.setprofile(self._event)
+
+    def disable(self) -> None:
+        sys.setprofile(None)
+        self._charge(time.perf_counter())
+
+    def _charge(self, now: float) -> None:
+        if self._stack:
+            key = self._stack[-1]
+            self.seconds[key] = self.seconds.get(key, 0.0) + now - self._last
+
+    def _event(self, frame, event, arg) -> None:
+        self._charge(time.perf_counter())
+        if event == "call":
+            code = frame.f_code
+            self._push(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        elif event == "c_call":
+            self._push(getattr(arg, "__qualname__", None) or repr(arg))
+        elif self._stack:  # return, c_return, c_exception; a frame entered before enable() is ignored
+            self._stack.pop()
+        self._last = time.perf_counter()  # Leave the hook's own time out
+
+    def _push(self, label: str) -> None:
+        self._stack.append(f"{self._stack[-1]};{label}" if self._stack else label)
+
+    def collapsed(self) -> bytes:
+        """One `frame;frame;frame microseconds` line per stack."""
+        lines = []
+        for stack, seconds in sorted(self.seconds.items()):
+            microseconds = round(seconds * 1e6)
+            if microseconds:
+                lines.append(f"{stack} {microseconds}\n")
+        return "".join(lines).encode()
+
+def profile_request(scope, secret: str) -> Optional[str]:
+    """The profile format a request asks for with the right secret, or None."""
+    given, wanted = None, None
+    for key, value in scope["headers"]:
+        if key == PROFILE_HEADER:
+            given = value.decode("latin-1")
+        elif key == FORMAT_HEADER:
+            wanted = value.decode("latin-1")
+    query = scope.get("query_string", b"")
+    if given is None and b"profile=" in query:
+        params = parse_qs(query.decode("latin-1"))
+        given = params.get("profile", [None])[0]
+        wanted = wanted or params.get("profile_format", [None])[0]
+    if given is None or not hmac.compare_digest(given.encode(), secret.encode()):
+        return None
+    return wanted if wanted in FORMATS else "pstats"
+
+def with_headers(send, headers):
+    """Wrap `send` to add `headers` to the response start."""
+    async def wrapped(message):
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": [*message.get("headers", ()), *headers]}
+        await send(message)
+    return wrapped
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles the requests asking for it with the shared secret."""
+
+    def __init__(self, app, secret: str, directory: Optional[str] = None):
+        self.app = app
+        self.secret = secret
+        self.directory = directory
+        self._busy = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        profile_format = profile_request(scope, self.secret)
+        if profile_format is None:
+            return await self.app(scope, receive, send)
+        if self._busy:
+            return await self.app(scope, receive, with_headers(send, [(b"x-profile", b"busy")]))
+
+        self._busy = True
+        try:
+            if self.directory:
+                await self._to_file(scope, receive, send, profile_format)
+            else:
+                await self._inline(scope, receive, send, profile_format)
+        finally:
+            self._busy = False
+
+    async def _to_file(self, scope, receive, send, profile_format: str) -> None:
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", scope["path"].strip("/")) or "root"
+        path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{scope['method']}-{name}-"
+                                            f"{uuid.uuid4().hex[:8]}{FORMATS[profile_format][0]}")
+        data = await self._profile(self.app(scope, receive, with_headers(send, [(b"x-profile-path", path.encode())])),
+                                   profile_format)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path, "wb") as handle:
+            handle.write(data)
+
+    async def _inline(self, scope, receive, send, profile_format: str) -> None:
+        status = [500]
+
+        async def discard(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+
+        data = await self._profile(self.app(scope, receive, discard), profile_format)
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", FORMATS[profile_format][1]),
+            (b"content-length", str(len(data)).encode()),
+            (b"x-profile-status", str(status[0]).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": data})
+
+    async def _profile(self, call, profile_format: str) -> bytes:
+        profiler = StackProfiler() if profile_format == "collapsed" else cProfile.Profile()
+        profiler.enable()
+        try:
+            await call
+        finally:
+            profiler.disable()
+        if profile_format == "collapsed":
+            return profiler.collapsed()
+        profiler.create_stats()
+        return marshal.dumps(profiler.stats)
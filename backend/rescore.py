@@ -0,0 +1,146 @@
+"""
+Offline re-scoring of recorded sessions.
+
+Streams sessions from an NDJSON file (one SessionState per line) or from the
+SQLite session store, scores them across a process pool in chunks and writes
+one SessionResults JSON object per line as results come back. Only a bounded
+number of chunks is in flight at any time, so memory stays flat however big
+the corpus is.
+
+    python -m backend.rescore sessions.db -o rescored.ndjson
+    python -m backend.rescore archive.ndjson --workers 32 --chunk-size 500
+    python -m backend.rescore sessions.db --replay  # after changing the scenario rules
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple
+
+from backend.engine import replay
+from backend.models import SessionState, SessionRecord
+from backend.scoring import build_session_results
+from backend.session_store import join_session_rows, read_session_rows, restore_session
+
+# (kind, payload): kind is "session" for SessionState JSON, "record" for SessionRecord JSON
+Item = Tuple[str, str]
+
+def read_ndjson(path: str) -> Iterator[Item]:
+    with open(path, encoding="utf-8") if path != "-" else sys.stdin as handle:
+        for line in handle:
+            line = line.strip()
+            if line:
+                yield "session", line
+
+def read_sqlite(path: str, include_live: bool = False, batch_size: int = 1000) -> Iterator[Item]:
+    """Yield compacted records and, optionally, sessions that never reached /results."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, isolation_level=None)
+    try:
+        conn.execute("BEGIN")  # One snapshot, so a live session's rows all come from the same save
+        cursor = conn.execute("SELECT data FROM session_records")
+        for rows in iter(lambda: cursor.fetchmany(batch_size), []):
+            for (data,) in rows:
+                yield "record", data
+        if include_live:
+            # A live session's actions and team history are kept in their own rows; put them back
+            cursor = conn.execute("SELECT session_id, data FROM sessions")
+            for rows in iter(lambda: cursor.fetchmany(batch_size), []):
+                for session_id, head in rows:
+                    yield "session", join_session_rows(head, *read_session_rows(conn, session_id))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+def rescore_item(kind: str, payload: str, replay_actions: bool = False) -> str:
+    if kind == "record":
+        record = SessionRecord.model_validate_json(payload)
+        session = restore_session(record)
+        total_duration = record.results.total_duration
+    else:
+        session = SessionState.model_validate_json(payload)
+        total_duration = (session.phase_start_time - session.start_time).seconds / 60
+    if replay_actions:
+        # Rebuild the team state under the current scenario rules instead of trusting the stored one
+        session = replay(session.seed, session.actions, session_id=session.session_id)
+    return build_session_results(session, total_duration).model_dump_json()
+
+def rescore_chunk(chunk: List[Item], replay_actions: bool = False) -> List[str]:
+    """Worker entry point: score a chunk, reporting failures inline instead of aborting."""
+    lines = []
+    for kind, payload in chunk:
+        try:
+            lines.append(rescore_item(kind, payload, replay_actions))
+        except Exception as exc:
+            lines.append(json.dumps({"error": f"{type(exc).__name__}: {exc}", "source": kind}))
+    return lines
+
+def chunked(items: Iterable[Item], size: int) -> Iterator[List[Item]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def bounded_map(executor: ProcessPoolExecutor, chunks: Iterator[List[Item]], max_in_flight: int,
+                replay_actions: bool = False) -> Iterator[List[str]]:
+    """Like executor.map, but never pulls more than `max_in_flight` chunks ahead of the consumer."""
+    in_flight = deque()
+    for chunk in chunks:
+        in_flight.append(executor.submit(rescore_chunk, chunk, replay_actions))
+        if len(in_flight) >= max_in_flight:
+            yield in_flight.popleft().result()
+    while in_flight:
+        yield in_flight.popleft().result()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Re-score recorded sessions with the current scoring rules.")
+    parser.add_argument("source", help="NDJSON file of sessions ('-' for stdin) or a SQLite session store (.db)")
+    parser.add_argument("-o", "--output", default="-", help="NDJSON file for the results (default: stdout)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=200)
+    parser.add_argument("--include-live", action="store_true",
+                        help="SQLite only: also score sessions that were never compacted")
+    parser.add_argument("--replay", action="store_true",
+                        help="Replay each action log through the current scenario rules before scoring")
+    parser.add_argument("--progress-every", type=float, default=5.0, help="Seconds between progress reports")
+    args = parser.parse_args(argv)
+
+    if args.source.endswith((".db", ".sqlite", ".sqlite3")):
+        items = read_sqlite(args.source, include_live=args.include_live)
+    else:
+        items = read_ndjson(args.source)
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    scored = errors = 0
+    started = last_report = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            for lines in bounded_map(executor, chunked(items, args.chunk_size), args.workers * 2, args.replay):
+                for line in lines:
+                    output.write(line + "\n")
+                    if line.startswith('{"error"'):
+                        errors += 1
+                scored += len(lines)
+
+                now = time.perf_counter()
+                if now - last_report >= args.progress_every:
+                    last_report = now
+                    print(f"{scored} sessions, {scored / (now - started):.0f}/s", file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Re-scored {scored} sessions ({errors} errors) in {elapsed:.1f}s "
+          f"- {scored / elapsed if elapsed else 0:.0f} sessions/s on {args.workers} workers", file=sys.stderr)
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
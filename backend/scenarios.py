@@ -1,118 +1,177 @@
-from typing import Dict, List
-from backend.models import TeamMember, MoodState, SimulationAction, ActionResponse
+from types import MappingProxyType
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+from backend.models import TeamMember, MoodState, SimulationAction, ActionResponse, Task
+from backend.tone import tone_analyzer
 import random
 
 # TODO: Import LLM integration when ready
 # from llm_tasks import get_character_response, ALEX_SYSTEM_PROMPT, JORDAN_SYSTEM_PROMPT, SAM_SYSTEM_PROMPT
 
+# The three team members with their personalities and traits. Members are immutable,
+# so every session starts from these same objects.
+INITIAL_TEAM: Mapping[str, TeamMember] = MappingProxyType({
+    "alex": TeamMember(
+        name="Alex",
+        role="Developer",
+        description="Brilliant but disorganized",
+        mood=MoodState.NEUTRAL,
+        workload=30,
+        skills=["Python", "JavaScript", "Problem Solving", "Innovation"],
+        personality_traits={
+            "creativity": 9,
+            "organization": 3,
+            "technical_skill": 8,
+            "communication": 5,
+            "stress_tolerance": 6
+        },
+        trigger_points=["micromanagement", "tight_deadlines", "unclear_requirements"],
+        current_tasks=[]
+    ),
+    "jordan": TeamMember(
+        name="Jordan",
+        role="Designer",
+        description="Detail-oriented but anxious",
+        mood=MoodState.NEUTRAL,
+        workload=25,
+        skills=["UI/UX Design", "Attention to Detail", "User Research", "Prototyping"],
+        personality_traits={
+            "creativity": 7,
+            "organization": 8,
+            "attention_to_detail": 9,
+            "confidence": 4,
+            "stress_tolerance": 5
+        },
+        trigger_points=["public_criticism", "rushed_feedback", "unclear_expectations"],
+        current_tasks=[]
+    ),
+    "sam": TeamMember(
+        name="Sam",
+        role="Marketing",
+        description="Driven but impatient",
+        mood=MoodState.NEUTRAL,
+        workload=40,
+        skills=["Marketing Strategy", "Communication", "Leadership", "Results Focus"],
+        personality_traits={
+            "drive": 9,
+            "patience": 3,
+            "communication": 8,
+            "results_focus": 9,
+            "collaboration": 6
+        },
+        trigger_points=["long_meetings", "indecision", "slow_progress"],
+        current_tasks=[]
+    )
+})
+
 def get_initial_team_state() -> Dict[str, TeamMember]:
     """Initialize the three team members with their personalities and traits."""
-    return {
-        "alex": TeamMember(
-            name="Alex",
-            role="Developer",
-            description="Brilliant but disorganized",
-            mood=MoodState.NEUTRAL,
-            workload=30,
-            skills=["Python", "JavaScript", "Problem Solving", "Innovation"],
-            personality_traits={
-                "creativity": 9,
-                "organization": 3,
-                "technical_skill": 8,
-                "communication": 5,
-                "stress_tolerance": 6
-            },
-            trigger_points=["micromanagement", "tight_deadlines", "unclear_requirements"],
-            current_tasks=[]
-        ),
-        "jordan": TeamMember(
-            name="Jordan",
-            role="Designer",
-            description="Detail-oriented but anxious",
-            mood=MoodState.NEUTRAL,
-            workload=25,
-            skills=["UI/UX Design", "Attention to Detail", "User Research", "Prototyping"],
-            personality_traits={
-                "creativity": 7,
-                "organization": 8,
-                "attention_to_detail": 9,
-                "confidence": 4,
-                "stress_tolerance": 5
-            },
-            trigger_points=["public_criticism", "rushed_feedback", "unclear_expectations"],
-            current_tasks=[]
-        ),
-        "sam": TeamMember(
-            name="Sam",
-            role="Marketing",
-            description="Driven but impatient",
-            mood=MoodState.NEUTRAL,
-            workload=40,
-            skills=["Marketing Strategy", "Communication", "Leadership", "Results Focus"],
-            personality_traits={
-                "drive": 9,
-                "patience": 3,
-                "communication": 8,
-                "results_focus": 9,
-                "collaboration": 6
-            },
-            trigger_points=["long_meetings", "indecision", "slow_progress"],
-            current_tasks=[]
-        )
-    }
+    return dict(INITIAL_TEAM)
 
-def get_available_tasks() -> List[Dict]:
+class TaskCatalog:
+    """Read-only task list with id and skill indexes, built once and shared by every session."""
+    
+    __slots__ = ("_tasks", "_by_id", "_by_skill")
+    
+    def __init__(self, tasks: Iterable[Task]):
+        tasks = tuple(tasks)
+        by_skill: Dict[str, List[Task]] = {}
+        for task in tasks:
+            for skill in task.skills_required:
+                by_skill.setdefault(skill, []).append(task)
+        
+        object.__setattr__(self, "_tasks", tasks)
+        object.__setattr__(self, "_by_id", MappingProxyType({task.id: task for task in tasks}))
+        object.__setattr__(self, "_by_skill", MappingProxyType({skill: tuple(ts) for skill, ts in by_skill.items()}))
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("TaskCatalog is immutable")
+    
+    @property
+    def tasks(self) -> Tuple[Task, ...]:
+        return self._tasks
+    
+    @property
+    def by_id(self) -> Mapping[str, Task]:
+        return self._by_id
+    
+    @property
+    def by_skill(self) -> Mapping[str, Tuple[Task, ...]]:
+        return self._by_skill
+    
+    def get(self, task_id: Optional[str]) -> Optional[Task]:
+        return self._by_id.get(task_id)
+    
+    def with_skill(self, skill: str) -> Tuple[Task, ...]:
+        return self._by_skill.get(skill, ())
+    
+    def __iter__(self) -> Iterator[Task]:
+        return iter(self._tasks)
+    
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+TASK_CATALOG = TaskCatalog([
+    Task(
+        id="create_mockups",
+        name="Create UI Mockups",
+        description="Design initial user interface mockups for the new feature",
+        estimated_hours=8,
+        skills_required=("UI/UX Design", "Prototyping"),
+        urgency="medium",
+        best_fit="jordan"
+    ),
+    Task(
+        id="backend_api",
+        name="Develop Backend API",
+        description="Build the REST API endpoints for data management",
+        estimated_hours=12,
+        skills_required=("Python", "API Development"),
+        urgency="high",
+        best_fit="alex"
+    ),
+    Task(
+        id="market_research",
+        name="Conduct Market Research",
+        description="Research competitor features and user needs",
+        estimated_hours=6,
+        skills_required=("Marketing Strategy", "User Research"),
+        urgency="low",
+        best_fit="sam"
+    ),
+    Task(
+        id="user_testing",
+        name="Plan User Testing",
+        description="Design and coordinate user testing sessions",
+        estimated_hours=4,
+        skills_required=("User Research", "Communication"),
+        urgency="medium",
+        best_fit="jordan"
+    ),
+    Task(
+        id="integration_testing",
+        name="Integration Testing",
+        description="Test API integration with frontend components",
+        estimated_hours=6,
+        skills_required=("JavaScript", "Problem Solving"),
+        urgency="high",
+        best_fit="alex"
+    )
+])
+
+def action_rng(seed: int, index: int) -> random.Random:
+    """Random source for the `index`-th action of a session: same seed and index, same choices."""
+    return random.Random((seed << 32) | index)
+
+def get_available_tasks() -> Tuple[Task, ...]:
     """Get the list of tasks that need to be delegated."""
-    return [
-        {
-            "id": "create_mockups",
-            "name": "Create UI Mockups",
-            "description": "Design initial user interface mockups for the new feature",
-            "estimated_hours": 8,
-            "skills_required": ["UI/UX Design", "Prototyping"],
-            "urgency": "medium",
-            "best_fit": "jordan"
-        },
-        {
-            "id": "backend_api",
-            "name": "Develop Backend API",
-            "description": "Build the REST API endpoints for data management",
-            "estimated_hours": 12,
-            "skills_required": ["Python", "API Development"],
-            "urgency": "high",
-            "best_fit": "alex"
-        },
-        {
-            "id": "market_research",
-            "name": "Conduct Market Research",
-            "description": "Research competitor features and user needs",
-            "estimated_hours": 6,
-            "skills_required": ["Marketing Strategy", "User Research"],
-            "urgency": "low",
-            "best_fit": "sam"
-        },
-        {
-            "id": "user_testing",
-            "name": "Plan User Testing",
-            "description": "Design and coordinate user testing sessions",
-            "estimated_hours": 4,
-            "skills_required": ["User Research", "Communication"],
-            "urgency": "medium",
-            "best_fit": "jordan"
-        },
-        {
-            "id": "integration_testing",
-            "name": "Integration Testing",
-            "description": "Test API integration with frontend components",
-            "estimated_hours": 6,
-            "skills_required": ["JavaScript", "Problem Solving"],
-            "urgency": "high",
-            "best_fit": "alex"
-        }
-    ]
+    return TASK_CATALOG.tasks
 
 def process_action(session_state, action: SimulationAction) -> ActionResponse:
-    """Process a user action and return the team's response."""
+    """Process a user action and return the team's response.
+
+    Handlers never mutate members: they replace changed ones in this new dict
+    with copies, so every unchanged member stays shared with the session's state.
+    """
     team_members = session_state.team_members.copy()
     
     if action.type == "delegate_task":
@@ -122,7 +181,7 @@ def process_action(session_state, action: SimulationAction) -> ActionResponse:
     elif action.type == "address_conflict":
         return handle_conflict_resolution(team_members, action)
     elif action.type == "ask_question":
-        return handle_question(team_members, action)
+        return handle_question(team_members, action, action_rng(session_state.seed, len(session_state.actions)))
     
     return ActionResponse(
         success=False,
@@ -130,6 +189,12 @@ def process_action(session_state, action: SimulationAction) -> ActionResponse:
         updated_team_state=team_members
     )
 
+def with_mood(member: TeamMember, mood: MoodState) -> TeamMember:
+    """Copy of `member` in `mood` (the member itself if nothing changes)."""
+    if member.mood == mood:
+        return member
+    return member.model_copy(update={"mood": mood})
+
 def handle_task_delegation(team_members: Dict[str, TeamMember], action: SimulationAction) -> ActionResponse:
     """Handle task delegation to team members."""
     target = action.target_member
@@ -143,8 +208,7 @@ def handle_task_delegation(team_members: Dict[str, TeamMember], action: Simulati
         )
     
     member = team_members[target]
-    tasks = get_available_tasks()
-    task = next((t for t in tasks if t["id"] == task_id), None)
+    task = TASK_CATALOG.get(task_id)
     
     if not task:
         return ActionResponse(
@@ -154,18 +218,18 @@ def handle_task_delegation(team_members: Dict[str, TeamMember], action: Simulati
         )
     
     # Check if task is a good fit
-    is_good_fit = task["best_fit"] == target
-    skill_match = any(skill in member.skills for skill in task["skills_required"])
+    is_good_fit = task.best_fit == target
+    skill_match = any(skill in member.skills for skill in task.skills_required)
     
     # Update member state
-    member.current_tasks.append(task["name"])
-    member.workload += task["estimated_hours"]
+    workload = member.workload + task.estimated_hours
+    mood = member.mood
     
     # TODO: Replace with LLM character response
     # reaction = await get_character_response(
     #     character_name=target,
     #     prompt_type="delegation", 
-    #     task_name=task["name"],
+    #     task_name=task.name,
     #     workload=member.workload,
     #     mood=member.mood.value,
     #     message=action.message or ""
@@ -173,23 +237,28 @@ def handle_task_delegation(team_members: Dict[str, TeamMember], action: Simulati
     
     # Determine reaction based on fit and current mood (PLACEHOLDER - replace with LLM)
     if is_good_fit and skill_match:
-        if member.workload < 50:
-            member.mood = MoodState.HAPPY
+        if workload < 50:
+            mood = MoodState.HAPPY
             reaction = f"{member.name} seems excited about this task - it's right in their wheelhouse!"
         else:
             reaction = f"{member.name} appreciates the good fit but looks concerned about their workload."
     else:
-        if member.workload > 40:
-            member.mood = MoodState.FRUSTRATED
+        if workload > 40:
+            mood = MoodState.FRUSTRATED
             reaction = f"{member.name} looks overwhelmed - this task doesn't match their skills and they're already busy."
         else:
             reaction = f"{member.name} seems uncertain but willing to try."
     
+    member = member.model_copy(update={
+        "current_tasks": member.current_tasks + (task.name,),
+        "workload": workload,
+        "mood": mood,
+    })
     team_members[target] = member
     
     return ActionResponse(
         success=True,
-        message=f"Task '{task['name']}' delegated to {member.name}",
+        message=f"Task '{task.name}' delegated to {member.name}",
         team_member_reaction=reaction,
         mood_change=member.mood,
         updated_team_state=team_members,
@@ -218,18 +287,20 @@ def handle_message(team_members: Dict[str, TeamMember], action: SimulationAction
     #     mood=member.mood.value
     # )
     
-    # Simple sentiment analysis for message tone (PLACEHOLDER - replace with LLM)
-    positive_words = ["great", "excellent", "appreciate", "thank", "good", "well done"]
-    encouraging_words = ["support", "help", "confident", "believe", "capable"]
-    
-    is_positive = any(word in message.lower() for word in positive_words)
-    is_encouraging = any(word in message.lower() for word in encouraging_words)
+    tone = tone_analyzer.analyze(message)
+    triggered = tone.triggers(member.trigger_points)
     
-    if is_positive or is_encouraging:
+    if triggered:
+        if member.mood == MoodState.HAPPY:
+            member = with_mood(member, MoodState.NEUTRAL)
+        elif member.mood == MoodState.NEUTRAL:
+            member = with_mood(member, MoodState.FRUSTRATED)
+        reaction = f"{member.name} stiffens - the message touched on {triggered[0].replace('_', ' ')}."
+    elif tone.supportive:
         if member.mood == MoodState.FRUSTRATED:
-            member.mood = MoodState.NEUTRAL
+            member = with_mood(member, MoodState.NEUTRAL)
         elif member.mood == MoodState.NEUTRAL:
-            member.mood = MoodState.HAPPY
+            member = with_mood(member, MoodState.HAPPY)
         reaction = f"{member.name} smiles and seems more motivated."
     else:
         reaction = f"{member.name} nods politely but seems unchanged."
@@ -253,12 +324,12 @@ def handle_conflict_resolution(team_members: Dict[str, TeamMember], action: Simu
     approach = action.data.get("approach", "neutral") if action.data else "neutral"
     
     if approach == "address_both":
-        sam.mood = MoodState.NEUTRAL
-        jordan.mood = MoodState.NEUTRAL
+        sam = with_mood(sam, MoodState.NEUTRAL)
+        jordan = with_mood(jordan, MoodState.NEUTRAL)
         reaction = "Both Sam and Jordan seem relieved that you're addressing the tension directly."
     elif approach == "private_meetings":
-        sam.mood = MoodState.HAPPY
-        jordan.mood = MoodState.HAPPY
+        sam = with_mood(sam, MoodState.HAPPY)
+        jordan = with_mood(jordan, MoodState.HAPPY)
         reaction = "Sam and Jordan appreciate the private approach - they both seem more comfortable."
     else:
         reaction = "The tension between Sam and Jordan remains unresolved."
@@ -273,7 +344,8 @@ def handle_conflict_resolution(team_members: Dict[str, TeamMember], action: Simu
         updated_team_state=team_members
     )
 
-def handle_question(team_members: Dict[str, TeamMember], action: SimulationAction) -> ActionResponse:
+def handle_question(team_members: Dict[str, TeamMember], action: SimulationAction,
+                    rng: random.Random) -> ActionResponse:
     """Handle asking a question to a team member."""
     target = action.target_member
     
@@ -305,7 +377,7 @@ def handle_question(team_members: Dict[str, TeamMember], action: SimulationActio
         ]
     }
     
-    reaction = random.choice(responses.get(target, ["I'll need to think about that."]))
+    reaction = rng.choice(responses.get(target, ["I'll need to think about that."]))
     
     return ActionResponse(
         success=True,
@@ -314,7 +386,7 @@ def handle_question(team_members: Dict[str, TeamMember], action: SimulationActio
         updated_team_state=team_members
     )
 
-def generate_consequences(member: TeamMember, task: Dict, is_good_fit: bool) -> List[str]:
+def generate_consequences(member: TeamMember, task: Task, is_good_fit: bool) -> List[str]:
     """Generate consequences based on task delegation decisions."""
     consequences = []
     
@@ -0,0 +1,92 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# phase -> (next phase, seconds the phase lasts)
+PHASE_SCHEDULE: Dict[str, Tuple[str, float]] = {
+    "meet_team": ("delegate_tasks", 2 * 60),
+    "delegate_tasks": ("navigate_conflicts", 5 * 60),
+    "navigate_conflicts": ("completed", 3 * 60),
+}
+
+logger = logging.getLogger(__name__)
+
+class PhaseScheduler:
+    """Fires phase deadlines for every live session from one min-heap.
+
+    Deadlines live on the monotonic clock. Rescheduling or cancelling a
+    session just supersedes its heap entry (lazy deletion), so every
+    operation is O(log n) no matter how many sessions are running.
+    `on_deadline(session_id, phase)` is called when `phase` has run out.
+    """
+
+    def __init__(self, on_deadline: Callable[[str, str], None], clock: Callable[[], float] = time.monotonic):
+        self.on_deadline = on_deadline
+        self.clock = clock
+        self._heap: List[Tuple[float, int, str, str]] = []  # (deadline, seq, session_id, phase)
+        self._live: Dict[str, int] = {}  # session_id -> seq of its current heap entry
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def schedule(self, session_id: str, phase: str, remaining: Optional[float] = None) -> None:
+        """(Re)arm the deadline for `phase`; `remaining` defaults to the full phase length."""
+        if phase not in PHASE_SCHEDULE:
+            self.cancel(session_id)
+            return
+        if remaining is None:
+            remaining = PHASE_SCHEDULE[phase][1]
+        deadline = self.clock() + max(0.0, remaining)
+        seq = next(self._seq)
+        self._live[session_id] = seq
+        heapq.heappush(self._heap, (deadline, seq, session_id, phase))
+        if self._heap[0][1] == seq:
+            self._wakeup.set()  # New earliest deadline - the runner has to re-plan its sleep
+
+    def cancel(self, session_id: str) -> None:
+        self._live.pop(session_id, None)
+
+    def is_scheduled(self, session_id: str) -> bool:
+        return session_id in self._live
+
+    def session_ids(self) -> List[str]:
+        return list(self._live)
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def pop_due(self) -> List[Tuple[str, str]]:
+        """Remove and return (session_id, phase) for every deadline that has passed."""
+        due = []
+        now = self.clock()
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, seq, session_id, phase = heapq.heappop(heap)
+            if self._live.get(session_id) == seq:
+                del self._live[session_id]
+                due.append((session_id, phase))
+        # Drop superseded entries sitting at the top so they don't cause early wake-ups
+        while heap and self._live.get(heap[0][2]) != heap[0][1]:
+            heapq.heappop(heap)
+        return due
+
+    def next_delay(self) -> Optional[float]:
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - self.clock())
+
+    async def run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            for session_id, phase in self.pop_due():
+                try:
+                    self.on_deadline(session_id, phase)
+                except Exception:
+                    # One broken session must not stop the clock for everyone else
+                    logger.exception("Phase transition failed for session %s", session_id)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.next_delay())
+            except asyncio.TimeoutError:
+                pass
@@ -1,66 +1,161 @@
-from typing import Dict, List
-from backend.models import SessionState, CompetencyScore, MoodState
-import statistics
+from typing import Dict, List, Optional, Set
+from backend.action_log import ACTION_TYPES, ActionLog
+from backend.metrics import SCORING_SECONDS
+from backend.models import SessionState, SessionResults, CompetencyScore, MoodState, SimulationAction, TeamMember
+from backend.scenarios import TASK_CATALOG
+from backend.tone import tone_analyzer
+import math
+import time
 
 # TODO: Import LLM integration when ready
 # from llm_tasks import COMPETENCY_FEEDBACK_PROMPT
 
+MEMBER_ACTION_TYPES = ("send_message", "ask_question", "delegate_task")
+
+class ScoreTally:
+    """Running scoring totals for one session, updated in O(1) per action."""
+
+    def __init__(self, team_members: Dict[str, TeamMember]):
+        self.action_counts: Dict[str, int] = {}
+        self.members_contacted: Set[str] = set()
+        self.communication_targets: Set[str] = set()
+        self.targeted_types: Set[str] = set()
+        self.assignments: List[tuple] = []  # (task name, member, good fit)
+        self.good_assignments = 0
+        self.tone_counts: Dict[str, int] = {}  # tone -> messages carrying it
+        self.observe_team(team_members)
+
+    @property
+    def total_actions(self) -> int:
+        return sum(self.action_counts.values())
+
+    def record(self, action: SimulationAction) -> None:
+        """Fold one action into the totals."""
+        self._record(action.type, action.target_member, action.task_id, action.message)
+
+    def replay(self, log: ActionLog) -> None:
+        """Fold a whole action log in straight from its integer columns."""
+        for kind, member, task, message in zip(log.kinds, log.members, log.tasks, log.message_refs):
+            self._record(ACTION_TYPES[kind], log.member_name(member), log.task_id(task), log.message(message))
+
+    def _record(self, action_type: str, target: Optional[str], task_id: Optional[str],
+                message: Optional[str] = None) -> None:
+        self.action_counts[action_type] = self.action_counts.get(action_type, 0) + 1
+        if target:
+            self.targeted_types.add(action_type)
+            if action_type in MEMBER_ACTION_TYPES:
+                self.members_contacted.add(target)
+            if action_type in ("send_message", "ask_question"):
+                self.communication_targets.add(target)
+        if message:
+            # Cached by the analyzer, so this reuses the handler's analysis of the same text
+            for tone in tone_analyzer.analyze(message).tones:
+                self.tone_counts[tone] = self.tone_counts.get(tone, 0) + 1
+        
+        if action_type == "delegate_task":
+            task = TASK_CATALOG.get(task_id)
+            if task:
+                is_good_fit = task.best_fit == target
+                self.good_assignments += is_good_fit
+                self.assignments.append((task.name, target, is_good_fit))
+
+    def observe_team(self, team_members: Dict[str, TeamMember]) -> None:
+        """Reset the workload moments from the current team state."""
+        workloads = [member.workload for member in team_members.values()]
+        self.member_count = len(workloads)
+        self.workload_sum = sum(workloads)
+        self.workload_sum_sq = sum(w * w for w in workloads)
+
+    def workload_changed(self, old: int, new: int) -> None:
+        self.workload_sum += new - old
+        self.workload_sum_sq += new * new - old * old
+
+    def workload_stdev(self) -> Optional[float]:
+        """Sample standard deviation of member workloads (None for fewer than two members)."""
+        n = self.member_count
+        if n < 2:
+            return None
+        variance = (self.workload_sum_sq - self.workload_sum * self.workload_sum / n) / (n - 1)
+        return math.sqrt(max(0.0, variance))
+
+def get_tally(session: SessionState) -> ScoreTally:
+    """Return the session's running tally, replaying its actions once if it has none yet."""
+    # Read the private dict directly: pydantic's __getattr__ for private attributes costs microseconds
+    tally = session.__pydantic_private__["_tally"]
+    if tally is None:
+        tally = ScoreTally(session.team_members)
+        tally.replay(session.actions)
+        session._tally = tally
+    return tally
+
 def calculate_final_scores(session: SessionState) -> Dict[str, CompetencyScore]:
     """Calculate NACE competency scores based on user actions during the simulation."""
     
+    started = time.perf_counter()
+    tally = get_tally(session)
     scores = {}
     
     # Critical Thinking - Task assignment logic and priority decisions
-    scores["critical_thinking"] = assess_critical_thinking(session)
+    scores["critical_thinking"] = assess_critical_thinking(session, tally)
     
     # Communication - Message clarity and active listening
-    scores["communication"] = assess_communication(session)
+    scores["communication"] = assess_communication(session, tally)
     
     # Teamwork - Inclusion balance and conflict resolution
-    scores["teamwork"] = assess_teamwork(session)
+    scores["teamwork"] = assess_teamwork(session, tally)
     
     # Leadership - Decision timing and team morale management
-    scores["leadership"] = assess_leadership(session)
+    scores["leadership"] = assess_leadership(session, tally)
     
     # Professionalism - Response consistency and time management
-    scores["professionalism"] = assess_professionalism(session)
+    scores["professionalism"] = assess_professionalism(session, tally)
     
     # Equity & Inclusion - Ensuring all voices heard
-    scores["equity_inclusion"] = assess_equity_inclusion(session)
+    scores["equity_inclusion"] = assess_equity_inclusion(session, tally)
     
+    SCORING_SECONDS.observe(time.perf_counter() - started)
     return scores
 
-def assess_critical_thinking(session: SessionState) -> CompetencyScore:
+def overall_rating(scores: Dict[str, CompetencyScore]) -> str:
+    """Turn the competency scores into the headline rating."""
+    average_score = sum(comp.score for comp in scores.values()) / len(scores) if scores else 0
+    if average_score >= 80:
+        return "Excellent"
+    elif average_score >= 60:
+        return "Good"
+    else:
+        return "Needs Improvement"
+
+def build_session_results(session: SessionState, total_duration: float) -> SessionResults:
+    """Score a finished session; `total_duration` is in minutes."""
+    scores = calculate_final_scores(session)
+    return SessionResults(
+        session_id=session.session_id,
+        competency_scores=scores,
+        total_duration=total_duration,
+        actions_taken=len(session.actions),
+        overall_rating=overall_rating(scores)
+    )
+
+def assess_critical_thinking(session: SessionState, tally: ScoreTally) -> CompetencyScore:
     """Assess critical thinking based on task delegation decisions."""
     score = 50  # Base score
     evidence = []
     
-    task_actions = [a for a in session.actions if a.type == "delegate_task"]
+    good_assignments = tally.good_assignments
+    total_assignments = tally.action_counts.get("delegate_task", 0)
     
     # Check for logical task assignments
-    from backend.scenarios import get_available_tasks
-    available_tasks = {task["id"]: task for task in get_available_tasks()}
-    
-    good_assignments = 0
-    total_assignments = len(task_actions)
-    
-    for action in task_actions:
-        if action.task_id in available_tasks:
-            task = available_tasks[action.task_id]
-            if task["best_fit"] == action.target_member:
-                good_assignments += 1
-                score += 10
-                evidence.append(f"Assigned {task['name']} to {action.target_member} (good skill match)")
-            else:
-                score -= 5
-                evidence.append(f"Assigned {task['name']} to {action.target_member} (skill mismatch)")
+    score += 10 * good_assignments - 5 * (len(tally.assignments) - good_assignments)
+    for task_name, member, is_good_fit in tally.assignments:
+        if is_good_fit:
+            evidence.append(f"Assigned {task_name} to {member} (good skill match)")
+        else:
+            evidence.append(f"Assigned {task_name} to {member} (skill mismatch)")
     
     # Bonus for considering workload balance
-    member_workloads = []
-    for member in session.team_members.values():
-        member_workloads.append(member.workload)
-    
-    if member_workloads and statistics.stdev(member_workloads) < 15:
+    workload_stdev = tally.workload_stdev()
+    if workload_stdev is not None and workload_stdev < 15:
         score += 15
         evidence.append("Maintained balanced workload distribution")
     
@@ -75,36 +170,37 @@ def assess_critical_thinking(session: SessionState) -> CompetencyScore:
         evidence=evidence
     )
 
-def assess_communication(session: SessionState) -> CompetencyScore:
+def assess_communication(session: SessionState, tally: ScoreTally) -> CompetencyScore:
     """Assess communication based on messages sent and questions asked."""
     score = 50
     evidence = []
     
-    message_actions = [a for a in session.actions if a.type == "send_message"]
-    question_actions = [a for a in session.actions if a.type == "ask_question"]
+    message_count = tally.action_counts.get("send_message", 0)
+    question_count = tally.action_counts.get("ask_question", 0)
     
     # Points for active communication
-    score += min(20, len(message_actions) * 5)
-    score += min(15, len(question_actions) * 7)
-    
-    if message_actions:
-        evidence.append(f"Sent {len(message_actions)} messages to team members")
-    if question_actions:
-        evidence.append(f"Asked {len(question_actions)} questions to gather input")
+    score += min(20, message_count * 5)
+    score += min(15, question_count * 7)
+    
+    if message_count:
+        evidence.append(f"Sent {message_count} messages to team members")
+    if question_count:
+        evidence.append(f"Asked {question_count} questions to gather input")
+    supportive_count = tally.tone_counts.get("positive", 0) + tally.tone_counts.get("encouraging", 0)
+    if supportive_count:
+        evidence.append(f"Used appreciative or encouraging language in {supportive_count} messages")
+    for tone in ("critical", "micromanaging", "rushed"):
+        if tally.tone_counts.get(tone):
+            evidence.append(f"{tally.tone_counts[tone]} messages came across as {tone}")
     
     # Check for balanced communication (not favoring one person)
-    communication_targets = {}
-    for action in message_actions + question_actions:
-        if action.target_member:
-            communication_targets[action.target_member] = communication_targets.get(action.target_member, 0) + 1
-    
-    if len(communication_targets) >= 2:
+    if len(tally.communication_targets) >= 2:
         score += 10
         evidence.append("Communicated with multiple team members")
     
     score = max(0, min(100, score))
     
-    feedback = generate_communication_feedback(score, len(message_actions), len(question_actions))
+    feedback = generate_communication_feedback(score, message_count, question_count)
     
     return CompetencyScore(
         name="Communication",
@@ -113,15 +209,15 @@ def assess_communication(session: SessionState) -> CompetencyScore:
         evidence=evidence
     )
 
-def assess_teamwork(session: SessionState) -> CompetencyScore:
+def assess_teamwork(session: SessionState, tally: ScoreTally) -> CompetencyScore:
     """Assess teamwork based on conflict resolution and team inclusion."""
     score = 50
     evidence = []
     
-    conflict_actions = [a for a in session.actions if a.type == "address_conflict"]
+    conflicts_addressed = tally.action_counts.get("address_conflict", 0)
     
     # Points for addressing conflicts
-    if conflict_actions:
+    if conflicts_addressed:
         score += 20
         evidence.append("Proactively addressed team conflicts")
     
@@ -145,7 +241,7 @@ def assess_teamwork(session: SessionState) -> CompetencyScore:
     
     score = max(0, min(100, score))
     
-    feedback = generate_teamwork_feedback(score, len(conflict_actions), happy_members, frustrated_members)
+    feedback = generate_teamwork_feedback(score, conflicts_addressed, happy_members, frustrated_members)
     
     return CompetencyScore(
         name="Teamwork",
@@ -154,12 +250,12 @@ def assess_teamwork(session: SessionState) -> CompetencyScore:
         evidence=evidence
     )
 
-def assess_leadership(session: SessionState) -> CompetencyScore:
+def assess_leadership(session: SessionState, tally: ScoreTally) -> CompetencyScore:
     """Assess leadership based on decision timing and team management."""
     score = 50
     evidence = []
     
-    total_actions = len(session.actions)
+    total_actions = tally.total_actions
     
     # Points for taking action
     if total_actions >= 5:
@@ -173,7 +269,7 @@ def assess_leadership(session: SessionState) -> CompetencyScore:
         evidence.append("Limited action taken during the simulation")
     
     # Check for proactive vs reactive leadership
-    early_actions = len([a for a in session.actions[:3]])
+    early_actions = min(total_actions, 3)
     if early_actions >= 2:
         score += 15
         evidence.append("Demonstrated proactive leadership early in the session")
@@ -198,7 +294,7 @@ def assess_leadership(session: SessionState) -> CompetencyScore:
         evidence=evidence
     )
 
-def assess_professionalism(session: SessionState) -> CompetencyScore:
+def assess_professionalism(session: SessionState, tally: ScoreTally) -> CompetencyScore:
     """Assess professionalism based on consistency and time management."""
     score = 50
     evidence = []
@@ -213,8 +309,7 @@ def assess_professionalism(session: SessionState) -> CompetencyScore:
         evidence.append("Meeting ran significantly over time")
     
     # Consistency in approach
-    action_types = [a.type for a in session.actions]
-    if len(set(action_types)) >= 2:
+    if len(tally.action_counts) >= 2:
         score += 10
         evidence.append("Used varied leadership approaches appropriately")
     
@@ -233,18 +328,13 @@ def assess_professionalism(session: SessionState) -> CompetencyScore:
         evidence=evidence
     )
 
-def assess_equity_inclusion(session: SessionState) -> CompetencyScore:
+def assess_equity_inclusion(session: SessionState, tally: ScoreTally) -> CompetencyScore:
     """Assess equity and inclusion based on ensuring all voices are heard."""
     score = 50
     evidence = []
     
     # Check if all team members were engaged
-    members_contacted = set()
-    for action in session.actions:
-        if action.target_member and action.type in ["send_message", "ask_question", "delegate_task"]:
-            members_contacted.add(action.target_member)
-    
-    inclusion_ratio = len(members_contacted) / len(session.team_members)
+    inclusion_ratio = len(tally.members_contacted) / len(session.team_members)
     
     if inclusion_ratio >= 0.8:  # 80%+ of team engaged
         score += 25
@@ -257,7 +347,7 @@ def assess_equity_inclusion(session: SessionState) -> CompetencyScore:
         evidence.append("Limited engagement with team members")
     
     # Check for adapting communication style (looking at different types of interactions)
-    interaction_variety = len(set(a.type for a in session.actions if a.target_member))
+    interaction_variety = len(tally.targeted_types)
     if interaction_variety >= 2:
         score += 15
         evidence.append("Adapted communication style for different situations")
@@ -0,0 +1,636 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import TypeAdapter
+
+from backend.analytics import COMPETENCIES
+from backend.metrics import SERIALIZATION_SECONDS
+
+from backend.models import PersistedAction, SessionState, SessionResults, SessionRecord, TeamSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Longest wait between retries while the database keeps refusing writes
+MAX_WRITE_BACKOFF = 30.0  # seconds
+
+# Rough JSON sizes, to keep the hot tier within its memory budget without serializing on the request path
+SESSION_BYTES = 512
+ACTION_BYTES = 128
+MEMBER_BYTES = 400
+
+# Stored apart from the session row, one row per action / team snapshot, so a save only appends
+HEAD_EXCLUDE = {"available_tasks", "actions", "team_history"}
+
+PERSISTED_ACTION = TypeAdapter(PersistedAction)
+PERSISTED_ACTIONS = TypeAdapter(List[PersistedAction])
+
+def dump_session(session: SessionState, include=None) -> str:
+    """Storage JSON of a session: its fields, with the action log in its persisted (versioned) form."""
+    fields = session.model_dump_json(include=include, exclude={"available_tasks", "actions"})
+    actions = PERSISTED_ACTIONS.dump_json(session.actions.to_persisted()).decode()
+    # Splice the actions in as the last member of the fields object
+    return f'{fields[:-1]}{"," if fields != "{}" else ""}"actions":{actions}}}'
+
+def join_session_rows(head: str, history: List[str], actions: List[str]) -> str:
+    """Session JSON from its `sessions` row and, in order, its `session_history` and `session_actions` rows."""
+    if not history:
+        # Written before the log moved into its own rows: everything is in the head
+        return head
+    return f'{head[:-1]},"team_history":[{",".join(history)}],"actions":[{",".join(actions)}]}}'
+
+def read_session_rows(conn: sqlite3.Connection, session_id: str) -> Tuple[List[str], List[str]]:
+    """(history, actions) row data of one session, in order."""
+    history = [data for data, in conn.execute(
+        "SELECT data FROM session_history WHERE session_id = ? ORDER BY seq", (session_id,))]
+    actions = [data for data, in conn.execute(
+        "SELECT data FROM session_actions WHERE session_id = ? ORDER BY seq", (session_id,))]
+    return history, actions
+
+def compact_session(session: SessionState, results: SessionResults) -> SessionRecord:
+    """Reduce a scored session to its results, action counts and a compressed archive."""
+    archive = dump_session(session, include={
+        "team_members", "team_history", "start_time", "phase_start_time", "seed", "version", "member_versions",
+    })
+    return SessionRecord(
+        session_id=session.session_id,
+        cohort=session.cohort,
+        results=results,
+        action_counts=session.actions.type_counts(),
+        archive=zlib.compress(archive.encode(), 6),
+    )
+
+def restore_session(record: SessionRecord) -> SessionState:
+    """Rebuild a read-only SessionState from a compacted record."""
+    data = json.loads(zlib.decompress(record.archive))
+    return SessionState(session_id=record.session_id, phase="completed", cohort=record.cohort, **data)
+
+class SessionStore:
+    """Interface every session backend implements.
+
+    Every store counts its live sessions by phase as they are saved, so
+    `phase_counts` and `len` (read on every metrics scrape) never touch the
+    backend.
+    """
+
+    def __init__(self):
+        self._phases: Dict[str, str] = {}  # session_id -> phase of every live session counted here
+        self._phase_counts: Dict[str, int] = {}
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        raise NotImplementedError
+
+    def save(self, session: SessionState) -> None:
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def get_record(self, session_id: str) -> Optional[SessionRecord]:
+        raise NotImplementedError
+
+    def compact(self, record: SessionRecord) -> None:
+        """Replace a finished session with its compact record."""
+        raise NotImplementedError
+
+    def sweep(self) -> int:
+        """Release idle sessions from memory; returns how many were evicted."""
+        return 0
+
+    def iter_live_phases(self) -> Iterator[Tuple[str, str, datetime]]:
+        """Yield (session_id, phase, phase_start_time) for every session not yet completed."""
+        raise NotImplementedError
+
+    def iter_record_scores(self, since: int = 0) -> Iterator[Tuple[int, str, Optional[str], Dict[str, int]]]:
+        """Yield (position, session_id, cohort, {competency: score}) for every session compacted after `since`.
+
+        Positions only grow, so passing the largest one seen picks up where a
+        previous scan stopped (including records other workers wrote).
+        """
+        raise NotImplementedError
+
+    def phase_counts(self) -> Dict[str, int]:
+        """Number of live (not yet compacted) sessions in each phase."""
+        return dict(self._phase_counts)
+
+    def recount(self, owns: Optional[Callable[[str], bool]] = None) -> None:
+        """Rebuild the counts from the backend, keeping only the sessions `owns` accepts (all by default)."""
+        self._phases, self._phase_counts = {}, {}
+        for session_id, phase in self._iter_phases():
+            if owns is None or owns(session_id):
+                self._count(session_id, phase)
+
+    def _iter_phases(self) -> Iterator[Tuple[str, str]]:
+        """Yield (session_id, phase) for every live session in the backend."""
+        raise NotImplementedError
+
+    def _count(self, session_id: str, phase: Optional[str]) -> None:
+        """Record the session's current phase (None once it is deleted or compacted)."""
+        previous = self._phases.get(session_id)
+        if previous == phase:
+            return
+        if previous is not None:
+            self._phase_counts[previous] -= 1  # Left at zero, so the gauge reads 0 rather than vanishing
+        if phase is None:
+            del self._phases[session_id]
+        else:
+            self._phases[session_id] = phase
+            self._phase_counts[phase] = self._phase_counts.get(phase, 0) + 1
+
+    def hot_ids(self) -> List[str]:
+        """Ids of the live sessions currently held in memory."""
+        return []
+
+    def release(self, session_ids: Iterable[str]) -> None:
+        """Write out and forget the in-memory copies, so another process can take the sessions over."""
+
+    def flush(self) -> None:
+        """Make all saved sessions durable."""
+
+    def close(self) -> None:
+        self.flush()
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def __len__(self) -> int:
+        return len(self._phases)
+
+class MemorySessionStore(SessionStore):
+    """Plain dict store, nothing survives a restart (handy for development)."""
+
+    def __init__(self):
+        super().__init__()
+        self._sessions: Dict[str, SessionState] = {}
+        self._records: Dict[str, SessionRecord] = {}
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        return self._sessions.get(session_id)
+
+    def save(self, session: SessionState) -> None:
+        self._sessions[session.session_id] = session
+        self._count(session.session_id, session.phase)
+
+    def delete(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+        self._count(session_id, None)
+
+    def get_record(self, session_id: str) -> Optional[SessionRecord]:
+        return self._records.get(session_id)
+
+    def compact(self, record: SessionRecord) -> None:
+        self._records[record.session_id] = record
+        self._sessions.pop(record.session_id, None)
+        self._count(record.session_id, None)
+
+    def iter_live_phases(self) -> Iterator[Tuple[str, str, datetime]]:
+        for session in list(self._sessions.values()):
+            if session.phase != "completed":
+                yield session.session_id, session.phase, session.phase_start_time
+
+    def iter_record_scores(self, since: int = 0) -> Iterator[Tuple[int, str, Optional[str], Dict[str, int]]]:
+        for position, record in enumerate(list(self._records.values())[since:], since + 1):
+            scores = {name: score.score for name, score in record.results.competency_scores.items()}
+            yield position, record.session_id, record.cohort, scores
+
+    def _iter_phases(self) -> Iterator[Tuple[str, str]]:
+        for session in list(self._sessions.values()):
+            yield session.session_id, session.phase
+
+    @property
+    def hot_count(self) -> int:
+        return len(self._sessions)
+
+class SessionWrite:
+    """What one or more saves of a session still have to write: its fields and the log rows added since.
+
+    Rows from `actions_start` / `history_start` on are replaced, so a log
+    that was cut back (a rolled-back batch) is written correctly too.
+    """
+
+    __slots__ = ("session", "head", "actions_start", "actions", "history_start", "history")
+
+    def __init__(self, session: SessionState, head: SessionState, actions_start: int, actions: List[PersistedAction],
+                 history_start: int, history: List[TeamSnapshot]):
+        self.session = session  # The live object, handed back to readers until the write is committed
+        self.head = head
+        self.actions_start = actions_start
+        self.actions = actions
+        self.history_start = history_start
+        self.history = history
+
+    @classmethod
+    def since(cls, session: SessionState, persisted: Optional[Tuple[int, int, int]]):
+        """(write of what changed after `persisted`, the new watermark), None meaning nothing is stored yet.
+
+        Watermarks are (actions, team snapshots, members across those snapshots).
+        """
+        persisted = persisted or (0, 0, 0)
+        actions_start = min(persisted[0], len(session.actions))
+        history_start = min(persisted[1], len(session.team_history))
+        history = session.team_history[history_start:]
+        if history_start == persisted[1]:
+            history_members = persisted[2] + sum(len(snapshot.members) for snapshot in history)
+        else:
+            history_members = sum(len(snapshot.members) for snapshot in session.team_history)
+
+        # Shallow copies of everything the loop goes on mutating in place; members, snapshots and
+        # stored responses are never mutated, so the writer thread can serialize them at leisure
+        write = cls(
+            session,
+            session.model_copy(update={
+                "team_members": dict(session.team_members),
+                "member_versions": dict(session.member_versions),
+                "idempotent_responses": dict(session.idempotent_responses),
+            }),
+            actions_start, session.actions.to_persisted(actions_start),
+            history_start, history,
+        )
+        return write, (len(session.actions), len(session.team_history), history_members)
+
+    def then(self, newer: "SessionWrite") -> "SessionWrite":
+        """One write with the effect of this one followed by `newer`."""
+        actions_start, actions = self._splice(self.actions_start, self.actions, newer.actions_start, newer.actions)
+        history_start, history = self._splice(self.history_start, self.history, newer.history_start, newer.history)
+        return SessionWrite(newer.session, newer.head, actions_start, actions, history_start, history)
+
+    @staticmethod
+    def _splice(start: int, rows: list, newer_start: int, newer_rows: list) -> Tuple[int, list]:
+        if newer_start <= start:
+            return newer_start, newer_rows
+        return start, rows[:newer_start - start] + newer_rows
+
+    def rows(self) -> Tuple[str, List[Tuple[str, int, str]], List[Tuple[str, int, str]]]:
+        """(session JSON, action rows, team snapshot rows); the expensive part, run by the writer."""
+        session_id = self.head.session_id
+        started = time.perf_counter()
+        head = self.head.model_dump_json(exclude=HEAD_EXCLUDE)
+        actions = [(session_id, seq, PERSISTED_ACTION.dump_json(action).decode())
+                   for seq, action in enumerate(self.actions, self.actions_start)]
+        history = [(session_id, seq, snapshot.model_dump_json())
+                   for seq, snapshot in enumerate(self.history, self.history_start)]
+        # Observed on the writer thread, the only one that records this series
+        SERIALIZATION_SECONDS.observe(time.perf_counter() - started, "persist")
+        return head, actions, history
+
+class SQLiteSessionStore(SessionStore):
+    """LRU hot tier in memory with write-behind persistence to SQLite.
+
+    `save` queues what changed since the session was last saved: its fields,
+    plus only the actions and team snapshots appended since, so the cost of a
+    save doesn't grow with the length of the session. A background thread
+    serializes the queue and commits it in batches, so the request path never
+    waits on disk or on JSON encoding. Sessions pushed out of the hot tier are
+    loaded back on first access. `sweep` additionally evicts sessions idle for
+    longer than `idle_ttl` seconds and keeps the hot tier within roughly
+    `memory_budget` bytes of JSON.
+    """
+
+    def __init__(self, path: str, hot_capacity: int = 1000,
+                 flush_interval: float = 0.5, batch_size: int = 500,
+                 idle_ttl: float = 900, memory_budget: int = 256 * 1024 * 1024):
+        super().__init__()
+        self.path = path
+        self.hot_capacity = hot_capacity
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.idle_ttl = idle_ttl
+        self.memory_budget = memory_budget
+
+        # session_id -> (session, last access on the monotonic clock, estimated serialized size)
+        self._hot: "OrderedDict[str, list]" = OrderedDict()
+        self._hot_bytes = 0
+        self._records: "OrderedDict[str, SessionRecord]" = OrderedDict()
+        self._pending: Dict[str, Optional[SessionWrite]] = {}  # None = delete
+        self._pending_records: Dict[str, str] = {}
+        # The batch flush() is committing; readers still see it until the COMMIT has gone through
+        self._flushing: Dict[str, Optional[SessionWrite]] = {}
+        self._flushing_records: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._closed = False
+
+        self._read_conn = self._connect()
+        self._read_conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " phase TEXT,"
+            " updated_at REAL NOT NULL DEFAULT (julianday('now')))"
+        )
+        columns = [row[1] for row in self._read_conn.execute("PRAGMA table_info(sessions)")]
+        if "phase" not in columns:  # Databases from before the column was added
+            self._read_conn.execute("ALTER TABLE sessions ADD COLUMN phase TEXT")
+            self._read_conn.execute("UPDATE sessions SET phase = json_extract(data, '$.phase')")
+        for table in ("session_actions", "session_history"):
+            self._read_conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                " session_id TEXT NOT NULL,"
+                " seq INTEGER NOT NULL,"
+                " data TEXT NOT NULL,"
+                " PRIMARY KEY (session_id, seq)) WITHOUT ROWID"
+            )
+        self._read_conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_records ("
+            " session_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL)"
+        )
+        self._write_conn = self._connect()
+        self.recount()
+
+        self._writer = threading.Thread(target=self._write_loop, name="session-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        entry = self._hot.get(session_id)
+        if entry is not None:
+            entry[1] = time.monotonic()
+            self._hot.move_to_end(session_id)
+            return entry[0]
+
+        # Cold path: a write still waiting in the queue (or being committed) wins over the database
+        with self._lock:
+            queued = self._pending.get(session_id, self._flushing.get(session_id, False))
+            if queued is False:
+                session = self._load(session_id)
+        if queued is None:
+            return None
+        if queued is not False:
+            session = queued.session
+        elif session is None:
+            return None
+        self._admit(session, self._estimate_size(session))
+        return session
+
+    def _load(self, session_id: str) -> Optional[SessionState]:
+        """Reassemble a session from its row and log rows (caller holds `_lock`)."""
+        conn = self._read_conn
+        conn.execute("BEGIN")  # One read snapshot across the three tables
+        try:
+            row = conn.execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            history, actions = read_session_rows(conn, session_id)
+        finally:
+            conn.execute("COMMIT")
+        session = SessionState.model_validate_json(join_session_rows(row[0], history, actions))
+        if not history:
+            # A legacy row is left without a watermark, so its next save rewrites it in the current layout
+            return session
+        session._persisted = (len(actions), len(history), sum(len(snapshot.members) for snapshot in session.team_history))
+        return session
+
+    def save(self, session: SessionState) -> None:
+        with self._lock:
+            deleted = session.session_id in self._pending and self._pending[session.session_id] is None
+        write, session._persisted = SessionWrite.since(session, None if deleted else session._persisted)
+        self._admit(session, self._estimate_size(session))
+        self._count(session.session_id, session.phase)
+        with self._lock:
+            queued = self._pending.get(session.session_id)
+            self._pending[session.session_id] = queued.then(write) if queued is not None else write
+            backlog = len(self._pending)
+        if backlog >= self.batch_size:
+            self._wake.set()
+
+    @staticmethod
+    def _estimate_size(session: SessionState) -> int:
+        members = session._persisted[2] if session._persisted is not None else len(session.team_members)
+        return (SESSION_BYTES + ACTION_BYTES * len(session.actions)
+                + MEMBER_BYTES * (members + len(session.team_members)))
+
+    def delete(self, session_id: str) -> None:
+        entry = self._hot.get(session_id)
+        if entry is not None:
+            entry[0]._persisted = None  # Saved again after all, it is written out from scratch
+        self._drop(session_id)
+        self._count(session_id, None)
+        with self._lock:
+            self._pending[session_id] = None
+
+    def get_record(self, session_id: str) -> Optional[SessionRecord]:
+        record = self._records.get(session_id)
+        if record is not None:
+            self._records.move_to_end(session_id)
+            return record
+
+        with self._lock:
+            data = self._pending_records.get(session_id) or self._flushing_records.get(session_id)
+        if data is None:
+            data = self._select("SELECT data FROM session_records WHERE session_id = ?", session_id)
+            if data is None:
+                return None
+        record = SessionRecord.model_validate_json(data)
+        self._cache_record(record)
+        return record
+
+    def compact(self, record: SessionRecord) -> None:
+        self._drop(record.session_id)
+        self._count(record.session_id, None)
+        self._cache_record(record)
+        with self._lock:
+            self._pending_records[record.session_id] = record.model_dump_json()
+            self._pending[record.session_id] = None
+
+    def _select(self, query: str, session_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._read_conn.execute(query, (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def _admit(self, session: SessionState, size: int) -> None:
+        previous = self._hot.pop(session.session_id, None)
+        if previous is not None:
+            self._hot_bytes -= previous[2]
+        self._hot[session.session_id] = [session, time.monotonic(), size]
+        self._hot_bytes += size
+        while len(self._hot) > self.hot_capacity:
+            # Every mutation goes through save(), so the evicted copy is already queued or on disk
+            self._evict_oldest()
+
+    def _drop(self, session_id: str) -> None:
+        entry = self._hot.pop(session_id, None)
+        if entry is not None:
+            self._hot_bytes -= entry[2]
+
+    def _evict_oldest(self) -> None:
+        _, entry = self._hot.popitem(last=False)
+        self._hot_bytes -= entry[2]
+
+    def _cache_record(self, record: SessionRecord) -> None:
+        self._records[record.session_id] = record
+        self._records.move_to_end(record.session_id)
+        while len(self._records) > self.hot_capacity:
+            self._records.popitem(last=False)
+
+    def hot_ids(self) -> List[str]:
+        return list(self._hot)
+
+    def release(self, session_ids: Iterable[str]) -> None:
+        for session_id in session_ids:
+            self._drop(session_id)
+        self.flush()
+
+    def sweep(self) -> int:
+        evicted = 0
+        cutoff = time.monotonic() - self.idle_ttl
+        # The hot tier is ordered by last access, so idle sessions sit at the front
+        while self._hot:
+            entry = next(iter(self._hot.values()))
+            if entry[1] >= cutoff and self._hot_bytes <= self.memory_budget:
+                break
+            self._evict_oldest()
+            evicted += 1
+        return evicted
+
+    def iter_live_phases(self) -> Iterator[Tuple[str, str, datetime]]:
+        self.flush()
+        with self._lock:
+            rows = self._read_conn.execute(
+                "SELECT session_id, phase, json_extract(data, '$.phase_start_time')"
+                " FROM sessions WHERE phase != 'completed'"
+            ).fetchall()
+        for session_id, phase, phase_start_time in rows:
+            yield session_id, phase, datetime.fromisoformat(phase_start_time)
+
+    def _iter_phases(self) -> Iterator[Tuple[str, str]]:
+        self.flush()
+        with self._lock:
+            rows = self._read_conn.execute("SELECT session_id, phase FROM sessions").fetchall()
+        return iter(rows)
+
+    def iter_record_scores(self, since: int = 0, batch_size: int = 5000) -> Iterator[Tuple[int, str, Optional[str], Dict[str, int]]]:
+        if not since:
+            self.flush()  # Catching up later only needs what other workers wrote; our own are already counted
+        columns = ", ".join(
+            f"json_extract(data, '$.results.competency_scores.{name}.score')" for name in COMPETENCIES
+        )
+        # A dedicated connection so a long scan doesn't hold up request-path reads
+        conn = self._connect()
+        try:
+            # Rewriting a record gives it a new rowid, so it comes round again (and is skipped as already seen)
+            cursor = conn.execute(
+                f"SELECT rowid, session_id, json_extract(data, '$.cohort'), {columns} FROM session_records "
+                "WHERE rowid > ? ORDER BY rowid", (since,),
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for position, session_id, cohort, *scores in rows:
+                    yield position, session_id, cohort, {name: score or 0 for name, score in zip(COMPETENCIES, scores)}
+        finally:
+            conn.close()
+
+    @property
+    def hot_count(self) -> int:
+        return len(self._hot)
+
+    @property
+    def hot_bytes(self) -> int:
+        return self._hot_bytes
+
+    def _write_loop(self) -> None:
+        failures = 0
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # The batch is back in the queue; keep the thread alive and retry with growing pauses
+                failures += 1
+                delay = min(MAX_WRITE_BACKOFF, self.flush_interval * 2 ** failures)
+                with self._lock:
+                    backlog = len(self._pending) + len(self._pending_records)
+                logger.exception("Writing %d queued sessions failed (%d in a row); retrying in %.1fs",
+                                 backlog, failures, delay)
+                self._stop.wait(delay)
+            else:
+                failures = 0
+
+    def flush(self) -> None:
+        with self._write_lock:
+            with self._lock:
+                if not self._pending and not self._pending_records:
+                    return
+                batch, self._pending = self._pending, {}
+                records, self._pending_records = self._pending_records, {}
+                self._flushing, self._flushing_records = batch, records
+
+            conn = self._write_conn
+            try:
+                upserts, cut_actions, cut_history, actions, history = [], [], [], [], []
+                for sid, write in batch.items():
+                    if write is None:
+                        continue
+                    data, action_rows, history_rows = write.rows()
+                    upserts.append((sid, data, write.head.phase))
+                    cut_actions.append((sid, write.actions_start))
+                    cut_history.append((sid, write.history_start))
+                    actions.extend(action_rows)
+                    history.extend(history_rows)
+                deletes = [(sid,) for sid, write in batch.items() if write is None]
+
+                conn.execute("BEGIN")
+                if upserts:
+                    conn.executemany(
+                        "INSERT INTO sessions (session_id, data, phase, updated_at) VALUES (?, ?, ?, julianday('now'))"
+                        " ON CONFLICT(session_id) DO UPDATE SET"
+                        " data = excluded.data, phase = excluded.phase, updated_at = excluded.updated_at",
+                        upserts,
+                    )
+                    conn.executemany("DELETE FROM session_actions WHERE session_id = ? AND seq >= ?", cut_actions)
+                    conn.executemany("DELETE FROM session_history WHERE session_id = ? AND seq >= ?", cut_history)
+                    conn.executemany("INSERT INTO session_actions (session_id, seq, data) VALUES (?, ?, ?)", actions)
+                    conn.executemany("INSERT INTO session_history (session_id, seq, data) VALUES (?, ?, ?)", history)
+                if deletes:
+                    conn.executemany("DELETE FROM sessions WHERE session_id = ?", deletes)
+                    conn.executemany("DELETE FROM session_actions WHERE session_id = ?", deletes)
+                    conn.executemany("DELETE FROM session_history WHERE session_id = ?", deletes)
+                if records:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO session_records (session_id, data) VALUES (?, ?)",
+                        records.items(),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                # Put the batch back, ahead of anything saved for the same sessions meanwhile
+                with self._lock:
+                    for sid, write in batch.items():
+                        newer = self._pending.get(sid, False)
+                        if newer is False:
+                            self._pending[sid] = write
+                        elif newer is not None and write is not None:
+                            self._pending[sid] = write.then(newer)
+                    for sid, data in records.items():
+                        self._pending_records.setdefault(sid, data)
+                    self._flushing, self._flushing_records = {}, {}
+                raise
+            with self._lock:
+                self._flushing, self._flushing_records = {}, {}
+
+    def close(self) -> None:
+        self._closed = True
+        self._stop.set()
+        self._wake.set()
+        self._writer.join(timeout=5)
+        self.flush()
+        self._write_conn.close()
+        self._read_conn.close()
@@ -0,0 +1,148 @@
+"""
+Tone analysis for the messages a user sends to team members.
+
+Each tone has a weighted lexicon. All lexicons are compiled once into a single
+regex whose alternation is factored as a character trie and anchored on word
+boundaries, so a message is scanned in one pass no matter how many terms the
+lexicons hold, and "goodbye" no longer counts as "good". Results are cached
+per message text, so scoring can re-read the tone of a message the action
+handler has already analysed without scanning it again.
+
+Extra lexicons can be supplied as JSON ({tone: {term: weight}}) through
+TONE_LEXICONS; they are merged over the defaults.
+"""
+
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TONES = ("positive", "encouraging", "critical", "micromanaging", "rushed")
+
+# Summed weight at which a message counts as having a tone
+TONE_THRESHOLD = 1.0
+
+DEFAULT_LEXICONS: Dict[str, Dict[str, float]] = {
+    "positive": {
+        "great": 1.0, "excellent": 1.0, "appreciate": 1.0, "appreciated": 1.0, "thank": 1.0, "thanks": 1.0,
+        "thank you": 1.0, "good": 1.0, "well done": 1.0, "nice work": 1.0, "good job": 1.0, "great job": 1.0,
+        "awesome": 1.0, "amazing": 1.0, "fantastic": 1.0, "impressive": 1.0, "brilliant": 1.0, "nice": 0.5,
+    },
+    "encouraging": {
+        "support": 1.0, "supporting": 1.0, "help": 1.0, "helping": 1.0, "confident": 1.0, "believe": 1.0,
+        "capable": 1.0, "trust": 1.0, "you've got this": 1.0, "you can do it": 1.0, "proud of": 1.0,
+        "take your time": 1.0, "happy to help": 1.0, "let me know if": 0.5,
+    },
+    "critical": {
+        "disappointed": 1.0, "disappointing": 1.0, "unacceptable": 1.0, "not acceptable": 1.0, "sloppy": 1.0,
+        "careless": 1.0, "not good enough": 1.0, "terrible": 1.0, "poor": 0.5, "wrong": 0.5, "mistake": 0.5,
+        "mistakes": 0.5, "fell short": 1.0, "failed": 0.5, "failure": 1.0, "should have": 0.5,
+    },
+    "micromanaging": {
+        "check in with me": 1.0, "run it by me": 1.0, "report back": 0.5, "cc me": 1.0, "update me": 0.5,
+        "every hour": 1.0, "every step": 1.0, "step by step": 0.5, "exactly as i said": 1.0,
+        "exactly how i": 1.0, "before you do anything": 1.0, "i'll review everything": 1.0,
+        "send me every": 1.0, "double-check with me": 1.0, "status update": 0.5,
+    },
+    "rushed": {
+        "asap": 1.0, "urgent": 1.0, "urgently": 1.0, "immediately": 1.0, "right now": 1.0, "right away": 1.0,
+        "hurry": 1.0, "rush": 1.0, "quickly": 0.5, "by tonight": 1.0, "by end of day": 1.0, "eod": 1.0,
+        "no time": 1.0, "just get it done": 1.0,
+    },
+}
+
+# Which tone sets off which TeamMember.trigger_points
+TONE_TRIGGERS: Dict[str, Tuple[str, ...]] = {
+    "critical": ("public_criticism",),
+    "micromanaging": ("micromanagement",),
+    "rushed": ("rushed_feedback", "tight_deadlines"),
+}
+
+class ToneAnalysis:
+    """Summed lexicon weight per tone for one message, and the terms that matched."""
+
+    __slots__ = ("scores", "terms")
+
+    def __init__(self, scores: Dict[str, float], terms: Tuple[str, ...]):
+        self.scores = scores
+        self.terms = terms
+
+    def __getitem__(self, tone: str) -> float:
+        return self.scores.get(tone, 0.0)
+
+    def has(self, tone: str) -> bool:
+        return self[tone] >= TONE_THRESHOLD
+
+    @property
+    def tones(self) -> List[str]:
+        return [tone for tone in self.scores if self.has(tone)]
+
+    @property
+    def supportive(self) -> bool:
+        return self.has("positive") or self.has("encouraging")
+
+    def triggers(self, trigger_points: Iterable[str]) -> List[str]:
+        """The member's trigger points this message sets off."""
+        hit = {point for tone in self.tones for point in TONE_TRIGGERS.get(tone, ())}
+        return [point for point in trigger_points if point in hit]
+
+def normalize_term(term: str) -> str:
+    return " ".join(term.lower().split())
+
+def _trie_pattern(node: Dict) -> str:
+    """Regex for every term below `node`, sharing common prefixes so matching never retries them."""
+    branches = [
+        (r"\s+" if char == " " else re.escape(char)) + _trie_pattern(child)
+        for char, child in sorted(node.items()) if char
+    ]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if "" in node:
+        # A term ends here; longer ones continue. Greedy, so the longest term wins.
+        return "(?:" + body + ")?"
+    return body
+
+class ToneAnalyzer:
+    """Single-pass matcher over all tone lexicons."""
+
+    def __init__(self, lexicons: Dict[str, Dict[str, float]], cache_size: int = 4096):
+        self._weights: Dict[str, List[Tuple[str, float]]] = {}
+        trie: Dict = {}
+        for tone, terms in lexicons.items():
+            for term, weight in terms.items():
+                term = normalize_term(term)
+                if not term:
+                    continue
+                self._weights.setdefault(term, []).append((tone, float(weight)))
+                node = trie
+                for char in term:
+                    node = node.setdefault(char, {})
+                node[""] = True
+        self.tones = tuple(lexicons)
+        self.term_count = len(self._weights)
+        self._pattern = re.compile(r"(?<!\w)" + _trie_pattern(trie) + r"(?!\w)") if self._weights else None
+        self.analyze = lru_cache(maxsize=cache_size)(self._analyze)
+
+    def _analyze(self, message: str) -> ToneAnalysis:
+        scores = dict.fromkeys(self.tones, 0.0)
+        terms = []
+        if self._pattern is not None and message:
+            for match in self._pattern.finditer(message.lower()):
+                term = normalize_term(match.group())
+                terms.append(term)
+                for tone, weight in self._weights[term]:
+                    scores[tone] += weight
+        return ToneAnalysis(scores, tuple(terms))
+
+def load_lexicons(path: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    """The default lexicons, with the JSON file at `path` merged over them."""
+    lexicons = {tone: dict(terms) for tone, terms in DEFAULT_LEXICONS.items()}
+    if path:
+        with open(path) as f:
+            for tone, terms in json.load(f).items():
+                lexicons.setdefault(tone, {}).update(terms)
+    return lexicons
+
+tone_analyzer = ToneAnalyzer(load_lexicons(os.environ.get("TONE_LEXICONS") or None))
@@ -2,6 +2,8 @@ class SimulationManager {
     constructor() {
         this.sessionId = null;
         this.currentState = null;
+        this.stateEtag = null;
+        this.eventSource = null;
         this.timer = null;
         this.startTime = null;
         this.phaseData = {
@@ -112,8 +114,9 @@ class SimulationManager {
             // Start timer
             this.startTimer();
 
-            // Load initial state
+            // Load initial state, then let the server push changes
             await this.updateSimulationState();
+            this.subscribeToUpdates();
 
         } catch (error) {
             console.error('Error starting simulation:', error);
@@ -133,12 +136,26 @@ class SimulationManager {
 
     async updateSimulationState() {
         try {
-            const response = await fetch(`/api/session/${this.sessionId}/state`);
+            // After the first full load, only ask for what changed since our version
+            const url = this.currentState
+                ? `/api/session/${this.sessionId}/state?since=${this.currentState.version}`
+                : `/api/session/${this.sessionId}/state`;
+            const headers = this.stateEtag ? { 'If-None-Match': this.stateEtag } : {};
+            const response = await fetch(url, { headers });
+            if (response.status === 304) {
+                return;
+            }
             if (!response.ok) {
                 throw new Error('Failed to get simulation state');
             }
 
-            this.currentState = await response.json();
+            this.stateEtag = response.headers.get('ETag');
+            const data = await response.json();
+            if (this.currentState) {
+                this.applyStateDelta(data);
+            } else {
+                this.currentState = data;
+            }
             this.renderSimulationState();
 
             // Check if simulation is complete
@@ -151,6 +168,50 @@ class SimulationManager {
         }
     }
 
+    subscribeToUpdates() {
+        if (!window.EventSource) {
+            return;  // Fall back to fetching state after each action
+        }
+
+        this.eventSource = new EventSource(`/api/session/${this.sessionId}/events?since=${this.currentState.version}`);
+        this.eventSource.addEventListener('state', (event) => {
+            const delta = JSON.parse(event.data);
+            if (delta.version <= this.currentState.version) {
+                return;
+            }
+            if (delta.since !== this.currentState.version) {
+                // We missed an update somewhere - catch up with a regular fetch
+                this.updateSimulationState();
+                return;
+            }
+
+            this.applyStateDelta(delta);
+            this.renderSimulationState();
+            if (this.currentState.phase === 'completed') {
+                this.showResults();
+            }
+        });
+        this.eventSource.addEventListener('resync', () => {
+            this.updateSimulationState();
+        });
+    }
+
+    unsubscribeFromUpdates() {
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
+    }
+
+    applyStateDelta(delta) {
+        Object.assign(this.currentState.team_members, delta.team_members);
+        this.currentState.actions.push(...delta.actions);
+        this.currentState.version = delta.version;
+        this.currentState.phase = delta.phase;
+        this.currentState.phase_start_time = delta.phase_start_time;
+        this.currentState.coaching_hint = delta.coaching_hint;
+    }
+
     renderSimulationState() {
         // Update phase indicator
         const phaseInfo = this.phaseData[this.currentState.phase];
@@ -170,6 +231,15 @@ class SimulationManager {
 
         // Update modal dropdowns
         this.updateModalDropdowns();
+
+        this.renderCoachingHint();
+    }
+
+    renderCoachingHint() {
+        const hintElement = document.getElementById('coaching-hint');
+        const hint = this.currentState.coaching_hint;
+        hintElement.classList.toggle('d-none', !hint);
+        hintElement.textContent = hint ? `💡 Coach: ${hint}` : '';
     }
 
     renderTeamMembers() {
@@ -366,25 +436,59 @@ class SimulationManager {
         document.querySelectorAll('input[name="conflictApproach"]').forEach(radio => radio.checked = false);
     }
 
+    async postWithRetry(url, body, attempts = 3) {
+        // One key per click: if the network drops the response, the retry gets the stored result back
+        const idempotencyKey = window.crypto && crypto.randomUUID
+            ? crypto.randomUUID()
+            : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+        for (let attempt = 1; ; attempt++) {
+            try {
+                return await fetch(url, {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                        'Idempotency-Key': idempotencyKey
+                    },
+                    body: JSON.stringify(body)
+                });
+            } catch (error) {
+                if (attempt >= attempts) {
+                    throw error;
+                }
+                await new Promise(resolve => setTimeout(resolve, 300 * attempt));
+            }
+        }
+    }
+
     async submitAction(action) {
         try {
-            const response = await fetch(`/api/session/${this.sessionId}/action`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify(action)
-            });
+            // The state change is committed before the first byte; the reaction streams in after it
+            const response = await this.postWithRetry(`/api/session/${this.sessionId}/action/stream`, action);
 
             if (!response.ok) {
                 throw new Error('Failed to submit action');
             }
 
-            const result = await response.json();
-            this.logActivity(action, result);
+            let reactionElement = null;
+            let reaction = '';
+            await this.readEventStream(response, (event, data) => {
+                if (event === 'result') {
+                    reactionElement = this.logActivity(action, {
+                        ...data,
+                        team_member_reaction: data.team_member_reaction === null ? null : ''
+                    });
+                } else if (event === 'token' && reactionElement) {
+                    reaction += data.text;
+                    reactionElement.textContent = reaction;
+                } else if (event === 'done' && reactionElement) {
+                    reactionElement.textContent = data.team_member_reaction || '';
+                }
+            });
 
-            // Update simulation state
-            await this.updateSimulationState();
+            // State changes arrive over the event stream; only fetch when we have none
+            if (!this.eventSource) {
+                await this.updateSimulationState();
+            }
 
         } catch (error) {
             console.error('Error submitting action:', error);
@@ -392,6 +496,37 @@ class SimulationManager {
         }
     }
 
+    async readEventStream(response, onEvent) {
+        // EventSource only does GET, so parse the SSE frames of this POST response by hand
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const frame = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let event = 'message';
+                const dataLines = [];
+                frame.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) {
+                        event = line.slice(6).trim();
+                    } else if (line.startsWith('data:')) {
+                        dataLines.push(line.slice(5).trim());
+                    }
+                });
+                if (dataLines.length > 0) {
+                    onEvent(event, JSON.parse(dataLines.join('\n')));
+                }
+            }
+        }
+    }
+
     logActivity(action, result) {
         const logContainer = document.getElementById('activity-log');
         const entry = document.createElement('div');
@@ -417,7 +552,7 @@ class SimulationManager {
             <div class="small">
                 <strong>${actionDescription}</strong>
                 <div class="text-muted mt-1">${result.message}</div>
-                ${result.team_member_reaction ? `<div class="text-info mt-1"><em>${result.team_member_reaction}</em></div>` : ''}
+                ${result.team_member_reaction != null ? `<div class="text-info mt-1"><em class="reaction-text">${result.team_member_reaction}</em></div>` : ''}
                 ${result.consequences && result.consequences.length > 0 ? 
                     `<div class="text-warning mt-1">${result.consequences.join(', ')}</div>` : ''}
             </div>
@@ -425,13 +560,15 @@ class SimulationManager {
 
         logContainer.appendChild(entry);
         logContainer.scrollTop = logContainer.scrollHeight;
+        return entry.querySelector('.reaction-text');
     }
 
     async showResults() {
-        // Stop timer
+        // Stop timer and live updates
         if (this.timer) {
             clearInterval(this.timer);
         }
+        this.unsubscribeFromUpdates();
 
         try {
             const response = await fetch(`/api/session/${this.sessionId}/results`);
@@ -441,6 +578,7 @@ class SimulationManager {
 
             const results = await response.json();
             this.renderResults(results);
+            await this.loadTimeline();
 
             // Hide simulation screen, show results
             document.getElementById('simulation-screen').classList.add('d-none');
@@ -514,6 +652,55 @@ class SimulationManager {
         });
     }
 
+    async loadTimeline() {
+        // The timeline is a nice-to-have on the results page, so failures stay quiet
+        try {
+            const response = await fetch(`/api/session/${this.sessionId}/timeline`);
+            if (response.ok) {
+                this.renderTimeline(await response.json());
+            }
+        } catch (error) {
+            console.error('Error getting timeline:', error);
+        }
+    }
+
+    renderTimeline(points) {
+        if (points.length < 2) {
+            return;
+        }
+        const members = Object.keys(points[points.length - 1].workloads);
+        const moodEmoji = { happy: '😊', neutral: '😐', frustrated: '😟' };
+
+        const timelineCard = document.createElement('div');
+        timelineCard.className = 'card mb-3';
+        timelineCard.innerHTML = `
+            <div class="card-body">
+                <h5 class="card-title">Team Over Time</h5>
+                <div class="table-responsive">
+                    <table class="table table-sm small mb-0">
+                        <thead>
+                            <tr>
+                                <th>Step</th>
+                                ${members.map(member => `<th class="text-capitalize">${member}</th>`).join('')}
+                            </tr>
+                        </thead>
+                        <tbody>
+                            ${points.map((point, index) => `
+                                <tr>
+                                    <td>${index === 0 ? 'Start' : index}</td>
+                                    ${members.map(member => `
+                                        <td>${moodEmoji[point.moods[member]] || ''} ${point.workloads[member] ?? ''}%</td>
+                                    `).join('')}
+                                </tr>
+                            `).join('')}
+                        </tbody>
+                    </table>
+                </div>
+            </div>
+        `;
+        document.getElementById('competency-scores').appendChild(timelineCard);
+    }
+
     async skipToPhase(phase) {
         if (!this.sessionId) {
             alert('No active session. Please start a simulation first.');
@@ -534,7 +721,9 @@ class SimulationManager {
             }
 
             // Update simulation state
-            await this.updateSimulationState();
+            if (!this.eventSource) {
+                await this.updateSimulationState();
+            }
 
             // Log the phase skip
             this.logActivity({ type: 'phase_skip' }, { 
@@ -550,14 +739,16 @@ class SimulationManager {
 
     resetSimulation() {
         if (confirm('Are you sure you want to reset the simulation? All progress will be lost.')) {
-            // Stop timer
+            // Stop timer and live updates
             if (this.timer) {
                 clearInterval(this.timer);
             }
+            this.unsubscribeFromUpdates();
 
             // Reset state
             this.sessionId = null;
             this.currentState = null;
+            this.stateEtag = null;
             this.startTime = null;
 
             // Hide simulation and results screens
@@ -6,6 +6,8 @@ This file contains all the prompts and tasks for integrating LLMs into the simul
 When ready to add AI agents, replace the placeholder functions in scenarios.py with these.
 """
 
+from backend.llm_gateway import llm_gateway
+
 # Character System Prompts
 ALEX_SYSTEM_PROMPT = """
 You are Alex, a brilliant but disorganized developer on a team. Your personality traits:
@@ -139,33 +141,56 @@ Create a conflict scenario that:
 Format: Brief description (2-3 sentences) of what's happening and why.
 """
 
-# Functions to call LLM APIs (placeholders)
+# Functions to call LLM APIs (through backend.llm_gateway; callers should go via backend.llm_cache)
+CHARACTER_SYSTEM_PROMPTS = {
+    "alex": ALEX_SYSTEM_PROMPT,
+    "jordan": JORDAN_SYSTEM_PROMPT,
+    "sam": SAM_SYSTEM_PROMPT,
+}
+
+CHARACTER_PROMPTS = {
+    "delegation": RESPONSE_TO_DELEGATION_PROMPT,
+    "conflict": CONFLICT_REACTION_PROMPT,
+    "conversation": GENERAL_CONVERSATION_PROMPT,
+}
+
+COACH_SYSTEM_PROMPT = "You are a concise, supportive leadership coach."
+SCENARIO_SYSTEM_PROMPT = "You write short, realistic workplace scenarios for a leadership training simulation."
+
 async def get_character_response(character_name: str, prompt_type: str, **kwargs) -> str:
     """
-    TODO: Replace with actual LLM API call
+    Get a character's in-voice response from the configured LLM provider.
     
     Args:
         character_name: "alex", "jordan", or "sam"
-        prompt_type: "delegation", "conflict", "conversation", etc.
+        prompt_type: "delegation", "conflict" or "conversation"
         **kwargs: Context variables for the prompt
     
     Returns:
         Character's response as a string
     """
-    # Placeholder - replace with OpenAI/Anthropic API call
-    return f"[LLM_PLACEHOLDER] {character_name} would respond here based on {prompt_type}"
+    prompt = CHARACTER_PROMPTS[prompt_type].format(character_name=character_name.title(), **kwargs)
+    return await llm_gateway.complete(CHARACTER_SYSTEM_PROMPTS[character_name], prompt)
+
+async def stream_character_response(character_name: str, prompt_type: str, **kwargs):
+    """
+    Same as get_character_response, but yields the text in chunks as the model writes it
+    """
+    prompt = CHARACTER_PROMPTS[prompt_type].format(character_name=character_name.title(), **kwargs)
+    async for chunk in llm_gateway.stream(CHARACTER_SYSTEM_PROMPTS[character_name], prompt):
+        yield chunk
 
 async def get_coaching_advice(session_data: dict) -> str:
     """
-    TODO: Replace with actual LLM API call for real-time coaching
+    Real-time coaching advice; session_data holds team_summary, recent_actions and phase
     """
-    return "[LLM_PLACEHOLDER] Coaching advice would go here"
+    return await llm_gateway.complete(COACH_SYSTEM_PROMPT, LEADERSHIP_COACHING_PROMPT.format(**session_data))
 
 async def generate_dynamic_scenario(team_state: dict) -> str:
     """
-    TODO: Replace with actual LLM API call for scenario generation
+    Conflict scenario generation; team_state holds alex_state, jordan_state, sam_state and progress_summary
     """
-    return "[LLM_PLACEHOLDER] Dynamic scenario would be generated here"
+    return await llm_gateway.complete(SCENARIO_SYSTEM_PROMPT, DYNAMIC_SCENARIO_PROMPT.format(**team_state))
 
 # Integration points for scenarios.py
 LLM_INTEGRATION_POINTS = {
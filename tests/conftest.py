@@ -0,0 +1,26 @@
+import os
+
+# Before backend.main is first imported: keep the app's sessions out of ./sessions.db
+os.environ.setdefault("SESSION_STORE", "memory")
+
+import pytest
+
+from backend.llm_gateway import LLMProvider, llm_gateway
+from tests.model_server import StubModelServer
+
+@pytest.fixture(scope="session")
+def model_server():
+    server = StubModelServer()
+    server.start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def stub_model(model_server, monkeypatch):
+    """The stub model server, reset, with the app's gateway sending every call to it."""
+    model_server.reset()
+    # A fresh provider per test: its semaphore binds to the event loop that first uses it
+    monkeypatch.setattr(llm_gateway, "providers", {"stub": LLMProvider("stub", model_server.url)})
+    monkeypatch.setattr(llm_gateway, "default", "stub")
+    monkeypatch.setattr(llm_gateway, "fallbacks", {"timeout": 0, "error": 0})
+    yield model_server
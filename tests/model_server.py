@@ -0,0 +1,79 @@
+"""
+Stub OpenAI-style chat completions server for the LLM tests.
+
+Runs a real uvicorn server on a free local port in a background thread, so
+requests go through the gateway's pooled httpx client exactly as they would
+against a provider. Tests script the reply (text, delay, failure status)
+and read back the request bodies it received. Requests with `"stream": true`
+get the reply as SSE chunks, one per token, `gap` seconds apart, ending in
+`data: [DONE]`.
+"""
+
+import asyncio
+import json
+import re
+import socket
+import threading
+import time
+from typing import Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+class StubModelServer:
+    def __init__(self):
+        self.app = FastAPI()
+        self.app.post("/v1/chat/completions")(self._complete)
+        self.url: Optional[str] = None
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+        self.reset()
+
+    def reset(self) -> None:
+        self.reply = "Sure, I'll get on it."
+        self.delay = 0.0  # seconds before answering (before the first chunk when streaming)
+        self.gap = 0.0  # seconds between streamed chunks
+        self.status = 200
+        self.requests: List[Dict] = []
+
+    async def _complete(self, request: Request):
+        body = await request.json()
+        self.requests.append(body)
+        await asyncio.sleep(self.delay)
+        if self.status != 200:
+            return JSONResponse({"error": {"message": "stub failure"}}, status_code=self.status)
+        if body.get("stream"):
+            return StreamingResponse(self._chunks(), media_type="text/event-stream")
+        return {"choices": [{"index": 0, "message": {"role": "assistant", "content": self.reply}}]}
+
+    @property
+    def tokens(self) -> List[str]:
+        """The reply split the way it is streamed: each word with the whitespace before it."""
+        return re.findall(r"\s*\S+", self.reply)
+
+    async def _chunks(self):
+        # Providers open with a role-only frame, which carries no text
+        yield "data: " + json.dumps({"choices": [{"index": 0, "delta": {"role": "assistant"}}]}) + "\n\n"
+        for index, token in enumerate(self.tokens):
+            if index:
+                await asyncio.sleep(self.gap)
+            yield "data: " + json.dumps({"choices": [{"index": 0, "delta": {"content": token}}]}) + "\n\n"
+        yield "data: [DONE]\n\n"
+
+    def start(self) -> None:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("127.0.0.1", 0))
+        self.url = f"http://127.0.0.1:{sock.getsockname()[1]}/v1/chat/completions"
+        self._server = uvicorn.Server(uvicorn.Config(self.app, log_level="error"))
+        self._thread = threading.Thread(target=self._server.run, kwargs={"sockets": [sock]}, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("stub model server did not start")
+            time.sleep(0.01)
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join()
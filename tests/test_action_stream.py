@@ -0,0 +1,83 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import backend.llm_cache as cache_module
+from backend.llm_cache import LLMCache
+from backend.llm_gateway import llm_gateway
+from backend.main import app
+
+MESSAGE = {"type": "send_message", "target_member": "alex", "message": "How is the API coming along?"}
+
+@pytest.fixture
+def client(stub_model, monkeypatch):
+    # An empty cache, so every reaction is streamed from the stub
+    monkeypatch.setattr(cache_module, "llm_cache", LLMCache())
+    with TestClient(app) as client:
+        yield client
+
+def start_session(client) -> str:
+    return client.post("/api/session/start").json()["session_id"]
+
+def stream_action(client, session_id: str, action=MESSAGE, **headers):
+    """(response headers, [(event, data), ...]) for one POST to /action/stream."""
+    events = []
+    with client.stream("POST", f"/api/session/{session_id}/action/stream", json=action, headers=headers) as response:
+        assert response.status_code == 200
+        event = None
+        for line in response.iter_lines():
+            if line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                events.append((event, json.loads(line[5:])))
+    return response.headers, events
+
+def test_tokens_stream_in_order_between_result_and_done(client, stub_model):
+    stub_model.reply = "Going well, the endpoints are nearly done."
+    _, events = stream_action(client, start_session(client))
+
+    names = [name for name, _ in events]
+    assert names[0] == "result" and names[-1] == "done"
+    assert set(names[1:-1]) == {"token"}
+    assert [data["text"] for name, data in events if name == "token"] == stub_model.tokens
+    assert events[-1][1]["team_member_reaction"] == stub_model.reply
+    assert llm_gateway.fallbacks == {"timeout": 0, "error": 0}
+
+def test_state_is_committed_before_the_reaction(client, stub_model):
+    session_id = start_session(client)
+    _, events = stream_action(client, session_id)
+
+    result = events[0][1]
+    assert result["success"]
+    assert result["team_member_reaction"]  # The scripted reaction, sent before the model's
+    assert len(client.get(f"/api/session/{session_id}/state").json()["actions"]) == 1
+
+def test_replay_sends_the_streamed_reaction(client, stub_model):
+    session_id = start_session(client)
+    _, first = stream_action(client, session_id, **{"Idempotency-Key": "stream-1"})
+    headers, replay = stream_action(client, session_id, **{"Idempotency-Key": "stream-1"})
+
+    assert headers["idempotent-replayed"] == "true"
+    assert [name for name, _ in replay] == ["result", "done"]
+    assert replay[-1][1]["team_member_reaction"] == first[-1][1]["team_member_reaction"] == stub_model.reply
+    assert len(client.get(f"/api/session/{session_id}/state").json()["actions"]) == 1
+
+def test_slow_model_falls_back_to_scripted_reaction(client, stub_model, monkeypatch):
+    monkeypatch.setattr(llm_gateway, "deadline", 0.2)
+    stub_model.delay = 2.0
+    _, events = stream_action(client, start_session(client))
+
+    scripted = events[0][1]["team_member_reaction"]
+    assert [name for name, _ in events] == ["result", "token", "done"]
+    assert events[1][1]["text"] == events[2][1]["team_member_reaction"] == scripted
+    assert llm_gateway.fallbacks["timeout"] == 1
+
+def test_failing_model_falls_back_to_scripted_reaction(client, stub_model):
+    stub_model.status = 500
+    _, events = stream_action(client, start_session(client))
+
+    scripted = events[0][1]["team_member_reaction"]
+    assert [name for name, _ in events] == ["result", "token", "done"]
+    assert events[1][1]["text"] == events[2][1]["team_member_reaction"] == scripted
+    assert llm_gateway.fallbacks["error"] >= 1  # Background coaching calls fail over too
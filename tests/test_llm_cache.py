@@ -0,0 +1,131 @@
+import asyncio
+
+import httpx
+import pytest
+
+import backend.llm_cache as cache_module
+import llm_tasks
+from backend.llm_cache import LLMCache, cache_key, get_character_response
+from backend.llm_gateway import llm_gateway
+
+def run(scenario):
+    """Run one test scenario on a fresh event loop, closing the gateway's client on it afterwards."""
+    async def main():
+        try:
+            return await scenario
+        finally:
+            await llm_gateway.aclose()
+    return asyncio.run(main())
+
+def ask(message: str = "How is the API going?"):
+    """A character reaction through the module's cached wrapper."""
+    return get_character_response("alex", "conversation", user_message=message, mood="neutral")
+
+def call_model():
+    """The same reaction straight from the model, for tests that drive an LLMCache directly."""
+    return llm_tasks.get_character_response("alex", "conversation", user_message="hi", mood="neutral")
+
+@pytest.fixture
+def cache(monkeypatch):
+    """A fresh memory-only cache behind the module's wrappers."""
+    cache = LLMCache()
+    monkeypatch.setattr(cache_module, "llm_cache", cache)
+    return cache
+
+def test_miss_then_memory_hit(stub_model, cache):
+    async def scenario():
+        first = await ask()
+        second = await ask("how is the API going")  # Normalizes to the same key
+        return first, second
+
+    assert run(scenario()) == (stub_model.reply, stub_model.reply)
+    assert len(stub_model.requests) == 1
+    stats = cache.stats()
+    assert (stats["misses"], stats["memory_hits"], stats["hit_rate"]) == (1, 1, 0.5)
+
+def test_different_prompts_miss(stub_model, cache):
+    async def scenario():
+        await ask("first question")
+        await ask("second question")
+
+    run(scenario())
+    assert len(stub_model.requests) == 2
+    assert cache.stats()["misses"] == 2
+
+def test_concurrent_identical_prompts_share_one_call(stub_model, cache):
+    stub_model.delay = 0.2
+
+    async def scenario():
+        return await asyncio.gather(*(ask() for _ in range(5)))
+
+    assert run(scenario()) == [stub_model.reply] * 5
+    assert len(stub_model.requests) == 1
+    assert cache.stats()["coalesced"] == 4
+
+def test_shared_failure_is_not_cached(stub_model, cache):
+    stub_model.delay = 0.1
+    stub_model.status = 500
+
+    async def scenario():
+        failed = await asyncio.gather(*(ask() for _ in range(3)), return_exceptions=True)
+        stub_model.status = 200
+        return failed, await ask()
+
+    failed, retried = run(scenario())
+    assert all(isinstance(result, httpx.HTTPStatusError) for result in failed)
+    assert retried == stub_model.reply
+    assert len(stub_model.requests) == 2  # One shared failed call, then one retry
+    assert cache.stats()["errors"] == 1
+
+def test_disk_tier_survives_restart(stub_model, tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    key = cache_key("character", character_name="alex", prompt_type="conversation", user_message="hi", mood="neutral")
+
+    first = LLMCache(path=path)
+    assert run(first.get_or_call(key, call_model)) == stub_model.reply
+    first.close()
+
+    restarted = LLMCache(path=path)
+    assert run(restarted.get_or_call(key, call_model)) == stub_model.reply
+    assert len(stub_model.requests) == 1
+    assert restarted.stats()["disk_hits"] == 1
+    # The disk hit was promoted, so the next lookup is served from memory
+    assert run(restarted.get_or_call(key, call_model)) == stub_model.reply
+    assert restarted.stats()["memory_hits"] == 1
+    restarted.close()
+
+def test_expired_entries_are_not_served(stub_model, tmp_path):
+    cache = LLMCache(ttl=0.05, path=str(tmp_path / "llm_cache.db"))
+
+    async def scenario():
+        await cache.get_or_call("key", call_model)
+        await asyncio.sleep(0.1)
+        await cache.get_or_call("key", call_model)
+
+    run(scenario())
+    assert len(stub_model.requests) == 2
+    assert cache.stats()["misses"] == 2
+    cache.close()
+
+def test_slow_model_falls_back_within_deadline(stub_model, cache):
+    stub_model.delay = 1.0
+
+    async def scenario():
+        started = asyncio.get_running_loop().time()
+        text = await llm_gateway.with_fallback(ask, "scripted reaction", deadline=0.1)
+        return text, asyncio.get_running_loop().time() - started
+
+    text, elapsed = run(scenario())
+    assert text == "scripted reaction"
+    assert elapsed < 0.5
+    assert llm_gateway.fallbacks == {"timeout": 1, "error": 0}
+    # The abandoned call left nothing behind, so the next request asks the model again
+    assert cache.stats()["entries"] == 0
+    assert not cache.in_flight(cache_key("character", character_name="alex", prompt_type="conversation",
+                                         user_message="How is the API going?", mood="neutral"))
+
+def test_failing_model_falls_back(stub_model, cache):
+    stub_model.status = 503
+
+    assert run(llm_gateway.with_fallback(ask, "scripted reaction")) == "scripted reaction"
+    assert llm_gateway.fallbacks == {"timeout": 0, "error": 1}
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from backend.engine import SimulationEngine
+from backend.models import SimulationAction
+from backend.rescore import read_sqlite, rescore_item
+from backend.scoring import build_session_results
+from backend.session_store import SQLiteSessionStore
+
+ACTIONS = [
+    SimulationAction(type="delegate_task", target_member="alex", task_id="backend_api"),
+    SimulationAction(type="send_message", target_member="sam", message="Thanks, great work on this so far!"),
+    SimulationAction(type="ask_question", target_member="jordan", message="What do you need from me?"),
+    SimulationAction(type="delegate_task", target_member="jordan", task_id="create_mockups"),
+]
+
+@pytest.fixture
+def live_store(tmp_path):
+    """Path of a session store holding one live session, saved after every action, and that session."""
+    path = str(tmp_path / "sessions.db")
+    store = SQLiteSessionStore(path)
+    engine = SimulationEngine()
+    session = engine.new_session("live-1", seed=7)
+    store.save(session)
+    for action in ACTIONS:
+        engine.apply(session, action)
+        store.save(session)
+    store.close()
+    return path, session
+
+def live_results(path: str, replay_actions: bool = False):
+    items = [item for item in read_sqlite(path, include_live=True) if item[0] == "session"]
+    assert len(items) == 1
+    return json.loads(rescore_item(*items[0], replay_actions=replay_actions))
+
+def test_live_sessions_keep_their_actions(live_store):
+    path, session = live_store
+    expected = build_session_results(session, 0).model_dump(mode="json")
+
+    results = live_results(path)
+    assert results["actions_taken"] == len(ACTIONS)
+    assert results["competency_scores"] == expected["competency_scores"]
+
+def test_replay_rebuilds_live_sessions_from_their_log(live_store):
+    path, session = live_store
+    expected = build_session_results(session, 0).model_dump(mode="json")
+
+    results = live_results(path, replay_actions=True)
+    assert results["actions_taken"] == len(ACTIONS)
+    assert results["competency_scores"] == expected["competency_scores"]
+
+def test_live_sessions_are_skipped_by_default(live_store):
+    path, _ = live_store
+    assert list(read_sqlite(path)) == []